@@ -1,20 +1,73 @@
+import asyncio
+import functools
 import os
+import weakref
 
 from dotenv import load_dotenv
-from openai import OpenAI
 
 load_dotenv()
 
-api_key = os.getenv("OPENAI_API_KEY")
+# 单次请求的超时时间（秒），与 openai 库的默认值一致
+DEFAULT_OPENAI_TIMEOUT = 600.0
 
-if not api_key:
-    raise RuntimeError("OPENAI_API_KEY 未设置，请配置 OPENAI_API_KEY 环境变量")
+# AsyncOpenAI 的连接池绑定事件循环，按循环分别创建
+_async_clients = weakref.WeakKeyDictionary()
 
-client = OpenAI(
-    api_key=api_key,
-    base_url=os.getenv("OPENAI_BASE_URL"),
-)
+
+def get_openai_timeout() -> float:
+    """OPENAI_TIMEOUT，单次请求的超时时间（秒）"""
+    return float(os.getenv("OPENAI_TIMEOUT") or DEFAULT_OPENAI_TIMEOUT)
+
+
+def _client_kwargs() -> dict:
+    api_key = os.getenv("OPENAI_API_KEY")
+
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY 未设置，请配置 OPENAI_API_KEY 环境变量")
+
+    return {
+        "api_key": api_key,
+        "base_url": os.getenv("OPENAI_BASE_URL"),
+        "timeout": get_openai_timeout(),
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def get_client():
+    """
+    获取进程内共享的 OpenAI 客户端，首次调用时才导入 openai 并校验配置
+
+    Raises:
+        RuntimeError: OPENAI_API_KEY 未设置
+    """
+    from openai import OpenAI
+
+    return OpenAI(**_client_kwargs())
+
+
+def get_async_client():
+    """
+    获取当前事件循环共享的 AsyncOpenAI 客户端，必须在事件循环中调用
+
+    Raises:
+        RuntimeError: OPENAI_API_KEY 未设置
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        from openai import AsyncOpenAI
+
+        client = AsyncOpenAI(**_client_kwargs())
+        _async_clients[loop] = client
+    return client
 
 
 def get_openai_model():
     return os.getenv("OPENAI_MODEL") or "gpt-4o-mini"
+
+
+def __getattr__(name: str):
+    # 兼容 from ai.auth import client
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
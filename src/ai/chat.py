@@ -0,0 +1,135 @@
+import asyncio
+import os
+import time
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+from ai.auth import get_async_client, get_openai_model
+from ai.response_cache import ResponseCache, get_response_cache
+from utils.profiler import profiler
+
+# 进程内同时进行的 LLM 请求数上限
+DEFAULT_MAX_CONCURRENCY = 8
+
+# asyncio.Semaphore 绑定事件循环，按循环分别创建
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def get_max_concurrency() -> int:
+    """OPENAI_MAX_CONCURRENCY，进程内同时进行的异步 LLM 请求数"""
+    return max(1, int(os.getenv("OPENAI_MAX_CONCURRENCY") or DEFAULT_MAX_CONCURRENCY))
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(get_max_concurrency())
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
+def _completion_kwargs(
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    response_format: Optional[Dict[str, Any]],
+) -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {
+        "model": model,
+        "temperature": temperature,
+        "messages": messages,
+    }
+    if response_format is not None:
+        kwargs["response_format"] = response_format
+    return kwargs
+
+
+def _record_request(
+    model: str,
+    status: Optional[int],
+    elapsed: float,
+    result: str,
+    messages: List[Dict[str, str]],
+    cache_hit: bool = False,
+):
+    profiler.record_request(
+        "openai",
+        f"POST /chat/completions ({model})",
+        status,
+        elapsed,
+        bytes_in=len(result.encode("utf-8")),
+        bytes_out=sum(len(m["content"].encode("utf-8")) for m in messages),
+        cache_hit=cache_hit,
+    )
+
+
+def _lookup_cache(
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    response_format: Optional[Dict[str, Any]],
+) -> Tuple[Optional[ResponseCache], Optional[str], Optional[str]]:
+    """
+    查找缓存的响应
+
+    Returns:
+        (缓存, key, 缓存的内容)，未开启缓存时均为 None，未命中时内容为 None
+    """
+    cache = get_response_cache()
+    if cache is None:
+        return None, None, None
+    key = cache.key(
+        os.getenv("OPENAI_BASE_URL"), model, temperature, messages, response_format
+    )
+    return cache, key, cache.get(key)
+
+
+async def create_chat_completion_async(
+    messages: List[Dict[str, str]],
+    temperature: float,
+    response_format: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    异步调用 OpenAI Chat Completions 接口，所有 LLM 调用都应通过该函数发出，等待响应时不阻塞事件循环
+
+    进程内同时进行的请求数受 OPENAI_MAX_CONCURRENCY 限制，超时时间见 OPENAI_TIMEOUT；
+    相同的请求命中 LLM 响应缓存时直接返回缓存的内容（见 ai.response_cache）
+
+    Args:
+        messages: 对话消息
+        temperature: 采样温度
+        response_format: 如 {"type": "json_object"}，为 None 时不传
+
+    Returns:
+        str: 模型返回的内容
+    """
+    model = get_openai_model()
+    # SQLite 的读写是阻塞调用，放到线程中执行
+    cache, cache_key, cached = await asyncio.to_thread(
+        _lookup_cache, model, messages, temperature, response_format
+    )
+    if cached is not None:
+        _record_request(model, 200, 0.0, cached, messages, cache_hit=True)
+        return cached
+    kwargs = _completion_kwargs(model, messages, temperature, response_format)
+
+    async with _get_semaphore():
+        # 只统计请求本身的耗时，不包括排队等待的时间
+        start = time.perf_counter()
+        status = None
+        result = ""
+        try:
+            chat_completion = await get_async_client().chat.completions.create(**kwargs)
+            status = 200
+            result = chat_completion.choices[0].message.content or ""
+            if cache is not None and result:
+                await asyncio.to_thread(cache.put, cache_key, model, result)
+            return result
+        except Exception as e:
+            status = getattr(e, "status_code", None)
+            raise
+        finally:
+            _record_request(
+                model, status, time.perf_counter() - start, result, messages
+            )
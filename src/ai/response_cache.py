@@ -0,0 +1,172 @@
+"""
+LLM 响应缓存
+
+以 接口地址 + 模型 + temperature + 全部消息（含 PromptManager 加载的 system prompt）+ response_format
+的哈希为 key，把模型返回的内容保存在 SQLite 中。diff 与 prompt 都没有变化时，
+重新运行 code-review 或 merge 直接返回上次的结果，不再调用 LLM。
+
+条目超过有效期后视为未命中；总大小超过上限时按最近使用时间（LRU）淘汰。
+SQLite 使用 WAL 模式，多个进程可以共享同一个缓存文件。
+缓存只是加速手段：无法创建、读取或写入（如数据库被锁定、目录不可写）时记录警告并直接调用模型。
+
+环境变量：
+    LLM_CACHE: 设为 0 关闭，默认开启（CLI 的 --no-llm-cache 同样会关闭）
+    LLM_CACHE_PATH: 缓存文件，默认 ~/.cache/gitlab-merge-request-bot/llm.sqlite3
+    LLM_CACHE_TTL_HOURS: 有效期，默认 168（7 天）
+    LLM_CACHE_SIZE_MB: 大小上限，默认 64
+"""
+
+import functools
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from utils.disk_cache import DEFAULT_CACHE_ROOT, make_cache_key
+from utils.logger import get_logger
+
+DEFAULT_TTL_HOURS = 168
+DEFAULT_SIZE_MB = 64
+
+# 结构变化时递增，旧条目自然失效
+CACHE_FORMAT_VERSION = 1
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+"""
+
+
+class ResponseCache:
+    """基于 SQLite 的 LLM 响应缓存"""
+
+    def __init__(self, path: Path, ttl: float, max_bytes: int):
+        """
+        Args:
+            path: SQLite 文件路径，":memory:" 表示只缓存在内存中
+            ttl: 有效期（秒）
+            max_bytes: 缓存内容的总大小上限（字节）
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        if str(path) != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # 同步与异步调用可能来自不同线程，所有访问都在锁内进行
+        self._conn = sqlite3.connect(str(path), timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    @staticmethod
+    def key(
+        base_url: Optional[str],
+        model: str,
+        temperature: float,
+        messages: List[Dict[str, str]],
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        return make_cache_key(
+            "llm",
+            CACHE_FORMAT_VERSION,
+            base_url or "",
+            model,
+            temperature,
+            messages,
+            response_format,
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        """读取未过期的条目并刷新其最近使用时间，不存在、已过期或读取失败时返回 None"""
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                response, created_at = row
+                if now - created_at > self.ttl:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                    return None
+                self._conn.execute(
+                    "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+                self._conn.commit()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Failed to read LLM response cache: {e}")
+            return None
+        return response
+
+    def put(self, key: str, model: str, response: str):
+        """写入条目，超过大小上限时淘汰过期与最久未使用的条目；写入失败时忽略"""
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses "
+                    "(key, model, response, size, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model, response, size, now, now),
+                )
+                self._evict(now)
+                self._conn.commit()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Failed to write LLM response cache: {e}")
+
+    def _evict(self, now: float):
+        self._conn.execute(
+            "DELETE FROM responses WHERE created_at < ?", (now - self.ttl,)
+        )
+        (total,) = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        ).fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+@functools.lru_cache(maxsize=1)
+def get_response_cache() -> Optional[ResponseCache]:
+    """根据环境变量创建 LLM 响应缓存，LLM_CACHE=0 或无法创建缓存时返回 None"""
+    if os.getenv("LLM_CACHE", "1").lower() in ("0", "false", "no"):
+        return None
+    path = os.getenv("LLM_CACHE_PATH") or DEFAULT_CACHE_ROOT / "llm.sqlite3"
+    ttl_hours = float(os.getenv("LLM_CACHE_TTL_HOURS") or DEFAULT_TTL_HOURS)
+    size_mb = int(os.getenv("LLM_CACHE_SIZE_MB") or DEFAULT_SIZE_MB)
+    try:
+        return ResponseCache(
+            Path(path), ttl=ttl_hours * 3600, max_bytes=size_mb * 1024 * 1024
+        )
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(
+            f"LLM response cache unavailable, calling the model directly: {e}"
+        )
+        return None
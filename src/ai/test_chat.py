@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+import pytest
+
+from ai.chat import create_chat_completion_async
+from ai.response_cache import ResponseCache
+from gitlab.fake_server import FakeGitLabConfig, FakeGitLabServer
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+@pytest.fixture
+def fake_openai(request, monkeypatch):
+    """启动模拟服务，并让 OpenAI 客户端指向它，默认不使用响应缓存"""
+    config = getattr(request, "param", None) or FakeGitLabConfig()
+    with FakeGitLabServer(config) as server:
+        monkeypatch.setenv("OPENAI_BASE_URL", f"{server.base_url}/v1")
+        monkeypatch.setenv("OPENAI_API_KEY", "fake-key")
+        monkeypatch.setattr("ai.chat.get_response_cache", lambda: None)
+        yield server
+
+
+class TestCreateChatCompletionAsync:
+    """测试异步 LLM 调用"""
+
+    def test_completion_in_separate_loops(self, fake_openai):
+        """测试客户端按事件循环分别创建，多次 asyncio.run 都能正常调用"""
+        for _ in range(2):
+            result = asyncio.run(create_chat_completion_async(MESSAGES, 0.3))
+            assert result.startswith("## 模拟摘要")
+
+    @pytest.mark.parametrize(
+        "fake_openai", [FakeGitLabConfig(llm_latency=0.3)], indirect=True
+    )
+    def test_does_not_block_event_loop(self, fake_openai):
+        """测试等待响应期间事件循环中的其他任务照常运行"""
+
+        async def main():
+            ticks = 0
+            task = asyncio.create_task(create_chat_completion_async(MESSAGES, 0.3))
+            while not task.done():
+                ticks += 1
+                await asyncio.sleep(0.01)
+            await task
+            return ticks
+
+        assert asyncio.run(main()) > 10
+
+    @pytest.mark.parametrize(
+        "fake_openai", [FakeGitLabConfig(llm_latency=0.2)], indirect=True
+    )
+    def test_max_concurrency(self, fake_openai, monkeypatch):
+        """测试 OPENAI_MAX_CONCURRENCY 限制同时进行的请求数"""
+        monkeypatch.setenv("OPENAI_MAX_CONCURRENCY", "2")
+
+        async def main():
+            return await asyncio.gather(
+                *(create_chat_completion_async(MESSAGES, 0.3) for _ in range(4))
+            )
+
+        start = time.perf_counter()
+        results = asyncio.run(main())
+        elapsed = time.perf_counter() - start
+
+        assert len(results) == 4
+        # 4 个请求每次最多 2 个并发，至少需要两轮
+        assert elapsed >= 0.4
+
+
+class TestResponseCacheIntegration:
+    """测试 LLM 调用使用响应缓存"""
+
+    def test_identical_requests_hit_cache(self, fake_openai, monkeypatch):
+        cache = ResponseCache(":memory:", ttl=3600, max_bytes=1024 * 1024)
+        monkeypatch.setattr("ai.chat.get_response_cache", lambda: cache)
+
+        first = asyncio.run(create_chat_completion_async(MESSAGES, 0.3))
+        second = asyncio.run(create_chat_completion_async(MESSAGES, 0.3))
+        asyncio.run(create_chat_completion_async(MESSAGES, 0.5))
+
+        assert first == second
+        # 第二次命中缓存，temperature 不同时重新请求
+        assert fake_openai.request_log["POST /v1/chat/completions"] == 2
+
+    def test_broken_cache_falls_back_to_model(self, fake_openai, monkeypatch, tmp_path):
+        """测试缓存不可用时直接调用模型"""
+        cache = ResponseCache(tmp_path / "llm.sqlite3", ttl=3600, max_bytes=1024)
+        cache.close()
+        monkeypatch.setattr("ai.chat.get_response_cache", lambda: cache)
+
+        result = asyncio.run(create_chat_completion_async(MESSAGES, 0.3))
+
+        assert result.startswith("## 模拟摘要")
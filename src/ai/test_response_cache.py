@@ -0,0 +1,87 @@
+import time
+
+from ai.response_cache import ResponseCache, get_response_cache
+
+MESSAGES = [
+    {"role": "system", "content": "system prompt"},
+    {"role": "user", "content": "diff"},
+]
+
+
+def _cache(tmp_path, ttl=3600, max_bytes=1024 * 1024):
+    return ResponseCache(tmp_path / "llm.sqlite3", ttl=ttl, max_bytes=max_bytes)
+
+
+class TestResponseCache:
+    """测试 SQLite LLM 响应缓存"""
+
+    def test_put_and_get(self, tmp_path):
+        cache = _cache(tmp_path)
+        key = cache.key(None, "gpt", 0.3, MESSAGES)
+
+        assert cache.get(key) is None
+        cache.put(key, "gpt", "结果")
+        assert cache.get(key) == "结果"
+
+    def test_persisted_across_instances(self, tmp_path):
+        key = ResponseCache.key(None, "gpt", 0.3, MESSAGES)
+        _cache(tmp_path).put(key, "gpt", "结果")
+
+        assert _cache(tmp_path).get(key) == "结果"
+
+    def test_key_covers_request(self):
+        key = ResponseCache.key(None, "gpt", 0.3, MESSAGES)
+        other_system = [{"role": "system", "content": "other"}, MESSAGES[1]]
+
+        assert key == ResponseCache.key(None, "gpt", 0.3, list(MESSAGES))
+        assert key != ResponseCache.key(None, "gpt", 1.0, MESSAGES)
+        assert key != ResponseCache.key(None, "other", 0.3, MESSAGES)
+        assert key != ResponseCache.key(None, "gpt", 0.3, other_system)
+        assert key != ResponseCache.key("http://other/v1", "gpt", 0.3, MESSAGES)
+        assert key != ResponseCache.key(
+            None, "gpt", 0.3, MESSAGES, {"type": "json_object"}
+        )
+
+    def test_expired(self, tmp_path, monkeypatch):
+        cache = _cache(tmp_path, ttl=60)
+        cache.put("k", "gpt", "结果")
+
+        now = time.time()
+        monkeypatch.setattr("ai.response_cache.time.time", lambda: now + 61)
+        assert cache.get("k") is None
+
+    def test_evict_least_recently_used(self, tmp_path, monkeypatch):
+        cache = _cache(tmp_path, max_bytes=250)
+        clock = [1000.0]
+        monkeypatch.setattr("ai.response_cache.time.time", lambda: clock[0])
+
+        for key in ("a", "b"):
+            cache.put(key, "gpt", "x" * 100)
+            clock[0] += 1
+        cache.get("a")  # a 比 b 更近被使用
+        clock[0] += 1
+        cache.put("c", "gpt", "x" * 100)
+
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get("c") is not None
+
+    def test_errors_ignored(self, tmp_path):
+        """测试读写失败时不抛出异常，读取视为未命中"""
+        cache = _cache(tmp_path)
+        key = cache.key(None, "gpt", 0.3, MESSAGES)
+        cache.put(key, "gpt", "结果")
+        cache.close()
+
+        assert cache.get(key) is None
+        cache.put(key, "gpt", "结果")
+
+    def test_unwritable_path(self, tmp_path, monkeypatch):
+        """测试无法创建缓存时返回 None"""
+        (tmp_path / "file").write_text("")
+        monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "file" / "llm.sqlite3"))
+        get_response_cache.cache_clear()
+        try:
+            assert get_response_cache() is None
+        finally:
+            get_response_cache.cache_clear()
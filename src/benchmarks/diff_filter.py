@@ -0,0 +1,115 @@
+"""
+filter_files_from_diff 基准测试：单遍扫描实现 vs 旧的按 "diff --git" 切分实现
+
+用法（在 src 目录下）：
+    python -m benchmarks.diff_filter --size-mb 100
+"""
+
+import argparse
+import re
+import time
+from typing import List
+
+from benchmarks.synthetic import LOCK_FILES, make_synthetic_diff
+from gitlab.util import filter_files_from_diff
+
+
+def legacy_filter_files_from_diff(content: str, files_to_filter: List[str]) -> str:
+    """旧实现的副本，仅用于对比"""
+    if not content.strip():
+        return content
+
+    if "diff --git" not in content:
+        return content
+
+    diff_sections = content.split("diff --git")
+
+    filtered_sections = []
+    for section in diff_sections:
+        if not section.strip():
+            continue
+        if not _legacy_should_filter_section(section, files_to_filter):
+            filtered_sections.append(section)
+
+    if not filtered_sections:
+        return ""
+
+    return "diff --git" + "diff --git".join(filtered_sections)
+
+
+def _legacy_should_filter_section(section: str, files_to_filter: List[str]) -> bool:
+    first_line = section.split("\n")[0].strip()
+
+    match = re.match(r"^[\s]*a/(.+?)\s+b/(.+?)(?:\s|$)", first_line)
+    if not match:
+        return _legacy_fallback_filter_check(section, files_to_filter)
+
+    for filter_file in files_to_filter:
+        if _legacy_path_contains_file(
+            match.group(1), filter_file
+        ) or _legacy_path_contains_file(match.group(2), filter_file):
+            return True
+    return False
+
+
+def _legacy_path_contains_file(file_path: str, filter_file: str) -> bool:
+    file_name = file_path.split("/")[-1]
+    if file_name == filter_file:
+        return True
+    if filter_file in file_name:
+        return True
+    if filter_file in file_path:
+        return True
+    return False
+
+
+def _legacy_fallback_filter_check(section: str, files_to_filter: List[str]) -> bool:
+    for line in section.split("\n")[:5]:
+        if ("---" in line and ("a/" in line or "b/" in line)) or (
+            "+++" in line and ("a/" in line or "b/" in line)
+        ):
+            for filter_file in files_to_filter:
+                if filter_file in line:
+                    return True
+    return False
+
+
+def _best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="filter_files_from_diff 基准测试")
+    parser.add_argument("--size-mb", type=float, default=100, help="diff 大小（MB）")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数，取最快一次")
+    parser.add_argument(
+        "--lock-every", type=int, default=20, help="每隔多少个文件插入一个锁文件"
+    )
+    args = parser.parse_args()
+
+    content = make_synthetic_diff(
+        int(args.size_mb * 1024 * 1024), lock_every=args.lock_every
+    )
+    size_mb = len(content) / 1024 / 1024
+    print(f"diff 大小: {size_mb:.1f} MB，{content.count('diff --git')} 个文件")
+
+    new_result = filter_files_from_diff(content, LOCK_FILES)
+    legacy_result = legacy_filter_files_from_diff(content, LOCK_FILES)
+    assert new_result == legacy_result, "新旧实现的结果不一致"
+
+    legacy = _best_of(
+        lambda: legacy_filter_files_from_diff(content, LOCK_FILES), args.repeat
+    )
+    new = _best_of(lambda: filter_files_from_diff(content, LOCK_FILES), args.repeat)
+    print(f"legacy: {legacy:.3f}s ({size_mb / legacy:.0f} MB/s)")
+    print(f"single-pass: {new:.3f}s ({size_mb / new:.0f} MB/s)")
+    print(f"加速比: {legacy / new:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+多进程解析基准测试：找出 parse_and_format_diff 启用进程池的交叉点
+
+对每个大小分别测量单进程与多进程处理的耗时，多进程的耗时包含进程池启动与结果回传。
+多进程开始更快的最小大小即为 DIFF_PARALLEL_THRESHOLD 的建议值。
+
+用法（在 src 目录下）：
+    python -m benchmarks.diff_parallel --sizes-mb 1,2,4,8,16,32 --workers 4
+"""
+
+import argparse
+import time
+
+from benchmarks.synthetic import make_synthetic_diff
+from gitlab.diff_parallel import get_parallel_workers, parse_and_format_diff
+
+
+def _best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程解析基准测试")
+    parser.add_argument(
+        "--sizes-mb", default="1,2,4,8,16,32", help="逗号分隔的 diff 大小（MB）"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=get_parallel_workers(), help="进程数"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数，取最快一次")
+    args = parser.parse_args()
+
+    print(f"进程数: {args.workers}")
+    print(f"{'size(MB)':>8}  {'serial(s)':>9}  {'parallel(s)':>11}  {'speedup':>7}")
+    crossover = None
+    for size_mb in (float(size) for size in args.sizes_mb.split(",")):
+        content = make_synthetic_diff(int(size_mb * 1024 * 1024), lock_every=0)
+        serial = _best_of(
+            lambda: parse_and_format_diff(content, threshold=0), args.repeat
+        )
+        parallel = _best_of(
+            lambda: parse_and_format_diff(content, threshold=1, workers=args.workers),
+            args.repeat,
+        )
+        print(
+            f"{size_mb:>8.1f}  {serial:>9.3f}  {parallel:>11.3f}  "
+            f"{serial / parallel:>6.2f}x"
+        )
+        if crossover is None and parallel < serial:
+            crossover = size_mb
+
+    if crossover is None:
+        print("在测试的大小范围内多进程没有更快，建议保持 DIFF_PARALLEL_THRESHOLD=0")
+    else:
+        print(f"交叉点: 约 {crossover} MB，可设置 DIFF_PARALLEL_THRESHOLD 为该大小")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+DiffParser 基准测试：parse_diff（每行一个 DiffLine）vs parse_diff_indexed（偏移量索引）
+
+对比解析耗时与解析结果占用的内存峰值（tracemalloc）。
+
+用法（在 src 目录下）：
+    python -m benchmarks.diff_parse --size-mb 20
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from benchmarks.synthetic import make_synthetic_diff
+from gitlab.diff_parser import DiffParser, format_diff_for_review
+
+
+def _measure(func):
+    """返回 (结果, 耗时秒, 内存峰值字节)，耗时不包含 tracemalloc 的开销"""
+    gc.collect()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DiffParser 基准测试")
+    parser.add_argument("--size-mb", type=float, default=20, help="diff 大小（MB）")
+    args = parser.parse_args()
+
+    content = make_synthetic_diff(int(args.size_mb * 1024 * 1024), lock_every=0)
+    raw = content.encode("utf-8")
+    size_mb = len(raw) / 1024 / 1024
+    diff_parser = DiffParser()
+
+    files, legacy_time, legacy_peak = _measure(lambda: diff_parser.parse_diff(content))
+    line_count = sum(len(hunk.lines) for file in files for hunk in file.hunks)
+    print(f"diff 大小: {size_mb:.1f} MB，{len(files)} 个文件，{line_count} 行")
+    print(
+        f"parse_diff: {legacy_time:.3f}s，内存峰值 {legacy_peak / 1024 / 1024:.1f} MB"
+    )
+    expected = format_diff_for_review(files)
+    del files
+
+    indexed, indexed_time, indexed_peak = _measure(
+        lambda: diff_parser.parse_diff_indexed(raw)
+    )
+    print(
+        f"parse_diff_indexed: {indexed_time:.3f}s，"
+        f"内存峰值 {indexed_peak / 1024 / 1024:.1f} MB"
+    )
+    assert format_diff_for_review(indexed) == expected, "两种解析结果不一致"
+    print(f"内存节省: {legacy_peak / indexed_peak:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
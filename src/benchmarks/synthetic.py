@@ -0,0 +1,53 @@
+"""生成用于基准测试的合成 diff"""
+
+from typing import List
+
+LOCK_FILES = ["pnpm-lock.yaml", "package-lock.json"]
+
+
+def make_file_section(path: str, index: int, lines_per_hunk: int = 40) -> str:
+    """生成一个文件的 diff section"""
+    lines = [
+        f"diff --git a/{path} b/{path}",
+        f"index {index:07x}..{index + 1:07x} 100644",
+        f"--- a/{path}",
+        f"+++ b/{path}",
+        f"@@ -{index},{lines_per_hunk // 2 + 1} +{index},{lines_per_hunk + 1} @@",
+        " import os",
+    ]
+    lines.extend(
+        f"-    old_value_{k} = compute({k})" for k in range(lines_per_hunk // 2)
+    )
+    lines.extend(
+        f"+    new_value_{k} = compute({k}, flag=True)  # line {k}"
+        for k in range(lines_per_hunk)
+    )
+    return "\n".join(lines) + "\n"
+
+
+def make_synthetic_diff(
+    size_bytes: int,
+    lock_every: int = 20,
+    lines_per_hunk: int = 40,
+) -> str:
+    """
+    生成大约 size_bytes 大小的 raw diff
+
+    Args:
+        size_bytes: 目标大小
+        lock_every: 每隔多少个文件插入一个锁文件（会被过滤），0 表示不插入
+        lines_per_hunk: 每个文件新增的行数
+    """
+    parts: List[str] = []
+    total = 0
+    index = 0
+    while total < size_bytes:
+        if lock_every and index % lock_every == lock_every - 1:
+            path = f"packages/pkg_{index}/{LOCK_FILES[index % len(LOCK_FILES)]}"
+        else:
+            path = f"src/module_{index % 50}/file_{index}.py"
+        section = make_file_section(path, index, lines_per_hunk)
+        parts.append(section)
+        total += len(section)
+        index += 1
+    return "".join(parts)
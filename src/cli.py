@@ -1,42 +1,30 @@
 #!/usr/bin/env python3
 import argparse
-import asyncio
 import os
 import sys
 import time
 from pathlib import Path
 
-import requests
-
 try:
     import tomllib
 except ImportError:
     import tomli as tomllib
 
-from pocketflow import AsyncFlow
-
-from gitlab.merge_request import (
-    create_merge_request,
-    get_merge_request_by_source_branch,
-    get_project_by_path,
-    get_user_by_username,
-)
-from gitlab.util import (
-    get_current_git_branch,
-    get_git_remote_project_path,
-    push_current_branch,
-)
-from gitlab.weekly import (
-    fetch_recent_merge_requests,
-    get_current_user_info,
-    print_merge_requests_summary,
-)
-from workflow.code_review import CodeReviewMergeRequest
-from workflow.summary_merge_request import SummaryMergeRequest
+from utils.profiler import profiler
+
+# 子命令依赖的模块（requests、openai、pocketflow 及各个工作流）在命令执行时才导入，
+# 使 version、--help 等命令无需加载它们，也无需配置 GitLab / OpenAI 凭证
 
 
 def get_mr_url_from_current_branch() -> str:
     """根据当前分支获取对应的 MR URL"""
+    from gitlab.graphql import find_merge_request_url_by_branch, use_graphql
+    from gitlab.merge_request import (
+        get_merge_request_by_source_branch,
+        get_project_by_path,
+    )
+    from gitlab.util import get_current_git_branch, get_git_remote_project_path
+
     try:
         # 获取当前分支名
         current_branch = get_current_git_branch()
@@ -46,6 +34,12 @@ def get_mr_url_from_current_branch() -> str:
         project_path = get_git_remote_project_path()
         print(f"项目路径: {project_path}")
 
+        # GraphQL 一次请求即可根据分支找到 MR
+        if use_graphql():
+            mr_url = find_merge_request_url_by_branch(project_path, current_branch)
+            print(f"找到对应的 MR: {mr_url}")
+            return mr_url
+
         # 获取项目信息
         project_info = get_project_by_path(project_path)
         project_id = str(project_info["id"])
@@ -77,6 +71,23 @@ def get_version():
 
 async def cmd_create(target_branch: str = "master", assignee: str = None):
     """执行 create 命令逻辑 - 创建 MR 并自动分析"""
+    import requests
+
+    from gitlab.merge_request import (
+        create_merge_request,
+        get_merge_request_by_source_branch,
+        get_project_by_path,
+        get_user_by_username,
+    )
+    from gitlab.util import (
+        get_current_git_branch,
+        get_git_remote_project_path,
+        push_current_branch,
+    )
+    from gitlab.weekly import get_current_user_info
+
+    # .env 在导入 gitlab 模块时才加载，因此在这里读取默认指派人
+    assignee = assignee or os.getenv("GITLAB_ASSIGNEE")
 
     try:
         # 获取当前分支名
@@ -182,6 +193,8 @@ def cmd_version():
 
 def cmd_weekly():
     """执行 weekly 命令逻辑"""
+    from gitlab.weekly import fetch_recent_merge_requests, print_merge_requests_summary
+
     try:
         # 获取最近7天的MR
         recent_mrs = fetch_recent_merge_requests()
@@ -196,6 +209,10 @@ def cmd_weekly():
 
 async def cmd_merge(url: str = None):
     """执行 merge 命令逻辑"""
+    from pocketflow import AsyncFlow
+
+    from workflow.summary_merge_request import SummaryMergeRequest
+
     try:
         # 如果没有提供 URL，则根据当前分支获取
         if not url:
@@ -216,6 +233,10 @@ async def cmd_merge(url: str = None):
 
 async def cmd_code_review(url: str = None):
     """执行代码审查命令逻辑"""
+    from pocketflow import AsyncFlow
+
+    from workflow.code_review import CodeReviewMergeRequest
+
     try:
         # 如果没有提供 URL，则根据当前分支获取
         if not url:
@@ -235,6 +256,13 @@ async def cmd_code_review(url: str = None):
         sys.exit(1)
 
 
+def _run(coro):
+    """在新的事件循环中执行异步命令"""
+    import asyncio
+
+    return asyncio.run(coro)
+
+
 def main():
     """主入口函数"""
     parser = argparse.ArgumentParser(
@@ -243,14 +271,43 @@ def main():
 
     subparsers = parser.add_subparsers(dest="command", help="可用命令")
 
+    # 所有子命令共享的性能分析参数
+    profile_parser = argparse.ArgumentParser(add_help=False)
+    profile_parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="退出时输出各阶段与各接口的耗时统计",
+    )
+    profile_parser.add_argument(
+        "--profile-json",
+        metavar="PATH",
+        help="将耗时统计与原始请求记录写入 JSON 文件",
+    )
+
+    # 调用 LLM 的子命令共享的参数
+    llm_parser = argparse.ArgumentParser(add_help=False)
+    llm_parser.add_argument(
+        "--no-llm-cache",
+        action="store_true",
+        help="不使用 LLM 响应缓存，总是重新调用模型",
+    )
+
     # version 子命令
-    _version_parser = subparsers.add_parser("version", help="显示版本信息")
+    _version_parser = subparsers.add_parser(
+        "version", help="显示版本信息", parents=[profile_parser]
+    )
 
     # weekly 子命令
-    _weekly_parser = subparsers.add_parser("weekly", help="获取最近7天的 MR 摘要")
+    _weekly_parser = subparsers.add_parser(
+        "weekly", help="获取最近7天的 MR 摘要", parents=[profile_parser]
+    )
 
     # merge 子命令
-    merge_parser = subparsers.add_parser("merge", help="为指定的 MR 生成摘要并评论")
+    merge_parser = subparsers.add_parser(
+        "merge",
+        help="为指定的 MR 生成摘要并评论",
+        parents=[profile_parser, llm_parser],
+    )
     merge_parser.add_argument(
         "url",
         nargs="?",
@@ -259,21 +316,32 @@ def main():
 
     # code-review 子命令
     review_parser = subparsers.add_parser(
-        "code-review", help="对指定的 MR 进行代码审查"
+        "code-review",
+        help="对指定的 MR 进行代码审查",
+        parents=[profile_parser, llm_parser],
     )
     review_parser.add_argument(
         "url",
         nargs="?",
         help="GitLab Merge Request URL (可选，如果为空则根据当前分支获取对应的 MR)",
     )
+    review_parser.add_argument(
+        "--full-review",
+        action="store_true",
+        help="不沿用上次的审查结果，重新审查全部文件（仍会保存本次的审查状态）",
+    )
 
     # create 子命令
-    create_parser = subparsers.add_parser("create", help="创建 MR 并自动分析")
+    create_parser = subparsers.add_parser(
+        "create", help="创建 MR 并自动分析", parents=[profile_parser, llm_parser]
+    )
     create_parser.add_argument(
         "target_branch", nargs="?", default="master", help="目标分支 (默认: master)"
     )
     create_parser.add_argument(
-        "assignee", nargs="?", default=os.getenv("GITLAB_ASSIGNEE"), help="指派人"
+        "assignee",
+        nargs="?",
+        help="指派人 (默认: 环境变量 GITLAB_ASSIGNEE，未设置时为当前用户)",
     )
 
     # 解析参数
@@ -283,17 +351,34 @@ def main():
         parser.print_help()
         sys.exit(1)
 
-    # 执行对应的命令
-    if args.command == "version":
-        cmd_version()
-    elif args.command == "weekly":
-        cmd_weekly()
-    elif args.command == "merge":
-        asyncio.run(cmd_merge(args.url))
-    elif args.command == "code-review":
-        asyncio.run(cmd_code_review(args.url))
-    elif args.command == "create":
-        asyncio.run(cmd_create(args.target_branch, args.assignee))
+    if args.profile or args.profile_json:
+        profiler.enable()
+
+    # LLM 响应缓存在首次调用时根据环境变量创建
+    if getattr(args, "no_llm_cache", False):
+        os.environ["LLM_CACHE"] = "0"
+    # 全量审查不读取上次的状态，审查完成后仍保存本次的状态
+    if getattr(args, "full_review", False):
+        os.environ["CODE_REVIEW_FULL"] = "1"
+
+    # 执行对应的命令，命令失败（sys.exit）时也输出性能统计
+    try:
+        with profiler.stage(args.command):
+            if args.command == "version":
+                cmd_version()
+            elif args.command == "weekly":
+                cmd_weekly()
+            elif args.command == "merge":
+                _run(cmd_merge(args.url))
+            elif args.command == "code-review":
+                _run(cmd_code_review(args.url))
+            elif args.command == "create":
+                _run(cmd_create(args.target_branch, args.assignee))
+    finally:
+        if args.profile:
+            print(profiler.report(), file=sys.stderr)
+        if args.profile_json:
+            profiler.write_json(args.profile_json)
 
 
 if __name__ == "__main__":
@@ -1,21 +1,50 @@
+import functools
 import os
+from typing import Dict, Tuple
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
-base_url = os.getenv("GITLAB_BASE_URL")
 
-if not base_url:
-    raise RuntimeError("GITLAB_BASE_URL 未设置，请配置 GITLAB_BASE_URL 环境变量")
+@functools.lru_cache(maxsize=None)
+def get_gitlab_config() -> Tuple[str, str]:
+    """
+    读取 GitLab 配置，首次调用时校验环境变量
 
-base_url = f"{base_url}/api/v4"
+    Returns:
+        Tuple[str, str]: (API 地址, PRIVATE-TOKEN)，API 地址形如 https://gitlab.com/api/v4
 
-token = os.getenv("GITLAB_PRIVATE_TOKEN")
+    Raises:
+        RuntimeError: GITLAB_BASE_URL 或 GITLAB_PRIVATE_TOKEN 未设置
+    """
+    base_url = os.getenv("GITLAB_BASE_URL")
 
-if not token:
-    raise RuntimeError(
-        "GitLab PRIVATE-TOKEN 未设置，请配置 GITLAB_PRIVATE_TOKEN 环境变量"
-    )
+    if not base_url:
+        raise RuntimeError("GITLAB_BASE_URL 未设置，请配置 GITLAB_BASE_URL 环境变量")
 
-headers = {"PRIVATE-TOKEN": token}
+    token = os.getenv("GITLAB_PRIVATE_TOKEN")
+
+    if not token:
+        raise RuntimeError(
+            "GitLab PRIVATE-TOKEN 未设置，请配置 GITLAB_PRIVATE_TOKEN 环境变量"
+        )
+
+    return f"{base_url}/api/v4", token
+
+
+def get_headers() -> Dict[str, str]:
+    """GitLab 请求头"""
+    _, token = get_gitlab_config()
+    return {"PRIVATE-TOKEN": token}
+
+
+def __getattr__(name: str):
+    # 兼容 from gitlab.auth import base_url, token, headers，访问时才读取配置
+    if name == "base_url":
+        return get_gitlab_config()[0]
+    if name == "token":
+        return get_gitlab_config()[1]
+    if name == "headers":
+        return get_headers()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,431 @@
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple, TypeVar, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from gitlab.auth import get_gitlab_config
+from gitlab.http_cache import HttpCache
+from gitlab.rate_limit import RETRY_STATUS_CODES, RateLimiter
+from utils.disk_cache import DEFAULT_CACHE_ROOT, DiskCache
+from utils.profiler import normalize_endpoint, profiler
+
+# 默认超时：(连接超时, 读取超时)，单位秒
+DEFAULT_TIMEOUT: Tuple[float, float] = (5.0, 60.0)
+DEFAULT_POOL_SIZE = 10
+# GitLab 单页允许的最大条数
+MAX_PER_PAGE = 100
+DEFAULT_HTTP_CACHE_SIZE_MB = 512
+
+Timeout = Union[float, Tuple[float, float], None]
+T = TypeVar("T")
+
+
+class GitLabClient:
+    """
+    GitLab API 客户端
+
+    基于 requests.Session 复用 TCP/TLS 连接，所有 GitLab 请求都应通过该客户端发出。
+    Session 的连接池由 urllib3 管理，可以在多个线程之间共享。
+    """
+
+    def __init__(
+        self,
+        api_url: str,
+        private_token: str,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: Timeout = DEFAULT_TIMEOUT,
+        http_cache: Optional[HttpCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+    ):
+        """
+        Args:
+            api_url: GitLab API 地址，如 https://gitlab.com/api/v4
+            private_token: GitLab PRIVATE-TOKEN
+            pool_size: 连接池大小（同一 host 的最大保持连接数）
+            timeout: 默认超时，可在单次调用中覆盖
+            http_cache: GET 请求的 ETag 缓存，为 None 时不缓存
+            rate_limiter: 请求调度器，为 None 时不限速也不重试
+        """
+        self.api_url = api_url.rstrip("/")
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.http_cache = http_cache
+        self.rate_limiter = rate_limiter
+
+        self.session = requests.Session()
+        self.session.headers.update(
+            {"PRIVATE-TOKEN": private_token, "Connection": "keep-alive"}
+        )
+
+        # pool_block=True：连接耗尽时等待空闲连接，而不是额外创建后丢弃
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def url(self, path: str) -> str:
+        """将 API 路径拼接为完整 URL，已是完整 URL 时原样返回"""
+        if path.startswith(("http://", "https://")):
+            return path
+        return f"{self.api_url}/{path.lstrip('/')}"
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        timeout: Timeout = None,
+        **kwargs: Any,
+    ) -> requests.Response:
+        """
+        发送请求
+
+        Args:
+            method: HTTP 方法
+            path: API 路径（如 /projects/1/merge_requests）或完整 URL
+            timeout: 本次请求的超时，为 None 时使用客户端默认值
+            **kwargs: 透传给 requests.Session.request 的参数（params、json、stream 等）
+        """
+        url = self.url(path)
+        timeout = timeout if timeout is not None else self.timeout
+        start = time.perf_counter()
+        response = None
+        try:
+            if method == "GET" and self.http_cache is not None:
+                response = self.http_cache.fetch(
+                    self._send, url, timeout=timeout, **kwargs
+                )
+            else:
+                response = self._send(method, url, timeout=timeout, **kwargs)
+            return response
+        finally:
+            if profiler.enabled:
+                _profile_request(
+                    method, url, time.perf_counter() - start, response, kwargs
+                )
+
+    def _send(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        """发送请求，由 rate_limiter 调度，并在 429（GET 还包括 5xx）时重试"""
+        limiter = self.rate_limiter
+        if limiter is None:
+            return self.session.request(method, url, **kwargs)
+
+        attempt = 0
+        while True:
+            limiter.acquire()
+            response = self.session.request(method, url, **kwargs)
+            limiter.update(response.headers)
+
+            retryable = response.status_code == 429 or (
+                method == "GET" and response.status_code in RETRY_STATUS_CODES
+            )
+            if not retryable or attempt >= limiter.max_retries:
+                response.retries = attempt
+                return response
+
+            # backoff 会暂停所有线程的请求，下一轮 acquire 时等待
+            limiter.backoff(attempt, response.headers.get("Retry-After"))
+            response.close()
+            attempt += 1
+
+    def get(
+        self,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: Timeout = None,
+        **kwargs: Any,
+    ) -> requests.Response:
+        """发送 GET 请求"""
+        return self.request("GET", path, params=params, timeout=timeout, **kwargs)
+
+    def post(
+        self,
+        path: str,
+        json: Optional[Dict[str, Any]] = None,
+        timeout: Timeout = None,
+        **kwargs: Any,
+    ) -> requests.Response:
+        """发送 POST 请求"""
+        return self.request("POST", path, json=json, timeout=timeout, **kwargs)
+
+    @property
+    def graphql_url(self) -> str:
+        """GraphQL 地址，由 REST API 地址推导：https://host/api/v4 -> https://host/api/graphql"""
+        root = self.api_url.rsplit("/api/v4", 1)[0]
+        return f"{root}/api/graphql"
+
+    def graphql(
+        self,
+        query: str,
+        variables: Optional[Dict[str, Any]] = None,
+        timeout: Timeout = None,
+    ) -> Dict[str, Any]:
+        """
+        执行 GraphQL 查询
+
+        Returns:
+            响应中的 data 字段
+
+        Raises:
+            RuntimeError: GraphQL 返回 errors 时
+        """
+        response = self.post(
+            self.graphql_url,
+            json={"query": query, "variables": variables or {}},
+            timeout=timeout,
+        )
+        response.raise_for_status()
+        payload = response.json()
+        if payload.get("errors"):
+            messages = "; ".join(
+                error.get("message", "") for error in payload["errors"]
+            )
+            raise RuntimeError(f"GitLab GraphQL 请求失败: {messages}")
+        return payload["data"]
+
+    def paginate(
+        self,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        per_page: int = MAX_PER_PAGE,
+        max_workers: Optional[int] = None,
+    ) -> Iterator[Any]:
+        """
+        遍历分页接口的所有条目
+
+        首页返回 X-Total-Pages 时，剩余页面并发获取并按页码顺序产出；
+        否则（如 keyset 分页或超过 10000 条时 GitLab 不返回总页数）
+        依次跟随 Link rel="next" 或 X-Next-Page 获取下一页。
+
+        Args:
+            path: API 路径
+            params: 查询参数，keyset 分页可传入 {"pagination": "keyset", ...}
+            per_page: 每页条数，默认 100
+            max_workers: 并发获取的最大线程数，默认与连接池大小一致
+
+        Yields:
+            每一页 JSON 数组中的条目
+        """
+        params = {"per_page": per_page, **(params or {})}
+
+        response = self.get(path, params=params)
+        response.raise_for_status()
+        yield from response.json()
+
+        current_page = _int_header(response, "X-Page") or 1
+        total_pages = _int_header(response, "X-Total-Pages")
+
+        if total_pages and total_pages > current_page:
+            pages = range(current_page + 1, total_pages + 1)
+            executor = ThreadPoolExecutor(
+                max_workers=min(max_workers or self.pool_size, len(pages))
+            )
+            try:
+                # 按页码顺序产出，同时后续页面已在后台并发获取；
+                # 复制 contextvars，使后台请求也归属到当前的性能分析阶段
+                futures = [
+                    executor.submit(
+                        contextvars.copy_context().run,
+                        self._get_page,
+                        path,
+                        {**params, "page": page},
+                    )
+                    for page in pages
+                ]
+                for future in futures:
+                    yield from future.result()
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+            return
+
+        while True:
+            next_url = response.links.get("next", {}).get("url")
+            next_page = response.headers.get("X-Next-Page")
+            if next_url:
+                # Link 中的 URL 已包含全部查询参数（keyset 分页只能使用这种方式）
+                response = self.get(next_url)
+            elif next_page:
+                response = self.get(path, params={**params, "page": next_page})
+            else:
+                break
+            response.raise_for_status()
+            yield from response.json()
+
+    def _get_page(self, path: str, params: Dict[str, Any]) -> list:
+        response = self.get(path, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    def close(self):
+        """关闭 Session 并释放连接池"""
+        self.session.close()
+
+
+def _int_header(response: requests.Response, name: str) -> Optional[int]:
+    """读取整数类型的响应头，不存在或为空时返回 None"""
+    value = response.headers.get(name)
+    return int(value) if value else None
+
+
+def _profile_request(
+    method: str,
+    url: str,
+    latency: float,
+    response: Optional[requests.Response],
+    kwargs: Dict[str, Any],
+):
+    """记录一次请求的耗时、流量、重试与缓存命中情况"""
+    bytes_out = 0
+    if kwargs.get("json") is not None:
+        bytes_out = len(json.dumps(kwargs["json"]).encode("utf-8"))
+    elif isinstance(kwargs.get("data"), (str, bytes)):
+        bytes_out = len(kwargs["data"])
+
+    bytes_in = 0
+    if response is not None:
+        if kwargs.get("stream"):
+            # 流式响应此时尚未读取，只能使用 Content-Length
+            bytes_in = _int_header(response, "Content-Length") or 0
+        else:
+            bytes_in = len(response.content or b"")
+
+    profiler.record_request(
+        "gitlab",
+        normalize_endpoint(method, url),
+        response.status_code if response is not None else None,
+        latency,
+        bytes_in=bytes_in,
+        bytes_out=bytes_out,
+        retries=getattr(response, "retries", 0),
+        cache_hit=getattr(response, "from_cache", False),
+    )
+
+
+def _parse_timeout(value: Optional[str]) -> Timeout:
+    """解析超时配置，支持 "30" 或 "5,60"（连接超时,读取超时）"""
+    if not value:
+        return DEFAULT_TIMEOUT
+    parts = [float(part) for part in value.split(",")]
+    if len(parts) == 1:
+        return parts[0]
+    return parts[0], parts[1]
+
+
+def _build_http_cache(private_token: str) -> Optional[HttpCache]:
+    """根据环境变量创建 ETag 缓存，GITLAB_HTTP_CACHE=0 时关闭"""
+    if os.getenv("GITLAB_HTTP_CACHE", "1").lower() in ("0", "false", "no"):
+        return None
+    directory = os.getenv("GITLAB_HTTP_CACHE_DIR") or DEFAULT_CACHE_ROOT / "http"
+    size_mb = int(os.getenv("GITLAB_HTTP_CACHE_SIZE_MB") or DEFAULT_HTTP_CACHE_SIZE_MB)
+    return HttpCache(
+        DiskCache(directory, max_bytes=size_mb * 1024 * 1024),
+        namespace=HttpCache.namespace_for_token(private_token),
+    )
+
+
+def _build_rate_limiter() -> RateLimiter:
+    return RateLimiter(
+        rate=float(os.getenv("GITLAB_RATE_LIMIT") or 10),
+        burst=int(os.getenv("GITLAB_RATE_BURST") or 20),
+        max_retries=int(os.getenv("GITLAB_MAX_RETRIES") or 5),
+    )
+
+
+_client: Optional[GitLabClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> GitLabClient:
+    """
+    获取进程内共享的 GitLabClient
+
+    连接池大小、超时、缓存与限速可通过环境变量配置：
+    - GITLAB_POOL_SIZE: 连接池大小，默认 10
+    - GITLAB_TIMEOUT: 超时秒数，如 "30" 或 "5,60"
+    - GITLAB_HTTP_CACHE: 设为 0 关闭 ETag 缓存，默认开启
+    - GITLAB_HTTP_CACHE_DIR: 缓存目录，默认 ~/.cache/gitlab-merge-request-bot/http
+    - GITLAB_HTTP_CACHE_SIZE_MB: 缓存大小上限，默认 512
+    - GITLAB_RATE_LIMIT / GITLAB_RATE_BURST: 每秒请求数与突发容量，默认 10 / 20
+    - GITLAB_MAX_RETRIES: 429 / 5xx 的最大重试次数，默认 5
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                api_url, private_token = get_gitlab_config()
+                _client = GitLabClient(
+                    api_url,
+                    private_token,
+                    pool_size=int(os.getenv("GITLAB_POOL_SIZE") or DEFAULT_POOL_SIZE),
+                    timeout=_parse_timeout(os.getenv("GITLAB_TIMEOUT")),
+                    http_cache=_build_http_cache(private_token),
+                    rate_limiter=_build_rate_limiter(),
+                )
+    return _client
+
+
+class AsyncGitLabClient:
+    """
+    GitLab API 的 asyncio 接口
+
+    阻塞的 requests 调用在线程池中执行，与同步接口共享同一个连接池，
+    因此多个相互独立的请求可以通过 asyncio.gather 并发执行而不会阻塞事件循环。
+    并发数受 max_concurrency 限制，默认与连接池大小一致。
+    """
+
+    def __init__(
+        self,
+        client: Optional[GitLabClient] = None,
+        max_concurrency: Optional[int] = None,
+    ):
+        self._client = client
+        self._max_concurrency = max_concurrency
+        # asyncio.Semaphore 绑定事件循环，按循环分别创建
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    @property
+    def client(self) -> GitLabClient:
+        return self._client or get_client()
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            limit = self._max_concurrency or self.client.pool_size
+            semaphore = asyncio.Semaphore(limit)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        在线程池中执行一个同步的 GitLab 调用，如 get_merge_request_raw_diff
+
+        Args:
+            func: 同步函数
+            *args, **kwargs: 透传给 func 的参数
+        """
+        async with self._get_semaphore():
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+    async def request(self, method: str, path: str, **kwargs: Any):
+        """异步发送请求，参数同 GitLabClient.request"""
+        return await self.run(self.client.request, method, path, **kwargs)
+
+    async def get(self, path: str, params: Optional[Dict[str, Any]] = None, **kwargs):
+        """异步发送 GET 请求"""
+        return await self.request("GET", path, params=params, **kwargs)
+
+    async def post(self, path: str, json: Optional[Dict[str, Any]] = None, **kwargs):
+        """异步发送 POST 请求"""
+        return await self.request("POST", path, json=json, **kwargs)
+
+
+async_client = AsyncGitLabClient()
@@ -1,6 +1,6 @@
-import requests
+from typing import Iterator
 
-from gitlab.auth import base_url, headers
+from gitlab.client import get_client
 from gitlab.merge_request import parse_merge_request_url
 
 
@@ -16,12 +16,24 @@ def create_comment(project_id: str, mr_number: str, content: str):
         mr_number: The number of the merge request
     """
     # POST /projects/:id/merge_requests/:merge_request_iid/notes
-    url = f"{base_url}/projects/{project_id}/merge_requests/{mr_number}/notes"
-    response = requests.post(url, headers=headers, json={"body": content})
+    path = f"/projects/{project_id}/merge_requests/{mr_number}/notes"
+    response = get_client().post(path, json={"body": content})
     response.raise_for_status()
     return response.json()
 
 
+def iter_comments(
+    project_id: str, mr_number: str, sort="desc", order_by="created_at"
+) -> Iterator[dict]:
+    """
+    ref: https://docs.gitlab.com/api/notes/#list-merge-request-notes
+
+    逐条获取 Merge Request 的评论（自动翻页），参数同 get_comment
+    """
+    path = f"/projects/{project_id}/merge_requests/{mr_number}/notes"
+    return get_client().paginate(path, params={"sort": sort, "order_by": order_by})
+
+
 def get_comment(project_id: str, mr_number: str, sort="desc", order_by="created_at"):
     """
     ref: https://docs.gitlab.com/api/notes/#list-merge-request-notes
@@ -34,12 +46,7 @@ def get_comment(project_id: str, mr_number: str, sort="desc", order_by="created_
         sort: Return merge request notes sorted in asc or desc order. Default is desc
         order_by: Return merge request notes ordered by created_at or updated_at fields. Default is created_at
     """
-    url = f"{base_url}/projects/{project_id}/merge_requests/{mr_number}/notes"
-    response = requests.get(
-        url, headers=headers, params={"sort": sort, "order_by": order_by}
-    )
-    response.raise_for_status()
-    return response.json()
+    return list(iter_comments(project_id, mr_number, sort, order_by))
 
 
 def get_merge_request_versions(project_id: str, mr_number: str):
@@ -53,8 +60,8 @@ def get_merge_request_versions(project_id: str, mr_number: str):
     Returns:
         List of version objects containing SHA information
     """
-    url = f"{base_url}/projects/{project_id}/merge_requests/{mr_number}/versions"
-    response = requests.get(url, headers=headers)
+    path = f"/projects/{project_id}/merge_requests/{mr_number}/versions"
+    response = get_client().get(path)
     response.raise_for_status()
     return response.json()
 
@@ -68,8 +75,8 @@ def create_discussion(project_id: str, mr_number: str, content: str):
         mr_number: The number of the merge request
         content: The content of the discussion
     """
-    url = f"{base_url}/projects/{project_id}/merge_requests/{mr_number}/discussions"
-    response = requests.post(url, headers=headers, json={"body": content})
+    path = f"/projects/{project_id}/merge_requests/{mr_number}/discussions"
+    response = get_client().post(path, json={"body": content})
     response.raise_for_status()
     return response.json()
 
@@ -84,6 +91,8 @@ def create_diff_discussion(
     base_sha: str = None,
     head_sha: str = None,
     start_sha: str = None,
+    old_line: int = None,
+    old_path: str = None,
 ):
     """
     创建行级讨论（diff note）
@@ -98,6 +107,8 @@ def create_diff_discussion(
         base_sha: Base commit SHA (if not provided, will be fetched)
         head_sha: Head commit SHA (if not provided, will be fetched)
         start_sha: Start commit SHA (if not provided, will be fetched)
+        old_line: 原文件行号，line_type 为 "both" 时使用，默认与 line_number 相同
+        old_path: 原文件路径，重命名的文件需要传入，默认与 file_path 相同
     """
     # 如果没有提供 SHA 值，则获取最新的版本信息
     if not all([base_sha, head_sha, start_sha]):
@@ -108,7 +119,7 @@ def create_diff_discussion(
             head_sha = head_sha or latest_version.get("head_commit_sha")
             start_sha = start_sha or latest_version.get("start_commit_sha")
 
-    url = f"{base_url}/projects/{project_id}/merge_requests/{mr_number}/discussions"
+    path = f"/projects/{project_id}/merge_requests/{mr_number}/discussions"
 
     # 构建 position 参数
     position = {
@@ -116,7 +127,7 @@ def create_diff_discussion(
         "base_sha": base_sha,
         "head_sha": head_sha,
         "start_sha": start_sha,
-        "old_path": file_path,
+        "old_path": old_path or file_path,
         "new_path": file_path,
     }
 
@@ -127,15 +138,27 @@ def create_diff_discussion(
         position["old_line"] = line_number
     else:  # both (unchanged line)
         position["new_line"] = line_number
-        position["old_line"] = line_number
+        position["old_line"] = old_line or line_number
 
     data = {"body": content, "position": position}
 
-    response = requests.post(url, headers=headers, json=data)
+    response = get_client().post(path, json=data)
     response.raise_for_status()
     return response.json()
 
 
+def iter_discussions(project_id: str, mr_number: str) -> Iterator[dict]:
+    """
+    逐条获取 Merge Request 的讨论（自动翻页）
+
+    Args:
+        project_id: The ID of the project
+        mr_number: The number of the merge request
+    """
+    path = f"/projects/{project_id}/merge_requests/{mr_number}/discussions"
+    return get_client().paginate(path)
+
+
 def get_discussions(project_id: str, mr_number: str):
     """
     获取 Merge Request 的所有讨论
@@ -144,10 +167,7 @@ def get_discussions(project_id: str, mr_number: str):
         project_id: The ID of the project
         mr_number: The number of the merge request
     """
-    url = f"{base_url}/projects/{project_id}/merge_requests/{mr_number}/discussions"
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    return response.json()
+    return list(iter_discussions(project_id, mr_number))
 
 
 # todo 为 Merge Request 创建 Thread 讨论
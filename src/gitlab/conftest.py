@@ -0,0 +1,20 @@
+import pytest
+
+from gitlab.client import GitLabClient
+from gitlab.fake_server import FakeGitLabConfig, FakeGitLabServer
+from gitlab.rate_limit import RateLimiter
+
+
+@pytest.fixture
+def fake_gitlab(request, monkeypatch):
+    """启动模拟服务，并让 get_client() 返回指向它的客户端"""
+    config = getattr(request, "param", None) or FakeGitLabConfig()
+    with FakeGitLabServer(config) as server:
+        client = GitLabClient(
+            server.api_url,
+            "fake-token",
+            rate_limiter=RateLimiter(rate=1000, burst=100, max_retries=3),
+        )
+        monkeypatch.setattr("gitlab.client._client", client)
+        yield server
+        client.close()
@@ -0,0 +1,261 @@
+"""
+解析后 diff 的磁盘缓存
+
+以 项目 + MR + head_commit_sha + 过滤规则 为 key，保存过滤后的原始 diff 与解析出的 DiffFile 列表，
+内容为 zlib 压缩的 pickle。MR 没有新提交时，merge 与 code-review 以及重复运行都不再下载与解析 diff。
+缓存总大小超过上限时按 LRU 淘汰（见 DiskCache）。
+
+环境变量：
+    GITLAB_DIFF_CACHE: 设为 0 关闭，默认开启
+    GITLAB_DIFF_CACHE_DIR: 缓存目录，默认 ~/.cache/gitlab-merge-request-bot/diff
+    GITLAB_DIFF_CACHE_SIZE_MB: 缓存大小上限，默认 256
+"""
+
+import functools
+import os
+import pickle
+import zlib
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from gitlab.auth import get_gitlab_config
+from gitlab.diff_parallel import parse_and_format_diff, parse_and_format_lines
+from gitlab.diff_parser import DiffFile, format_diff_for_review
+from gitlab.diff_source import (
+    DIFF_SOURCE_API,
+    get_diff_source,
+    iter_merge_request_diff_lines,
+)
+from gitlab.generated_detector import files_for_review, mark_generated_files
+from gitlab.http_cache import HttpCache
+from gitlab.util import get_skip_files
+from utils.disk_cache import DEFAULT_CACHE_ROOT, DiskCache, make_cache_key
+
+DEFAULT_DIFF_CACHE_SIZE_MB = 256
+
+# DiffFile 等结构变化时递增，旧条目自然失效
+CACHE_FORMAT_VERSION = 2
+
+
+@dataclass
+class CachedDiff:
+    """缓存的 diff"""
+
+    raw_diff: str
+    # 只获取原始 diff 的调用方（如 merge）不解析，此时为 None
+    diff_files: Optional[List[DiffFile]] = None
+    # DIFF_SOURCE=api 时 merge 不获取 too_large 文件的内容，此时为 False，code-review 不使用
+    complete: bool = True
+
+
+class DiffCache:
+    """按 head_commit_sha 缓存过滤后的原始 diff 与解析结果"""
+
+    def __init__(self, disk_cache: DiskCache, namespace: str = ""):
+        """
+        Args:
+            disk_cache: 底层磁盘缓存
+            namespace: 缓存命名空间，用于隔离不同 GitLab 实例与 token
+        """
+        self.disk_cache = disk_cache
+        self.namespace = namespace
+
+    def key(
+        self,
+        project_id: str,
+        mr_number: str,
+        head_sha: str,
+        files_to_filter: Optional[List[str]] = None,
+    ) -> str:
+        patterns = sorted(files_to_filter or get_skip_files())
+        return make_cache_key(
+            "diff",
+            CACHE_FORMAT_VERSION,
+            self.namespace,
+            str(project_id),
+            str(mr_number),
+            head_sha,
+            patterns,
+        )
+
+    def get(
+        self,
+        project_id: str,
+        mr_number: str,
+        head_sha: Optional[str],
+        files_to_filter: Optional[List[str]] = None,
+    ) -> Optional[CachedDiff]:
+        """
+        读取缓存，head_sha 为空或条目不存在、已损坏、无法读取时返回 None
+        """
+        if not head_sha:
+            return None
+        try:
+            entry = self.disk_cache.get(
+                self.key(project_id, mr_number, head_sha, files_to_filter)
+            )
+        except OSError:
+            return None
+        if entry is None:
+            return None
+        _, body = entry
+        try:
+            raw_diff, diff_files, complete = pickle.loads(zlib.decompress(body))
+        except Exception:
+            return None
+        return CachedDiff(raw_diff=raw_diff, diff_files=diff_files, complete=complete)
+
+    def put(
+        self,
+        project_id: str,
+        mr_number: str,
+        head_sha: Optional[str],
+        raw_diff: str,
+        diff_files: Optional[List[DiffFile]] = None,
+        files_to_filter: Optional[List[str]] = None,
+        complete: bool = True,
+    ):
+        """写入缓存，head_sha 为空时不写入；缓存只是加速手段，写入失败时忽略"""
+        if not head_sha:
+            return
+        body = zlib.compress(
+            pickle.dumps(
+                (raw_diff, diff_files, complete), protocol=pickle.HIGHEST_PROTOCOL
+            ),
+            1,
+        )
+        try:
+            self.disk_cache.put(
+                self.key(project_id, mr_number, head_sha, files_to_filter),
+                body,
+                {"project_id": str(project_id), "mr_number": str(mr_number)},
+            )
+        except OSError:
+            pass
+
+
+@functools.lru_cache(maxsize=1)
+def get_diff_cache() -> Optional[DiffCache]:
+    """根据环境变量创建 diff 缓存，GITLAB_DIFF_CACHE=0 时返回 None"""
+    if os.getenv("GITLAB_DIFF_CACHE", "1").lower() in ("0", "false", "no"):
+        return None
+    directory = os.getenv("GITLAB_DIFF_CACHE_DIR") or DEFAULT_CACHE_ROOT / "diff"
+    size_mb = int(os.getenv("GITLAB_DIFF_CACHE_SIZE_MB") or DEFAULT_DIFF_CACHE_SIZE_MB)
+    api_url, private_token = get_gitlab_config()
+    return DiffCache(
+        DiskCache(directory, max_bytes=size_mb * 1024 * 1024),
+        namespace=HttpCache.namespace_for_token(f"{api_url}\n{private_token}"),
+    )
+
+
+def load_merge_request_raw_diff(
+    project_id: str,
+    mr_number: str,
+    head_sha: Optional[str],
+    files_to_filter: Optional[List[str]] = None,
+    base_sha: Optional[str] = None,
+    fetch_truncated: bool = True,
+) -> str:
+    """
+    获取过滤后的 MR 原始差异，head_sha 对应的缓存存在时不再下载
+
+    Args:
+        project_id: 项目 ID
+        mr_number: MR 编号
+        head_sha: 最新版本的 head_commit_sha，为空时不使用缓存
+        files_to_filter: 需要过滤的文件，为空时使用 SKIP_FILES
+        base_sha: 最新版本的 base_commit_sha，DIFF_SOURCE=api 时用于获取过大的文件
+        fetch_truncated: DIFF_SOURCE=api 时是否获取 too_large 文件的内容，为 False 时只保留文件头
+    """
+    diff_cache = get_diff_cache()
+    cached = (
+        diff_cache.get(project_id, mr_number, head_sha, files_to_filter)
+        if diff_cache
+        else None
+    )
+    if cached is not None and (cached.complete or not fetch_truncated):
+        return cached.raw_diff
+
+    raw_diff = "\n".join(
+        iter_merge_request_diff_lines(
+            project_id, mr_number, files_to_filter, base_sha, head_sha, fetch_truncated
+        )
+    )
+    if diff_cache:
+        diff_cache.put(
+            project_id,
+            mr_number,
+            head_sha,
+            raw_diff,
+            files_to_filter=files_to_filter,
+            complete=fetch_truncated or get_diff_source() != DIFF_SOURCE_API,
+        )
+    return raw_diff
+
+
+def load_merge_request_diff_files(
+    project_id: str,
+    mr_number: str,
+    head_sha: Optional[str],
+    files_to_filter: Optional[List[str]] = None,
+    base_sha: Optional[str] = None,
+) -> Tuple[List[DiffFile], str]:
+    """
+    获取解析并格式化后的 MR 差异，head_sha 对应的缓存存在时不再下载与解析
+
+    缓存未命中时按 DIFF_SOURCE 边下载边解析（超大 diff 使用多进程），完成后把原始 diff 与解析结果写入缓存。
+
+    Returns:
+        Tuple[List[DiffFile], str]: 解析出的文件与 format_diff_for_review 的结果
+    """
+    diff_cache = get_diff_cache()
+    cached = (
+        diff_cache.get(project_id, mr_number, head_sha, files_to_filter)
+        if diff_cache
+        else None
+    )
+    if cached is not None and not cached.complete:
+        # merge 写入的 diff 缺少 too_large 文件的内容，重新获取
+        cached = None
+    if cached is not None and cached.diff_files is not None:
+        # 生成文件的识别规则可能已变化，命中缓存时重新识别
+        diff_files = cached.diff_files
+        mark_generated_files(diff_files)
+        return diff_files, format_diff_for_review(files_for_review(diff_files))
+    if cached is not None:
+        # 只缓存了原始 diff（由 merge 写入），解析后补全缓存
+        diff_files, formatted_diff = parse_and_format_diff(cached.raw_diff)
+        diff_cache.put(
+            project_id,
+            mr_number,
+            head_sha,
+            cached.raw_diff,
+            diff_files,
+            files_to_filter,
+        )
+        return diff_files, formatted_diff
+
+    lines = iter_merge_request_diff_lines(
+        project_id, mr_number, files_to_filter, base_sha, head_sha
+    )
+    if not (diff_cache and head_sha):
+        return parse_and_format_lines(lines)
+
+    # 解析的同时保留原始行，用于写入缓存
+    raw_lines: List[str] = []
+    diff_files, formatted_diff = parse_and_format_lines(_tee(lines, raw_lines))
+    diff_cache.put(
+        project_id,
+        mr_number,
+        head_sha,
+        "\n".join(raw_lines),
+        diff_files,
+        files_to_filter,
+    )
+    return diff_files, formatted_diff
+
+
+def _tee(lines: Iterable[str], sink: List[str]) -> Iterator[str]:
+    for line in lines:
+        sink.append(line)
+        yield line
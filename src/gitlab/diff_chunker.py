@@ -0,0 +1,275 @@
+"""
+按 token 预算把 diff 切成若干块，用于分块并发审查与分组摘要
+
+切分以文件为单位：按顺序把格式化后的文件装入当前块，装不下时开始新的一块；
+单个文件超过预算时按 hunk 拆开，每一块都带有文件标题，LLM 仍能知道行所属的文件；
+单个 hunk 仍超过预算时按行拆成多个 hunk，并重新计算每段的起始行号。
+生成摘要时直接切分原始 diff，同一目录的文件尽量放在同一组。
+
+没有引入 tokenizer 依赖，token 数按字符估算：ASCII 约 4 个字符一个 token，
+中文等非 ASCII 字符约一个字符一个 token，对于预算控制足够。
+"""
+
+import dataclasses
+import posixpath
+import re
+from typing import Any, Dict, Iterable, List, Tuple
+
+from gitlab.diff_parser import (
+    LINE_ADDED,
+    LINE_REMOVED,
+    DiffFile,
+    DiffHunk,
+    format_diff_for_review,
+)
+from gitlab.diff_source import file_header_lines
+
+# ASCII 文本平均每个 token 的字符数
+CHARS_PER_TOKEN = 4
+
+_FILE_HEADER = re.compile(r"^diff --git a/(.*?) b/(.*?)$")
+
+TRUNCATED_MARKER = "...（内容过长，已截断）"
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的 token 数"""
+    if text.isascii():
+        return len(text) // CHARS_PER_TOKEN + 1
+    # 非 ASCII 字符在 UTF-8 中多为 3 字节，每个多出 2 字节
+    non_ascii = (len(text.encode("utf-8")) - len(text)) // 2
+    return (len(text) - non_ascii) // CHARS_PER_TOKEN + non_ascii + 1
+
+
+def chunk_diff_files(
+    diff_files: List[DiffFile], token_budget: int, max_context_lines: int = 3
+) -> List[str]:
+    """
+    把文件格式化后按 token 预算分块
+
+    Args:
+        diff_files: 需要审查的文件，一般为 files_for_review 的结果
+        token_budget: 每块的 token 上限，小于等于 0 时不分块
+        max_context_lines: 同 format_diff_for_review
+
+    Returns:
+        List[str]: 每块格式化后的 diff，拼接起来与 format_diff_for_review 的结果相同
+            （超过预算被拆开的文件会重复输出文件标题）
+    """
+    return [
+        text for text, _ in pack_diff_files(diff_files, token_budget, max_context_lines)
+    ]
+
+
+def pack_diff_files(
+    diff_files: List[DiffFile], token_budget: int, max_context_lines: int = 3
+) -> List[Tuple[str, List[DiffFile]]]:
+    """
+    同 chunk_diff_files，同时返回每块包含的文件
+
+    Returns:
+        List[Tuple[str, List[DiffFile]]]: (格式化后的 diff, 块中的文件)，
+            被拆开的文件会出现在多个块中
+    """
+    if token_budget <= 0:
+        text = format_diff_for_review(diff_files, max_context_lines)
+        return [(text, list(diff_files))] if text else []
+
+    return _pack(
+        (
+            (text, diff_file)
+            for diff_file in diff_files
+            for text in _format_file_pieces(diff_file, token_budget, max_context_lines)
+        ),
+        token_budget,
+    )
+
+
+def _pack(
+    pieces: Iterable[Tuple[str, Any]], token_budget: int
+) -> List[Tuple[str, List[Any]]]:
+    """按顺序装箱，当前块装不下时开始新的一块，同时记录每块包含的来源"""
+    chunks: List[Tuple[str, List[Any]]] = []
+    current: List[str] = []
+    sources: List[Any] = []
+    current_tokens = 0
+    for text, source in pieces:
+        tokens = estimate_tokens(text)
+        if current and current_tokens + tokens > token_budget:
+            chunks.append(("\n".join(current), sources))
+            current, sources, current_tokens = [], [], 0
+        current.append(text)
+        if not sources or sources[-1] is not source:
+            sources.append(source)
+        current_tokens += tokens
+    if current:
+        chunks.append(("\n".join(current), sources))
+    return chunks
+
+
+def _format_file_pieces(
+    diff_file: DiffFile, token_budget: int, max_context_lines: int
+) -> List[str]:
+    """
+    格式化单个文件，超过预算时按 hunk 拆成多段，单个 hunk 超过预算时再按行拆开
+
+    只有单行本身超过预算时，该行所在的段才会超过预算
+    """
+    text = format_diff_for_review([diff_file], max_context_lines)
+    if not diff_file.hunks or estimate_tokens(text) <= token_budget:
+        return [text]
+
+    pieces: List[str] = []
+    hunks = []
+    tokens = 0
+    for original in diff_file.hunks:
+        # 每个 hunk 单独估算（含文件标题），略微高估，避免反复格式化整个文件
+        original_tokens = estimate_tokens(
+            _format_hunks(diff_file, [original], max_context_lines)
+        )
+        if original_tokens <= token_budget:
+            split = [(original, original_tokens)]
+        else:
+            split = [
+                (
+                    hunk,
+                    estimate_tokens(
+                        _format_hunks(diff_file, [hunk], max_context_lines)
+                    ),
+                )
+                for hunk in _split_hunk(
+                    diff_file, original, token_budget, max_context_lines
+                )
+            ]
+        for hunk, hunk_tokens in split:
+            if hunks and tokens + hunk_tokens > token_budget:
+                pieces.append(_format_hunks(diff_file, hunks, max_context_lines))
+                hunks, tokens = [], 0
+            hunks.append(hunk)
+            tokens += hunk_tokens
+    pieces.append(_format_hunks(diff_file, hunks, max_context_lines))
+    return pieces
+
+
+def _split_hunk(
+    diff_file: DiffFile, hunk: DiffHunk, token_budget: int, max_context_lines: int
+) -> List[DiffHunk]:
+    """
+    按行把超过预算的 hunk 拆成多个 hunk，每个 hunk 的起始行号与行数按拆分位置重新计算
+
+    每行按格式化后的长度单独估算，略微高估
+    """
+    empty = DiffHunk(hunk.old_start, hunk.old_count, hunk.new_start, hunk.new_count)
+    header_tokens = estimate_tokens(
+        _format_hunks(diff_file, [empty], max_context_lines)
+    )
+
+    # (起始旧行号, 起始新行号, [(行类型, 内容), ...])
+    segments: List[Tuple[int, int, List[Tuple[int, str]]]] = []
+    lines: List[Tuple[int, str]] = []
+    tokens = header_tokens
+    old_number, new_number = hunk.old_start, hunk.new_start
+    for line_type, content in zip(hunk.line_types, hunk.contents):
+        line_tokens = estimate_tokens(f"+ {content}")
+        if not lines or tokens + line_tokens > token_budget:
+            lines, tokens = [], header_tokens
+            segments.append((old_number, new_number, lines))
+        lines.append((line_type, content))
+        tokens += line_tokens
+        if line_type != LINE_ADDED:
+            old_number += 1
+        if line_type != LINE_REMOVED:
+            new_number += 1
+
+    parts = []
+    for old_start, new_start, lines in segments:
+        part = DiffHunk(
+            old_start,
+            sum(line_type != LINE_ADDED for line_type, _ in lines),
+            new_start,
+            sum(line_type != LINE_REMOVED for line_type, _ in lines),
+            header=hunk.header,
+        )
+        for line_type, content in lines:
+            part.append(line_type, content)
+        parts.append(part)
+    return parts
+
+
+def _format_hunks(diff_file: DiffFile, hunks: list, max_context_lines: int) -> str:
+    return format_diff_for_review(
+        [dataclasses.replace(diff_file, hunks=hunks)], max_context_lines
+    )
+
+
+def split_diff_sections(raw_diff: str) -> List[Tuple[str, str]]:
+    """
+    按文件切分原始 diff
+
+    Returns:
+        List[Tuple[str, str]]: (文件路径, 该文件的 diff)，第一个文件之前的内容被丢弃
+    """
+    sections: List[Tuple[str, str]] = []
+    path = None
+    lines: List[str] = []
+    for line in raw_diff.split("\n"):
+        if line.startswith("diff --git"):
+            if path is not None:
+                sections.append((path, "\n".join(lines)))
+            match = _FILE_HEADER.match(line)
+            path = match.group(2) if match else line[len("diff --git ") :]
+            lines = [line]
+        elif path is not None:
+            lines.append(line)
+    if path is not None:
+        sections.append((path, "\n".join(lines)))
+    return sections
+
+
+def compare_diff_sections(compare: Dict) -> List[Tuple[str, str]]:
+    """
+    按文件切分 compare 接口返回的 diffs，结果与 split_diff_sections 相同
+    """
+    return [
+        (
+            item["new_path"],
+            "\n".join(file_header_lines(item) + [item.get("diff") or ""]),
+        )
+        for item in compare.get("diffs") or []
+    ]
+
+
+def group_diff_sections(
+    sections: List[Tuple[str, str]], token_budget: int
+) -> List[str]:
+    """
+    按目录分组后按 token 预算装箱
+
+    同一目录的文件排在一起，按目录首次出现的顺序依次装入当前组，装不下时开始新的一组；
+    单个文件超过预算时截断。
+
+    Args:
+        sections: split_diff_sections 或 compare_diff_sections 的结果
+        token_budget: 每组的 token 上限
+
+    Returns:
+        List[str]: 每组文件的 diff
+    """
+    by_directory: Dict[str, List[Tuple[str, str]]] = {}
+    for path, text in sections:
+        by_directory.setdefault(posixpath.dirname(path), []).append(
+            (path, _truncate(text, token_budget))
+        )
+    pieces = (
+        (text, path) for entries in by_directory.values() for path, text in entries
+    )
+    return [text for text, _ in _pack(pieces, token_budget)]
+
+
+def _truncate(text: str, token_budget: int) -> str:
+    if estimate_tokens(text) <= token_budget:
+        return text
+    # 非 ASCII 内容按一个字符一个 token 保守截断
+    remaining = max(token_budget - estimate_tokens(TRUNCATED_MARKER) - 1, 0)
+    limit = remaining * CHARS_PER_TOKEN if text.isascii() else remaining
+    return text[:limit] + "\n" + TRUNCATED_MARKER
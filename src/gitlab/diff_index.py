@@ -0,0 +1,366 @@
+"""
+基于偏移量索引的 diff 表示
+
+DiffParser.parse_diff 为每一行创建一个 DiffLine 并拷贝内容，超大 MR 会产生大量小对象。
+IndexedDiff 只保存一份原始 diff 的 bytes，文件、hunk 与行都以整数数组记录在其中的偏移，
+行内容在访问时才通过 memoryview 切片解码。
+
+IndexedFile / IndexedHunk / IndexedLine 提供与 DiffFile / DiffHunk / DiffLine 相同的属性，
+可以直接传给 format_diff_for_review、DiffParser.get_changed_lines 等函数。
+"""
+
+import re
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+# 行类型，与 DiffLine.line_type 对应
+LINE_ADDED = 1
+LINE_REMOVED = 2
+LINE_CONTEXT = 3
+LINE_TYPES = {LINE_ADDED: "added", LINE_REMOVED: "removed", LINE_CONTEXT: "context"}
+
+# 文件标记位
+FLAG_NEW = 1
+FLAG_DELETED = 2
+FLAG_BINARY = 4
+
+_PLUS, _MINUS, _SPACE = ord("+"), ord("-"), ord(" ")
+
+_FILE_HEADER_RE = re.compile(rb"diff --git a/(.*?) b/(.*?)$")
+_HUNK_HEADER_RE = re.compile(rb"@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@(.*)$")
+
+
+class IndexedDiff:
+    """
+    偏移量索引的 diff，解析规则与 DiffParser.parse_diff 一致
+
+    Attributes:
+        buffer: 原始 diff 的 UTF-8 bytes，只保存这一份
+        line_starts / line_ends: 每个 diff 行内容（去掉 +/-/空格 前缀）的起止偏移
+        line_types: 每个 diff 行的类型
+        old_numbers / new_numbers: 每个 diff 行在原文件与新文件中的行号，0 表示没有
+        hunk_*: 每个 hunk 的行范围与 @@ 头部信息
+        file_*: 每个文件的头部行位置、标记与 hunk 范围
+    """
+
+    def __init__(self, diff_content: Union[str, bytes]):
+        if isinstance(diff_content, str):
+            diff_content = diff_content.encode("utf-8")
+        self.buffer: bytes = diff_content
+        self._view = memoryview(self.buffer)
+
+        self.line_starts = array("q")
+        self.line_ends = array("q")
+        self.line_types = bytearray()
+        self.old_numbers = array("i")
+        self.new_numbers = array("i")
+
+        self.hunk_first_line = array("q")
+        self.hunk_old_start = array("i")
+        self.hunk_old_count = array("i")
+        self.hunk_new_start = array("i")
+        self.hunk_new_count = array("i")
+        self.hunk_header_start = array("q")
+        self.hunk_header_end = array("q")
+
+        self.file_header_start = array("q")
+        self.file_header_end = array("q")
+        self.file_flags = bytearray()
+        self.file_first_hunk = array("q")
+
+        self._changed_lines: Dict[int, List[Tuple[int, str, str]]] = {}
+        self._added_lines: Dict[int, List[Tuple[int, str]]] = {}
+        # 被跳过的文件下标 -> 原因，见 generated_detector
+        self.skipped_reasons: Dict[int, str] = {}
+
+        self._build()
+
+    def _build(self):
+        buffer = self.buffer
+        size = len(buffer)
+        in_file = False
+        in_file_header = False
+        in_hunk = False
+        old_number = new_number = 0
+
+        position = 0
+        while position <= size:
+            end = buffer.find(b"\n", position)
+            if end == -1:
+                end = size
+            first = buffer[position] if position < end else -1
+
+            if first == 0x64 and buffer.startswith(b"diff --git", position):  # "d"
+                if _FILE_HEADER_RE.match(buffer, position, end):
+                    self.file_header_start.append(position)
+                    self.file_header_end.append(end)
+                    self.file_flags.append(0)
+                    self.file_first_hunk.append(len(self.hunk_first_line))
+                    in_file = in_file_header = True
+                    in_hunk = False
+                else:
+                    in_file_header = False
+            elif first == 0x40 and buffer.startswith(b"@@", position):  # "@"
+                in_file_header = False
+                match = _HUNK_HEADER_RE.match(buffer, position, end)
+                if match and in_file:
+                    old_start = int(match.group(1))
+                    new_start = int(match.group(3))
+                    self.hunk_first_line.append(len(self.line_types))
+                    self.hunk_old_start.append(old_start)
+                    self.hunk_old_count.append(int(match.group(2) or 1))
+                    self.hunk_new_start.append(new_start)
+                    self.hunk_new_count.append(int(match.group(4) or 1))
+                    self.hunk_header_start.append(match.start(5))
+                    self.hunk_header_end.append(match.end(5))
+                    in_hunk = True
+                    old_number, new_number = old_start, new_start
+            elif in_file_header:
+                if buffer.startswith(b"new file mode", position):
+                    self.file_flags[-1] |= FLAG_NEW
+                elif buffer.startswith(b"deleted file mode", position):
+                    self.file_flags[-1] |= FLAG_DELETED
+                elif buffer.startswith(b"Binary files", position):
+                    self.file_flags[-1] |= FLAG_BINARY
+            elif in_hunk and first in (_PLUS, _MINUS, _SPACE):
+                self.line_starts.append(position + 1)
+                self.line_ends.append(end)
+                # 行号与行类型在同一遍中计算
+                if first == _PLUS:
+                    self.line_types.append(LINE_ADDED)
+                    self.old_numbers.append(0)
+                    self.new_numbers.append(new_number)
+                    new_number += 1
+                elif first == _MINUS:
+                    self.line_types.append(LINE_REMOVED)
+                    self.old_numbers.append(old_number)
+                    self.new_numbers.append(0)
+                    old_number += 1
+                else:
+                    self.line_types.append(LINE_CONTEXT)
+                    self.old_numbers.append(old_number)
+                    self.new_numbers.append(new_number)
+                    old_number += 1
+                    new_number += 1
+
+            position = end + 1
+
+        # 哨兵，便于用 [i, i + 1) 取范围
+        self.hunk_first_line.append(len(self.line_types))
+        self.file_first_hunk.append(len(self.hunk_old_start))
+
+    def text(self, start: int, end: int) -> str:
+        """解码 buffer[start:end]，不产生中间 bytes 拷贝"""
+        return str(self._view[start:end], "utf-8", "replace")
+
+    def __len__(self) -> int:
+        return len(self.file_flags)
+
+    def __getitem__(self, index: int) -> "IndexedFile":
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return IndexedFile(self, index)
+
+    def __iter__(self) -> Iterator["IndexedFile"]:
+        for index in range(len(self)):
+            yield IndexedFile(self, index)
+
+    @property
+    def line_count(self) -> int:
+        return len(self.line_types)
+
+    def file_line_range(self, index: int) -> range:
+        """第 index 个文件的行在行数组中的下标范围"""
+        first_hunk = self.file_first_hunk[index]
+        last_hunk = self.file_first_hunk[index + 1]
+        return range(self.hunk_first_line[first_hunk], self.hunk_first_line[last_hunk])
+
+    def changed_lines(self, index: int) -> List[Tuple[int, str, str]]:
+        """第 index 个文件新增与删除的行，与 DiffFile.changed_lines 一致"""
+        if index not in self._changed_lines:
+            changes = []
+            for line in self.file_line_range(index):
+                line_type = self.line_types[line]
+                if line_type == LINE_ADDED and self.new_numbers[line]:
+                    changes.append(
+                        (self.new_numbers[line], "added", self._line_text(line))
+                    )
+                elif line_type == LINE_REMOVED and self.old_numbers[line]:
+                    changes.append(
+                        (self.old_numbers[line], "removed", self._line_text(line))
+                    )
+            self._changed_lines[index] = changes
+        return self._changed_lines[index]
+
+    def added_lines(self, index: int) -> List[Tuple[int, str]]:
+        """第 index 个文件新增的行，与 DiffFile.added_lines 一致"""
+        if index not in self._added_lines:
+            self._added_lines[index] = [
+                (self.new_numbers[line], self._line_text(line))
+                for line in self.file_line_range(index)
+                if self.line_types[line] == LINE_ADDED and self.new_numbers[line]
+            ]
+        return self._added_lines[index]
+
+    def _line_text(self, line: int) -> str:
+        return self.text(self.line_starts[line], self.line_ends[line])
+
+
+class IndexedFile:
+    """IndexedDiff 中一个文件的视图，属性与 DiffFile 一致"""
+
+    __slots__ = ("_diff", "_index", "_paths")
+
+    def __init__(self, diff: IndexedDiff, index: int):
+        self._diff = diff
+        self._index = index
+        self._paths: Optional[tuple] = None
+
+    def _parse_paths(self) -> tuple:
+        if self._paths is None:
+            diff = self._diff
+            start = diff.file_header_start[self._index]
+            end = diff.file_header_end[self._index]
+            match = _FILE_HEADER_RE.match(diff.buffer, start, end)
+            self._paths = (
+                diff.text(match.start(1), match.end(1)),
+                diff.text(match.start(2), match.end(2)),
+            )
+        return self._paths
+
+    @property
+    def old_path(self) -> str:
+        return self._parse_paths()[0]
+
+    @property
+    def new_path(self) -> str:
+        return self._parse_paths()[1]
+
+    @property
+    def is_new_file(self) -> bool:
+        return bool(self._diff.file_flags[self._index] & FLAG_NEW)
+
+    @property
+    def is_deleted_file(self) -> bool:
+        return bool(self._diff.file_flags[self._index] & FLAG_DELETED)
+
+    @property
+    def is_binary(self) -> bool:
+        return bool(self._diff.file_flags[self._index] & FLAG_BINARY)
+
+    @property
+    def skipped_reason(self) -> Optional[str]:
+        return self._diff.skipped_reasons.get(self._index)
+
+    @skipped_reason.setter
+    def skipped_reason(self, reason: Optional[str]):
+        if reason:
+            self._diff.skipped_reasons[self._index] = reason
+        else:
+            self._diff.skipped_reasons.pop(self._index, None)
+
+    @property
+    def hunks(self) -> List["IndexedHunk"]:
+        diff = self._diff
+        first = diff.file_first_hunk[self._index]
+        last = diff.file_first_hunk[self._index + 1]
+        return [IndexedHunk(diff, index) for index in range(first, last)]
+
+    @property
+    def changed_lines(self) -> List[Tuple[int, str, str]]:
+        return self._diff.changed_lines(self._index)
+
+    @property
+    def added_lines(self) -> List[Tuple[int, str]]:
+        return self._diff.added_lines(self._index)
+
+
+class IndexedHunk:
+    """IndexedDiff 中一个 hunk 的视图，属性与 DiffHunk 一致"""
+
+    __slots__ = ("_diff", "_index")
+
+    def __init__(self, diff: IndexedDiff, index: int):
+        self._diff = diff
+        self._index = index
+
+    @property
+    def old_start(self) -> int:
+        return self._diff.hunk_old_start[self._index]
+
+    @property
+    def old_count(self) -> int:
+        return self._diff.hunk_old_count[self._index]
+
+    @property
+    def new_start(self) -> int:
+        return self._diff.hunk_new_start[self._index]
+
+    @property
+    def new_count(self) -> int:
+        return self._diff.hunk_new_count[self._index]
+
+    @property
+    def header(self) -> str:
+        diff = self._diff
+        return diff.text(
+            diff.hunk_header_start[self._index], diff.hunk_header_end[self._index]
+        ).strip()
+
+    @property
+    def line_range(self) -> range:
+        """该 hunk 的行在 IndexedDiff 行数组中的下标范围"""
+        diff = self._diff
+        return range(
+            diff.hunk_first_line[self._index], diff.hunk_first_line[self._index + 1]
+        )
+
+    @property
+    def lines(self) -> List["IndexedLine"]:
+        line_range = self.line_range
+        return [
+            IndexedLine(self._diff, index, index - line_range.start + 1)
+            for index in line_range
+        ]
+
+
+class IndexedLine:
+    """IndexedDiff 中一行的视图，属性与 DiffLine 一致，content 在访问时解码"""
+
+    __slots__ = ("_diff", "_index", "line_number")
+
+    def __init__(self, diff: IndexedDiff, index: int, line_number: int):
+        self._diff = diff
+        self._index = index
+        self.line_number = line_number
+
+    @property
+    def line_type(self) -> str:
+        return LINE_TYPES[self._diff.line_types[self._index]]
+
+    @property
+    def content(self) -> str:
+        return self._diff._line_text(self._index)
+
+    @property
+    def old_line_number(self) -> Optional[int]:
+        return self._diff.old_numbers[self._index] or None
+
+    @property
+    def new_line_number(self) -> Optional[int]:
+        return self._diff.new_numbers[self._index] or None
+
+
+def parse_diff_indexed(diff_content: Union[str, bytes]) -> IndexedDiff:
+    """
+    解析 diff 为偏移量索引的形式
+
+    Args:
+        diff_content: 原始 diff，传入 bytes（如 response.content）时不会再拷贝
+
+    Returns:
+        IndexedDiff: 可迭代的文件序列，可代替 DiffParser.parse_diff 的返回值使用
+    """
+    return IndexedDiff(diff_content)
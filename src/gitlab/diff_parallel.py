@@ -0,0 +1,201 @@
+"""
+超大 diff 的多进程解析与格式化
+
+在文件边界（行首的 "diff --git"）把 diff 切成若干块，每块在进程池中独立执行
+DiffParser.parse_diff、生成文件识别与 format_diff_for_review，再按原始顺序合并。结果与单进程处理完全一致。
+
+进程池的启动与结果回传有固定开销，只有 diff 超过 DIFF_PARALLEL_THRESHOLD 时才启用。
+默认的 8 MB 是保守的估计值，没有在多核机器上测量过交叉点；
+部署前应在目标机器上运行 python -m benchmarks.diff_parallel，按测得的交叉点设置阈值。
+
+环境变量：
+    DIFF_PARALLEL_THRESHOLD: 启用多进程的 diff 大小（字符数），默认 8 MB，0 表示关闭
+    DIFF_PARALLEL_WORKERS: 进程数，默认为可用 CPU 数
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from gitlab.diff_parser import DiffFile, DiffParser, format_diff_for_review
+from gitlab.generated_detector import files_for_review, mark_generated_files
+
+# 未经测量的保守默认值，见模块文档
+DEFAULT_PARALLEL_THRESHOLD = 8 * 1024 * 1024
+
+_DIFF_HEADER = "diff --git"
+_DIFF_HEADER_AT_LINE_START = "\n" + _DIFF_HEADER
+
+
+def get_parallel_threshold() -> int:
+    """启用多进程的 diff 大小，0 表示关闭"""
+    return int(os.getenv("DIFF_PARALLEL_THRESHOLD", DEFAULT_PARALLEL_THRESHOLD))
+
+
+def get_parallel_workers() -> int:
+    """进程池大小"""
+    workers = os.getenv("DIFF_PARALLEL_WORKERS")
+    if workers:
+        return int(workers)
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def split_diff(content: str, chunk_size: int) -> Iterator[str]:
+    """
+    在文件边界切分 diff，每块至少 chunk_size 个字符（最后一块除外）
+
+    各块按 "\\n" 拆分后的行拼接起来，与整个 diff 按 "\\n" 拆分的结果相同
+    """
+    start = 0
+    while start < len(content):
+        boundary = content.find(_DIFF_HEADER_AT_LINE_START, start + chunk_size - 1)
+        if boundary == -1:
+            yield content[start:]
+            return
+        yield content[start:boundary]
+        start = boundary + 1
+
+
+def iter_diff_chunks(lines: Iterable[str], chunk_size: int) -> Iterator[str]:
+    """
+    把流式读取的 diff 行（不含换行符）在文件边界合并成块
+
+    与 split_diff 相同，每块至少 chunk_size 个字符（最后一块除外）
+    """
+    chunk: List[str] = []
+    size = 0
+    for line in lines:
+        if size >= chunk_size and line.startswith(_DIFF_HEADER):
+            yield "\n".join(chunk)
+            chunk, size = [], 0
+        chunk.append(line)
+        size += len(line) + 1
+    if chunk:
+        yield "\n".join(chunk)
+
+
+def parse_and_format_chunk(
+    chunk: str, max_context_lines: int = 3
+) -> Tuple[List[DiffFile], str]:
+    """解析并格式化一块 diff，在子进程中执行"""
+    return _mark_and_format(DiffParser().parse_diff(chunk), max_context_lines)
+
+
+def _mark_and_format(
+    diff_files: List[DiffFile], max_context_lines: int
+) -> Tuple[List[DiffFile], str]:
+    """识别生成文件后格式化，生成文件只输出文件名或不输出"""
+    mark_generated_files(diff_files)
+    return diff_files, format_diff_for_review(
+        files_for_review(diff_files), max_context_lines
+    )
+
+
+def parse_and_format_diff(
+    content: str,
+    max_context_lines: int = 3,
+    threshold: Optional[int] = None,
+    workers: Optional[int] = None,
+) -> Tuple[List[DiffFile], str]:
+    """
+    解析并格式化 diff，超过阈值时使用多进程
+
+    Args:
+        content: 原始 diff
+        max_context_lines: 同 format_diff_for_review
+        threshold: 启用多进程的大小，默认读取 DIFF_PARALLEL_THRESHOLD
+        workers: 进程数，默认读取 DIFF_PARALLEL_WORKERS
+
+    Returns:
+        Tuple[List[DiffFile], str]: 与 parse_diff + format_diff_for_review 相同的结果
+    """
+    threshold = get_parallel_threshold() if threshold is None else threshold
+    workers = get_parallel_workers() if workers is None else workers
+
+    if not _should_parallelize(len(content), threshold, workers):
+        return parse_and_format_chunk(content, max_context_lines)
+
+    chunks = split_diff(content, _chunk_size(threshold, workers))
+    return _run_parallel(chunks, max_context_lines, workers)
+
+
+def parse_and_format_lines(
+    lines: Iterable[str],
+    max_context_lines: int = 3,
+    threshold: Optional[int] = None,
+    workers: Optional[int] = None,
+) -> Tuple[List[DiffFile], str]:
+    """
+    解析并格式化流式读取的 diff 行，如 iter_merge_request_raw_diff 的输出
+
+    先在内存中累积分块；累积的大小超过阈值后启动进程池，之后每凑满一块就立即提交，
+    下载与解析并行进行。未超过阈值时在当前进程处理。
+    """
+    threshold = get_parallel_threshold() if threshold is None else threshold
+    workers = get_parallel_workers() if workers is None else workers
+
+    if not _should_parallelize(None, threshold, workers):
+        diff_files = list(DiffParser().parse_diff_iter(lines))
+        return _mark_and_format(diff_files, max_context_lines)
+
+    chunks = iter_diff_chunks(lines, _chunk_size(threshold, workers))
+    buffered: List[str] = []
+    size = 0
+    for chunk in chunks:
+        buffered.append(chunk)
+        size += len(chunk)
+        if size >= threshold:
+            return _run_parallel(_chain(buffered, chunks), max_context_lines, workers)
+
+    return _merge(
+        parse_and_format_chunk(chunk, max_context_lines) for chunk in buffered
+    )
+
+
+def _should_parallelize(size: Optional[int], threshold: int, workers: int) -> bool:
+    if threshold <= 0 or workers <= 1:
+        return False
+    return size is None or size >= threshold
+
+
+def _chunk_size(threshold: int, workers: int) -> int:
+    """每个进程至少分到一块，块也不宜过小，否则进程间传输的开销占比过高"""
+    return max(threshold // workers, 256 * 1024)
+
+
+def _chain(buffered: List[str], rest: Iterator[str]) -> Iterator[str]:
+    yield from buffered
+    yield from rest
+
+
+def _run_parallel(
+    chunks: Iterable[str], max_context_lines: int, workers: int
+) -> Tuple[List[DiffFile], str]:
+    # 调用方可能运行在线程池中，fork 带线程的进程不安全，使用 forkserver / spawn
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context(
+        "forkserver" if "forkserver" in methods else "spawn"
+    )
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [
+            pool.submit(parse_and_format_chunk, chunk, max_context_lines)
+            for chunk in chunks
+        ]
+        return _merge(future.result() for future in futures)
+
+
+def _merge(
+    results: Iterable[Tuple[List[DiffFile], str]],
+) -> Tuple[List[DiffFile], str]:
+    """按原始顺序合并各块的结果，格式化结果为空的块不参与文本的拼接"""
+    diff_files: List[DiffFile] = []
+    formatted: List[str] = []
+    for chunk_files, chunk_text in results:
+        diff_files.extend(chunk_files)
+        if chunk_text:
+            formatted.append(chunk_text)
+    return diff_files, "\n".join(formatted)
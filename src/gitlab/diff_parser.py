@@ -1,6 +1,19 @@
 import re
-from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from gitlab.diff_index import (
+    LINE_ADDED,
+    LINE_CONTEXT,
+    LINE_REMOVED,
+    LINE_TYPES,
+    IndexedDiff,
+    parse_diff_indexed,
+)
+
+_LINE_TYPE_CODES = {name: code for code, name in LINE_TYPES.items()}
+_LINE_PREFIX_CODES = {"+": LINE_ADDED, "-": LINE_REMOVED, " ": LINE_CONTEXT}
 
 
 @dataclass
@@ -14,16 +27,109 @@ class DiffLine:
     new_line_number: Optional[int] = None
 
 
-@dataclass
 class DiffHunk:
-    """表示 diff 中的一个 hunk（变更块）"""
+    """
+    表示 diff 中的一个 hunk（变更块）
+
+    行按列存储：contents 保存行内容，line_types 与 old_numbers / new_numbers 为紧凑的类型数组，
+    行号在解析时随行写入（0 表示没有对应行号）。lines 属性按需生成 DiffLine 列表，兼容旧代码。
+    """
+
+    __slots__ = (
+        "old_start",
+        "old_count",
+        "new_start",
+        "new_count",
+        "header",
+        "contents",
+        "line_types",
+        "old_numbers",
+        "new_numbers",
+        "_next_old",
+        "_next_new",
+    )
+
+    def __init__(
+        self,
+        old_start: int,
+        old_count: int,
+        new_start: int,
+        new_count: int,
+        lines: Optional[List[DiffLine]] = None,
+        header: str = "",
+    ):
+        self.old_start = old_start
+        self.old_count = old_count
+        self.new_start = new_start
+        self.new_count = new_count
+        self.header = header
+        self.contents: List[str] = []
+        self.line_types = bytearray()
+        self.old_numbers = array("i")
+        self.new_numbers = array("i")
+        self._next_old = old_start
+        self._next_new = new_start
+        for line in lines or []:
+            self.append(_LINE_TYPE_CODES[line.line_type], line.content)
+
+    def append(self, line_type: int, content: str):
+        """
+        追加一行并计算它在原文件和新文件中的行号
+
+        Args:
+            line_type: LINE_ADDED / LINE_REMOVED / LINE_CONTEXT
+            content: 去掉 +/-/空格 前缀后的行内容
+        """
+        self.contents.append(content)
+        self.line_types.append(line_type)
+        if line_type == LINE_ADDED:
+            self.old_numbers.append(0)
+            self.new_numbers.append(self._next_new)
+            self._next_new += 1
+        elif line_type == LINE_REMOVED:
+            self.old_numbers.append(self._next_old)
+            self.new_numbers.append(0)
+            self._next_old += 1
+        else:
+            self.old_numbers.append(self._next_old)
+            self.new_numbers.append(self._next_new)
+            self._next_old += 1
+            self._next_new += 1
+
+    @property
+    def lines(self) -> List[DiffLine]:
+        """按需生成 DiffLine 列表，修改返回的列表不会影响 hunk"""
+        return [
+            DiffLine(
+                line_number=index + 1,
+                content=content,
+                line_type=LINE_TYPES[line_type],
+                old_line_number=old or None,
+                new_line_number=new or None,
+            )
+            for index, (content, line_type, old, new) in enumerate(
+                zip(self.contents, self.line_types, self.old_numbers, self.new_numbers)
+            )
+        ]
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, DiffHunk):
+            return NotImplemented
+        return (
+            self.old_start == other.old_start
+            and self.old_count == other.old_count
+            and self.new_start == other.new_start
+            and self.new_count == other.new_count
+            and self.header == other.header
+            and self.contents == other.contents
+            and self.line_types == other.line_types
+        )
 
-    old_start: int
-    old_count: int
-    new_start: int
-    new_count: int
-    lines: List[DiffLine]
-    header: str
+    def __repr__(self) -> str:
+        return (
+            f"DiffHunk(@@ -{self.old_start},{self.old_count} "
+            f"+{self.new_start},{self.new_count} @@, {len(self.contents)} lines)"
+        )
 
 
 @dataclass
@@ -36,6 +142,65 @@ class DiffFile:
     is_new_file: bool = False
     is_deleted_file: bool = False
     is_binary: bool = False
+    # 被识别为生成文件等不需要审查的原因，格式化时只输出文件名
+    skipped_reason: Optional[str] = None
+    _changed_lines: Optional[List[Tuple[int, str, str]]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _added_lines: Optional[List[Tuple[int, str]]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    def __getstate__(self):
+        # 缓存的变更行可以重新计算，不随对象序列化（写入磁盘缓存或跨进程传输）
+        state = self.__dict__.copy()
+        state["_changed_lines"] = None
+        state["_added_lines"] = None
+        return state
+
+    @property
+    def changed_lines(self) -> List[Tuple[int, str, str]]:
+        """
+        新增与删除的行 [(行号, 行类型, 内容), ...]，首次访问时计算并缓存
+
+        新增行使用新文件行号，删除行使用原文件行号
+        """
+        if self._changed_lines is None:
+            self._changed_lines = _collect_changed_lines(self.hunks)
+        return self._changed_lines
+
+    @property
+    def added_lines(self) -> List[Tuple[int, str]]:
+        """新增的行 [(行号, 内容), ...]，首次访问时计算并缓存"""
+        if self._added_lines is None:
+            self._added_lines = _collect_added_lines(self.hunks)
+        return self._added_lines
+
+
+def _collect_changed_lines(hunks: List[DiffHunk]) -> List[Tuple[int, str, str]]:
+    changes = []
+    for hunk in hunks:
+        for content, line_type, old, new in zip(
+            hunk.contents, hunk.line_types, hunk.old_numbers, hunk.new_numbers
+        ):
+            if line_type == LINE_ADDED:
+                if new:
+                    changes.append((new, "added", content))
+            elif line_type == LINE_REMOVED:
+                if old:
+                    changes.append((old, "removed", content))
+    return changes
+
+
+def _collect_added_lines(hunks: List[DiffHunk]) -> List[Tuple[int, str]]:
+    additions = []
+    for hunk in hunks:
+        for content, line_type, new in zip(
+            hunk.contents, hunk.line_types, hunk.new_numbers
+        ):
+            if line_type == LINE_ADDED and new:
+                additions.append((new, content))
+    return additions
 
 
 class DiffParser:
@@ -63,53 +228,55 @@ class DiffParser:
         if not diff_content.strip():
             return []
 
-        lines = diff_content.split("\n")
-        files = []
+        return list(self.parse_diff_iter(diff_content.split("\n")))
+
+    def parse_diff_iter(self, lines: Iterable[str]) -> Iterator[DiffFile]:
+        """
+        流式解析 diff，每个文件的最后一个 hunk 结束后立即产出该文件
+
+        内存占用只与最大的单个文件有关，适合与 iter_merge_request_raw_diff 等流式来源组合使用。
+
+        Args:
+            lines: diff 的行迭代器，如流式响应或打开的文件，行尾的 "\n" 会被去掉
+
+        Returns:
+            Iterator[DiffFile]: 解析后的文件
+        """
         current_file = None
         current_hunk = None
+        # 文件头之后、第一个 @@ 之前，用于识别新增/删除/二进制文件
+        in_file_header = False
 
-        i = 0
-        while i < len(lines):
-            line = lines[i]
+        for line in lines:
+            if line.endswith("\n"):
+                line = line[:-1]
 
             # 检查文件头
-            file_match = self.file_header_pattern.match(line)
-            if file_match:
-                # 保存上一个文件
+            if line.startswith("diff --git"):
+                file_match = self.file_header_pattern.match(line)
+                in_file_header = file_match is not None
+                if not file_match:
+                    continue
+
+                # 产出上一个文件
                 if current_file:
-                    if current_hunk:
+                    if current_hunk is not None:
                         current_file.hunks.append(current_hunk)
-                    files.append(current_file)
+                    yield current_file
 
                 # 创建新文件
-                old_path = file_match.group(1)
-                new_path = file_match.group(2)
-                current_file = DiffFile(old_path=old_path, new_path=new_path, hunks=[])
+                current_file = DiffFile(
+                    old_path=file_match.group(1), new_path=file_match.group(2), hunks=[]
+                )
                 current_hunk = None
 
-                # 检查后续行的文件状态
-                j = i + 1
-                while (
-                    j < len(lines)
-                    and not lines[j].startswith("@@")
-                    and not lines[j].startswith("diff --git")
-                ):
-                    if self.new_file_pattern.match(lines[j]):
-                        current_file.is_new_file = True
-                    elif self.deleted_file_pattern.match(lines[j]):
-                        current_file.is_deleted_file = True
-                    elif self.binary_file_pattern.match(lines[j]):
-                        current_file.is_binary = True
-                    j += 1
-
-                i = j - 1
-
             # 检查 hunk 头
             elif line.startswith("@@"):
+                in_file_header = False
                 hunk_match = self.hunk_header_pattern.match(line)
-                if hunk_match:
+                if hunk_match and current_file:
                     # 保存上一个 hunk
-                    if current_hunk:
+                    if current_hunk is not None:
                         current_file.hunks.append(current_hunk)
 
                     # 创建新 hunk
@@ -124,65 +291,35 @@ class DiffParser:
                         old_count=old_count,
                         new_start=new_start,
                         new_count=new_count,
-                        lines=[],
                         header=header,
                     )
 
-            # 处理 diff 行内容
-            elif current_hunk is not None and (
-                line.startswith("+") or line.startswith("-") or line.startswith(" ")
-            ):
-                if line.startswith("+"):
-                    line_type = "added"
-                    content = line[1:]
-                elif line.startswith("-"):
-                    line_type = "removed"
-                    content = line[1:]
-                else:  # 以空格开始的上下文行
-                    line_type = "context"
-                    content = line[1:]
-
-                diff_line = DiffLine(
-                    line_number=len(current_hunk.lines) + 1,
-                    content=content,
-                    line_type=line_type,
-                )
-                current_hunk.lines.append(diff_line)
+            # 检查文件状态
+            elif in_file_header:
+                if self.new_file_pattern.match(line):
+                    current_file.is_new_file = True
+                elif self.deleted_file_pattern.match(line):
+                    current_file.is_deleted_file = True
+                elif self.binary_file_pattern.match(line):
+                    current_file.is_binary = True
 
-            i += 1
+            # 处理 diff 行内容，行号随行一起计算
+            elif current_hunk is not None and line and line[0] in _LINE_PREFIX_CODES:
+                current_hunk.append(_LINE_PREFIX_CODES[line[0]], line[1:])
 
-        # 保存最后的文件和 hunk
+        # 产出最后的文件
         if current_file:
-            if current_hunk:
+            if current_hunk is not None:
                 current_file.hunks.append(current_hunk)
-            files.append(current_file)
-
-        # 计算实际行号
-        for file in files:
-            self._calculate_line_numbers(file)
-
-        return files
+            yield current_file
 
-    def _calculate_line_numbers(self, diff_file: DiffFile):
-        """计算每一行在原文件和新文件中的实际行号"""
-        for hunk in diff_file.hunks:
-            old_line_num = hunk.old_start
-            new_line_num = hunk.new_start
+    def parse_diff_indexed(self, diff_content: Union[str, bytes]) -> IndexedDiff:
+        """
+        解析 diff 内容为偏移量索引的形式，适合超大 diff
 
-            for line in hunk.lines:
-                if line.line_type == "removed":
-                    line.old_line_number = old_line_num
-                    line.new_line_number = None
-                    old_line_num += 1
-                elif line.line_type == "added":
-                    line.old_line_number = None
-                    line.new_line_number = new_line_num
-                    new_line_num += 1
-                else:  # context
-                    line.old_line_number = old_line_num
-                    line.new_line_number = new_line_num
-                    old_line_num += 1
-                    new_line_num += 1
+        返回值与 parse_diff 的结果可以互换使用，但行内容在访问时才解码。
+        """
+        return parse_diff_indexed(diff_content)
 
     def get_changed_lines(
         self, diff_files: List[DiffFile]
@@ -203,22 +340,8 @@ class DiffParser:
             if file.is_binary:
                 continue
 
-            file_changes = []
-            for hunk in file.hunks:
-                for line in hunk.lines:
-                    if line.line_type in ["added", "removed"]:
-                        line_number = (
-                            line.new_line_number
-                            if line.line_type == "added"
-                            else line.old_line_number
-                        )
-                        if line_number:
-                            file_changes.append(
-                                (line_number, line.line_type, line.content)
-                            )
-
-            if file_changes:
-                changed_lines[file.new_path] = file_changes
+            if file.changed_lines:
+                changed_lines[file.new_path] = file.changed_lines
 
         return changed_lines
 
@@ -240,14 +363,8 @@ class DiffParser:
             if file.is_binary:
                 continue
 
-            file_additions = []
-            for hunk in file.hunks:
-                for line in hunk.lines:
-                    if line.line_type == "added" and line.new_line_number:
-                        file_additions.append((line.new_line_number, line.content))
-
-            if file_additions:
-                added_lines[file.new_path] = file_additions
+            if file.added_lines:
+                added_lines[file.new_path] = file.added_lines
 
         return added_lines
 
@@ -272,6 +389,10 @@ def format_diff_for_review(
             result.append(f"## 文件: {file.new_path} (二进制文件)")
             continue
 
+        if file.skipped_reason:
+            result.append(f"## 文件: {file.new_path} (已跳过: {file.skipped_reason})")
+            continue
+
         if file.is_new_file:
             result.append(f"## 新文件: {file.new_path}")
         elif file.is_deleted_file:
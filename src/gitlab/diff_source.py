@@ -0,0 +1,188 @@
+"""
+MR diff 的来源
+
+- raw（默认）：下载 raw_diffs，整个 MR 的 diff 是一个文本
+- api：逐页读取 /diffs 接口的 JSON，每个文件单独一项，不需要一次性下载整个 diff。
+  GitLab 对超过限制的文件返回 collapsed / too_large 且不带 diff 内容，这类文件只有在
+  没有被过滤、也不是生成文件时才按 base / head 两个版本获取文件内容，在本地计算 diff
+
+两种来源都产出与 raw_diffs 相同格式的 diff 行，之后的过滤、解析（DiffFile）、
+生成文件识别与格式化完全一致。
+
+环境变量：
+    DIFF_SOURCE: raw 或 api
+    DIFF_SOURCE_MAX_FILE_KB: api 来源按需获取文件内容时，单个文件的大小上限，默认 1024，
+        超过时只保留文件头
+"""
+
+import difflib
+import os
+from typing import Dict, Iterator, List, Optional
+
+from gitlab.generated_detector import GENERATED_PATTERNS
+from gitlab.merge_request import (
+    get_repository_file_raw,
+    iter_merge_request_diff,
+    iter_merge_request_raw_diff,
+)
+from gitlab.path_matcher import get_path_matcher
+from gitlab.util import get_skip_files
+
+DIFF_SOURCE_RAW = "raw"
+DIFF_SOURCE_API = "api"
+
+DEFAULT_MAX_FILE_KB = 1024
+
+
+def get_diff_source() -> str:
+    """DIFF_SOURCE，取值 raw、api"""
+    source = os.getenv("DIFF_SOURCE", DIFF_SOURCE_RAW).lower()
+    if source not in (DIFF_SOURCE_RAW, DIFF_SOURCE_API):
+        raise ValueError(f"DIFF_SOURCE 只能是 raw 或 api，当前为 {source}")
+    return source
+
+
+def iter_merge_request_diff_lines(
+    project_id: str,
+    mr_number: str,
+    files_to_filter: Optional[List[str]] = None,
+    base_sha: Optional[str] = None,
+    head_sha: Optional[str] = None,
+    fetch_truncated: bool = True,
+) -> Iterator[str]:
+    """
+    按 DIFF_SOURCE 流式获取过滤后的 MR 差异，逐行产出（不含换行符）
+
+    Args:
+        project_id: 项目 ID
+        mr_number: MR 编号
+        files_to_filter: 需要过滤的文件，为空时使用 SKIP_FILES
+        base_sha: 最新版本的 base_commit_sha，api 来源按需获取文件内容时使用
+        head_sha: 最新版本的 head_commit_sha，同上
+        fetch_truncated: api 来源是否获取 too_large 文件的内容，只需要文件列表的调用方（如 merge）传 False
+    """
+    if get_diff_source() == DIFF_SOURCE_API:
+        return iter_merge_request_api_diff_lines(
+            project_id, mr_number, files_to_filter, base_sha, head_sha, fetch_truncated
+        )
+    return iter_merge_request_raw_diff(project_id, mr_number, files_to_filter)
+
+
+def iter_merge_request_api_diff_lines(
+    project_id: str,
+    mr_number: str,
+    files_to_filter: Optional[List[str]] = None,
+    base_sha: Optional[str] = None,
+    head_sha: Optional[str] = None,
+    fetch_truncated: bool = True,
+) -> Iterator[str]:
+    """
+    由 /diffs 接口逐个文件拼出与 raw_diffs 相同格式的 diff 行
+
+    被过滤的文件直接跳过；collapsed / too_large 的文件只在 fetch_truncated 为 True 时获取内容，
+    生成文件、缺少 base_sha、head_sha 或文件超过大小上限时只产出文件头。
+    """
+    matcher = get_path_matcher(files_to_filter or get_skip_files())
+    generated_matcher = get_path_matcher(GENERATED_PATTERNS)
+    max_bytes = int(os.getenv("DIFF_SOURCE_MAX_FILE_KB") or DEFAULT_MAX_FILE_KB) * 1024
+
+    yielded = False
+    for item in iter_merge_request_diff(project_id, mr_number):
+        if matcher.match(item["old_path"]) or matcher.match(item["new_path"]):
+            continue
+
+        yielded = True
+        yield from file_header_lines(item)
+        if not _is_truncated(item):
+            yield from _split_lines(item.get("diff") or "")
+        elif (
+            fetch_truncated
+            and base_sha
+            and head_sha
+            and not generated_matcher.match(item["new_path"])
+        ):
+            # 生成文件即使获取了内容也不会发给 LLM，不必下载
+            yield from fetch_file_diff_lines(
+                project_id, item, base_sha, head_sha, max_bytes
+            )
+
+    # 与 raw_diffs 一致，以换行符结尾
+    if yielded:
+        yield ""
+
+
+def file_header_lines(item: Dict) -> List[str]:
+    """/diffs 中一项对应的 raw diff 文件头"""
+    old_path, new_path = item["old_path"], item["new_path"]
+    lines = [f"diff --git a/{old_path} b/{new_path}"]
+    if item.get("new_file"):
+        lines.append(f"new file mode {item.get('b_mode') or '100644'}")
+    elif item.get("deleted_file"):
+        lines.append(f"deleted file mode {item.get('a_mode') or '100644'}")
+    elif item.get("renamed_file"):
+        lines.append(f"rename from {old_path}")
+        lines.append(f"rename to {new_path}")
+    lines.append("--- /dev/null" if item.get("new_file") else f"--- a/{old_path}")
+    lines.append("+++ /dev/null" if item.get("deleted_file") else f"+++ b/{new_path}")
+    return lines
+
+
+def fetch_file_diff_lines(
+    project_id: str,
+    item: Dict,
+    base_sha: str,
+    head_sha: str,
+    max_bytes: int,
+) -> List[str]:
+    """
+    获取文件在 base、head 两个版本的内容，在本地计算 hunk
+
+    二进制文件、任意一侧超过 max_bytes 时返回空列表；超过上限的文件读到上限即停止下载
+    """
+    try:
+        old_content = (
+            b""
+            if item.get("new_file")
+            else get_repository_file_raw(
+                project_id, item["old_path"], base_sha, max_bytes
+            )
+            or b""
+        )
+        new_content = (
+            b""
+            if item.get("deleted_file")
+            else get_repository_file_raw(
+                project_id, item["new_path"], head_sha, max_bytes
+            )
+            or b""
+        )
+    except ValueError:
+        return []
+    if b"\0" in old_content or b"\0" in new_content:
+        return []
+
+    # 与 raw_diffs 一致只按 "\n" 切分，\r 等字符保留在行内
+    old_lines = _split_lines(old_content.decode("utf-8", "replace"))
+    new_lines = _split_lines(new_content.decode("utf-8", "replace"))
+    diff = difflib.unified_diff(old_lines, new_lines, lineterm="")
+    # 去掉 unified_diff 产出的 ---/+++ 两行，文件头已由 file_header_lines 产出
+    return list(diff)[2:]
+
+
+def _is_truncated(item: Dict) -> bool:
+    """GitLab 因文件过大未返回 diff 内容"""
+    return bool(item.get("collapsed") or item.get("too_large")) and not item.get("diff")
+
+
+def _split_lines(diff: str) -> List[str]:
+    lines = diff.split("\n")
+    if lines and lines[-1] == "":
+        lines.pop()
+    return lines
+
+
+if __name__ == "__main__":
+    import sys
+
+    for line in iter_merge_request_api_diff_lines(sys.argv[1], sys.argv[2]):
+        print(line)
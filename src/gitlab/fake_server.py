@@ -0,0 +1,644 @@
+"""
+本地 GitLab API 模拟服务
+
+提供合成的项目与 MR 数据，覆盖 bot 用到的 REST 接口（MR 详情、raw_diffs、diffs、
+versions、commits、notes、discussions、compare、repository files 等），可配置 diff 大小、分页数量、
+延迟与 429 注入，用于在无网络环境下对 bot 进行端到端的压测与性能测试。
+
+同时提供一个最简的 OpenAI Chat Completions 接口（/v1/chat/completions），
+将 OPENAI_BASE_URL 指向它即可跑通完整流程。
+
+用法：
+    python -m gitlab.fake_server --port 8929 --files 200 --lines 100 --latency 0.05
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlencode, urlsplit
+
+PROJECT_ID = 1
+PROJECT_PATH = "group/project"
+LOCK_FILE = "pnpm-lock.yaml"
+
+
+@dataclass
+class FakeGitLabConfig:
+    """模拟服务的数据规模与行为配置"""
+
+    merge_requests: int = 3  # 项目内 MR 数量，编号从 1 开始
+    files: int = 20  # 每个 MR 变更的文件数（另有一个 pnpm-lock.yaml）
+    lines_per_file: int = 40  # 每个文件新增的行数，另有一半数量的删除行
+    commits: int = 30
+    notes: int = 10
+    discussions: int = 5
+    max_per_page: int = 100  # 调小可以制造更多分页
+    omit_totals: bool = False  # 不返回 X-Total-Pages，只能跟随 Link 翻页
+    latency: float = 0.0  # 每个请求的额外延迟（秒）
+    rate_limit_every: int = 0  # 每 N 个请求返回一次 429，0 表示不注入
+    retry_after: str = "1"  # 429 响应的 Retry-After
+    llm_latency: float = 0.0  # /v1/chat/completions 的额外延迟（秒）
+    token: Optional[str] = None  # 设置后校验 PRIVATE-TOKEN
+    too_large_files: int = 0  # /diffs 中前 N 个文件标记为 too_large，不带 diff 内容
+
+
+def _sha(*parts: Any) -> str:
+    return hashlib.sha1("-".join(str(part) for part in parts).encode()).hexdigest()
+
+
+class FakeGitLabData:
+    """按配置确定性地生成项目、MR、commits、diff 与评论数据"""
+
+    def __init__(self, config: FakeGitLabConfig, base_url: str):
+        self.config = config
+        self.base_url = base_url
+        self.user = {"id": 1, "username": "bot", "name": "Merge Request Bot"}
+        self.project = {
+            "id": PROJECT_ID,
+            "path_with_namespace": PROJECT_PATH,
+            "web_url": f"{base_url}/{PROJECT_PATH}",
+        }
+        self._lock = threading.Lock()
+        self._diff_cache: Dict[int, List[Dict[str, Any]]] = {}
+        self.merge_requests = {
+            iid: self._merge_request(iid) for iid in range(1, config.merge_requests + 1)
+        }
+        self.notes = {
+            iid: [self._note(iid, i) for i in range(config.notes)]
+            for iid in self.merge_requests
+        }
+        self.discussions = {
+            iid: [self._discussion(iid, i) for i in range(config.discussions)]
+            for iid in self.merge_requests
+        }
+
+    def _merge_request(self, iid: int) -> Dict[str, Any]:
+        commits = self.commits(iid)
+        return {
+            "id": 1000 + iid,
+            "iid": iid,
+            "project_id": PROJECT_ID,
+            "title": f"feat: synthetic change {iid}",
+            "description": "",
+            "state": "opened",
+            "source_branch": f"feature-{iid}",
+            "target_branch": "master",
+            "author": self.user,
+            "created_at": "2024-01-01T00:00:00Z",
+            "updated_at": "2024-01-02T00:00:00Z",
+            "web_url": f"{self.base_url}/{PROJECT_PATH}/-/merge_requests/{iid}",
+            "sha": commits[0]["id"] if commits else None,
+            "diff_refs": self.diff_refs(iid),
+        }
+
+    def diff_refs(self, iid: int) -> Dict[str, str]:
+        head = _sha(iid, "commit", self.config.commits - 1)
+        return {
+            "base_sha": _sha(iid, "base"),
+            "head_sha": head,
+            "start_sha": _sha(iid, "base"),
+        }
+
+    def commits(self, iid: int) -> List[Dict[str, Any]]:
+        """commits 列表，与 GitLab 一致最新在前"""
+        commits = []
+        for i in reversed(range(self.config.commits)):
+            sha = _sha(iid, "commit", i)
+            commits.append(
+                {
+                    "id": sha,
+                    "short_id": sha[:8],
+                    "title": f"commit {i}",
+                    "message": f"commit {i}\n\nsynthetic commit {i} of MR {iid}\n",
+                    "author_name": self.user["name"],
+                    "created_at": f"2024-01-01T00:{i % 60:02d}:00Z",
+                    "committed_date": f"2024-01-01T00:{i % 60:02d}:00Z",
+                    "web_url": f"{self.base_url}/{PROJECT_PATH}/-/commit/{sha}",
+                }
+            )
+        return commits
+
+    def _note(self, iid: int, i: int) -> Dict[str, Any]:
+        return {
+            "id": iid * 10000 + i,
+            "body": f"note {i}",
+            "author": self.user,
+            "system": False,
+            "created_at": f"2024-01-02T00:{i % 60:02d}:00Z",
+        }
+
+    def _discussion(self, iid: int, i: int) -> Dict[str, Any]:
+        return {
+            "id": _sha(iid, "discussion", i),
+            "individual_note": False,
+            "notes": [self._note(iid, 5000 + i)],
+        }
+
+    def diffs(self, iid: int) -> List[Dict[str, Any]]:
+        """/diffs 接口的文件列表，raw_diffs 由同样的数据拼接而成"""
+        with self._lock:
+            if iid not in self._diff_cache:
+                files = [self._file_diff(iid, j) for j in range(self.config.files)]
+                files.append(self._lock_file_diff())
+                self._diff_cache[iid] = files
+            return self._diff_cache[iid]
+
+    def _file_diff(self, iid: int, j: int) -> Dict[str, Any]:
+        path = f"src/module_{j % 10}/file_{j}.py"
+        added = self.config.lines_per_file
+        removed = added // 2
+        lines = [f"@@ -1,{removed + 1} +1,{added + 1} @@ def handler_{j}():"]
+        lines.append(" import os")
+        lines.extend(f"-    legacy_value_{k} = compute({k})" for k in range(removed))
+        lines.extend(
+            f"+    value_{k} = compute({k}, mr={iid})  # synthetic line {k}"
+            for k in range(added)
+        )
+        return {
+            "old_path": path,
+            "new_path": path,
+            "a_mode": "100644",
+            "b_mode": "100644",
+            "new_file": False,
+            "renamed_file": False,
+            "deleted_file": False,
+            "diff": "\n".join(lines) + "\n",
+        }
+
+    def _lock_file_diff(self) -> Dict[str, Any]:
+        lines = ["@@ -1,1 +1,3 @@", " lockfileVersion: '6.0'"]
+        lines.extend(f"+  /pkg-{k}@1.0.0: {{}}" for k in range(2))
+        return {
+            "old_path": LOCK_FILE,
+            "new_path": LOCK_FILE,
+            "a_mode": "100644",
+            "b_mode": "100644",
+            "new_file": False,
+            "renamed_file": False,
+            "deleted_file": False,
+            "diff": "\n".join(lines) + "\n",
+        }
+
+    def api_diffs(self, iid: int) -> List[Dict[str, Any]]:
+        """/diffs 接口的返回，与 GitLab 一致，过大的文件标记 collapsed / too_large 且 diff 为空"""
+        items = []
+        for index, item in enumerate(self.diffs(iid)):
+            truncated = index < self.config.too_large_files
+            items.append(
+                {
+                    **item,
+                    "diff": "" if truncated else item["diff"],
+                    "collapsed": truncated,
+                    "too_large": truncated,
+                }
+            )
+        return items
+
+    def file_raw(self, file_path: str, ref: str) -> Optional[str]:
+        """repository/files/:file_path/raw，由 diff 还原出 base、head 两个版本的文件内容"""
+        for iid, merge_request in self.merge_requests.items():
+            refs = merge_request["diff_refs"]
+            if ref not in (refs["base_sha"], refs["head_sha"]):
+                continue
+            side = "-" if ref == refs["base_sha"] else "+"
+            path_key = "old_path" if side == "-" else "new_path"
+            for item in self.diffs(iid):
+                if item[path_key] != file_path:
+                    continue
+                return "".join(
+                    line[1:] + "\n"
+                    for line in item["diff"].split("\n")
+                    if line[:1] in (" ", side)
+                )
+        return None
+
+    def raw_diff(self, iid: int) -> str:
+        parts = []
+        for item in self.diffs(iid):
+            old_path, new_path = item["old_path"], item["new_path"]
+            parts.append(
+                f"diff --git a/{old_path} b/{new_path}\n"
+                f"index {_sha(old_path)[:7]}..{_sha(new_path, iid)[:7]} 100644\n"
+                f"--- a/{old_path}\n"
+                f"+++ b/{new_path}\n"
+                f"{item['diff']}"
+            )
+        return "".join(parts)
+
+    def add_note(self, iid: int, body: str) -> Dict[str, Any]:
+        with self._lock:
+            note = self._note(iid, len(self.notes[iid]))
+            note["body"] = body
+            # 与 GitLab 默认排序一致，最新的在前
+            self.notes[iid].insert(0, note)
+            return note
+
+    def add_discussion(self, iid: int, payload: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            discussion = self._discussion(iid, len(self.discussions[iid]))
+            discussion["notes"][0]["body"] = payload.get("body", "")
+            if payload.get("position"):
+                discussion["notes"][0]["position"] = payload["position"]
+            self.discussions[iid].append(discussion)
+            return discussion
+
+
+class FakeGitLabServer(ThreadingHTTPServer):
+    """
+    GitLab API 模拟服务
+
+    Example:
+        with FakeGitLabServer(FakeGitLabConfig(files=100)) as server:
+            client = GitLabClient(server.api_url, "token")
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        config: Optional[FakeGitLabConfig] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        super().__init__((host, port), _Handler)
+        self.config = config or FakeGitLabConfig()
+        self.data = FakeGitLabData(self.config, self.base_url)
+        self.request_count = 0
+        # 按 "METHOD 路径" 统计请求次数，便于测试断言
+        self.request_log: Dict[str, int] = {}
+        self._counter_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_url(self) -> str:
+        return f"{self.base_url}/api/v4"
+
+    def count_request(self, method: str, path: str) -> int:
+        with self._counter_lock:
+            self.request_count += 1
+            key = f"{method} {path}"
+            self.request_log[key] = self.request_log.get(key, 0) + 1
+            return self.request_count
+
+    def start(self) -> "FakeGitLabServer":
+        """在后台线程中启动服务"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeGitLabServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+_MR_PATH = re.compile(
+    r"^/api/v4/projects/(?P<project>[^/]+)/merge_requests/(?P<iid>\d+)(?P<rest>/[a-z_]+)?$"
+)
+_PROJECT_PATH = re.compile(r"^/api/v4/projects/(?P<project>[^/]+)(?P<rest>/.*)?$")
+_FILE_RAW_PATH = re.compile(r"^/repository/files/(?P<file_path>[^/]+)/raw$")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeGitLabServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # 压测时请求量很大，不输出访问日志
+        pass
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def _handle(self, method: str):
+        split = urlsplit(self.path)
+        path = split.path
+        query = {key: values[-1] for key, values in parse_qs(split.query).items()}
+        config = self.server.config
+
+        count = self.server.count_request(method, path)
+        if config.latency:
+            time.sleep(config.latency)
+
+        if path.startswith("/v1/"):
+            self._handle_openai(path)
+            return
+
+        if config.token and self.headers.get("PRIVATE-TOKEN") != config.token:
+            self._send_json({"message": "401 Unauthorized"}, status=401)
+            return
+
+        if config.rate_limit_every and count % config.rate_limit_every == 0:
+            self._send_json(
+                {"message": "429 Too Many Requests"},
+                status=429,
+                headers={"Retry-After": config.retry_after},
+            )
+            return
+
+        body = self._read_json() if method == "POST" else {}
+        try:
+            self._route(method, path, query, body)
+        except KeyError:
+            self._send_json({"message": "404 Not Found"}, status=404)
+
+    def _route(self, method: str, path: str, query: Dict[str, str], body: Dict):
+        data = self.server.data
+
+        if path == "/api/v4/user":
+            return self._send_json(data.user)
+        if path == "/api/v4/users":
+            username = query.get("username")
+            users = [data.user] if username in (None, data.user["username"]) else []
+            return self._send_json(users)
+        if path == "/api/v4/merge_requests":
+            return self._paginate(list(data.merge_requests.values()), query)
+
+        match = _MR_PATH.match(path)
+        if match:
+            self._project(match["project"])
+            iid = int(match["iid"])
+            merge_request = data.merge_requests[iid]
+            return self._route_merge_request(
+                method, match["rest"] or "", iid, merge_request, query, body
+            )
+
+        match = _PROJECT_PATH.match(path)
+        if match:
+            project = self._project(match["project"])
+            rest = match["rest"] or ""
+            if rest == "":
+                return self._send_json(project)
+            if rest == "/merge_requests" and method == "GET":
+                items = list(data.merge_requests.values())
+                if query.get("source_branch"):
+                    items = [
+                        mr
+                        for mr in items
+                        if mr["source_branch"] == query["source_branch"]
+                    ]
+                return self._paginate(items, query)
+            if rest == "/merge_requests" and method == "POST":
+                for mr in data.merge_requests.values():
+                    if mr["source_branch"] == body.get("source_branch"):
+                        return self._send_json(
+                            {"message": ["Another open merge request already exists"]},
+                            status=409,
+                        )
+                raise KeyError(rest)
+            if rest == "/repository/compare":
+                return self._send_json(self._compare(query))
+            file_match = _FILE_RAW_PATH.match(rest)
+            if file_match:
+                content = data.file_raw(
+                    unquote(file_match["file_path"]), query.get("ref", "")
+                )
+                if content is None:
+                    raise KeyError(rest)
+                return self._send(content.encode("utf-8"), "text/plain; charset=utf-8")
+
+        raise KeyError(path)
+
+    def _route_merge_request(self, method, rest, iid, merge_request, query, body):
+        data = self.server.data
+        if rest == "":
+            return self._send_json(merge_request)
+        if rest == "/raw_diffs":
+            return self._send(
+                data.raw_diff(iid).encode("utf-8"), "text/plain; charset=utf-8"
+            )
+        if rest == "/diffs":
+            return self._paginate(data.api_diffs(iid), query)
+        if rest == "/versions":
+            refs = merge_request["diff_refs"]
+            version = {
+                "id": iid,
+                "head_commit_sha": refs["head_sha"],
+                "base_commit_sha": refs["base_sha"],
+                "start_commit_sha": refs["start_sha"],
+                "state": "collected",
+            }
+            return self._send_json([version])
+        if rest == "/commits":
+            return self._paginate(data.commits(iid), query)
+        if rest == "/notes":
+            if method == "POST":
+                return self._send_json(data.add_note(iid, body.get("body", "")), 201)
+            return self._paginate(data.notes[iid], query)
+        if rest == "/discussions":
+            if method == "POST":
+                return self._send_json(data.add_discussion(iid, body), 201)
+            return self._paginate(data.discussions[iid], query)
+        raise KeyError(rest)
+
+    def _project(self, project: str) -> Dict[str, Any]:
+        if unquote(project) not in (str(PROJECT_ID), PROJECT_PATH):
+            raise KeyError(project)
+        return self.server.data.project
+
+    def _compare(self, query: Dict[str, str]) -> Dict[str, Any]:
+        """在 MR 1 的 commits 中查找区间，diff 使用 MR 1 的全部文件"""
+        data = self.server.data
+        commits = list(reversed(data.commits(1)))  # 旧的在前，与 compare 接口一致
+        ids = [commit["short_id"] for commit in commits]
+        start = ids.index(query["from"][:8]) if query.get("from", "")[:8] in ids else 0
+        end = (
+            ids.index(query["to"][:8])
+            if query.get("to", "")[:8] in ids
+            else len(ids) - 1
+        )
+        return {
+            "commit": commits[end] if commits else None,
+            "commits": commits[start + 1 : end + 1],
+            "diffs": data.diffs(1),
+            "compare_timeout": False,
+            "compare_same_ref": start == end,
+        }
+
+    def _paginate(self, items: List[Any], query: Dict[str, str]):
+        config = self.server.config
+        per_page = min(int(query.get("per_page") or 20), config.max_per_page)
+        total_pages = max(1, math.ceil(len(items) / per_page))
+        page = int(query.get("page") or 1)
+        page_items = items[(page - 1) * per_page : page * per_page]
+
+        headers = {"X-Page": str(page), "X-Per-Page": str(per_page)}
+        if not config.omit_totals:
+            headers["X-Total"] = str(len(items))
+            headers["X-Total-Pages"] = str(total_pages)
+        if page < total_pages:
+            next_query = urlencode({**query, "page": page + 1, "per_page": per_page})
+            next_url = f"{self.server.base_url}{urlsplit(self.path).path}?{next_query}"
+            headers["X-Next-Page"] = str(page + 1)
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        else:
+            headers["X-Next-Page"] = ""
+        self._send_json(page_items, headers=headers)
+
+    def _handle_openai(self, path: str):
+        """最简的 Chat Completions 接口，返回固定内容"""
+        config = self.server.config
+        if path != "/v1/chat/completions":
+            self._send_json({"error": {"message": "not found"}}, status=404)
+            return
+        request = self._read_json()
+        if config.llm_latency:
+            time.sleep(config.llm_latency)
+
+        if (request.get("response_format") or {}).get("type") == "json_object":
+            content = json.dumps(
+                {
+                    "overall_summary": "模拟审查：未发现问题。",
+                    "line_comments": [],
+                    "general_suggestions": [],
+                },
+                ensure_ascii=False,
+            )
+        else:
+            content = "## 模拟摘要\n\n这是本地模拟服务生成的摘要。"
+
+        self._send_json(
+            {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "fake"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "total_tokens": 0,
+                },
+            }
+        )
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length))
+
+    def _send_json(self, payload: Any, status: int = 200, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self._send(body, "application/json", status, headers)
+
+    def _send(
+        self,
+        body: bytes,
+        content_type: str,
+        status: int = 200,
+        headers: Optional[Dict[str, str]] = None,
+    ):
+        headers = dict(headers or {})
+        if self.command == "GET" and status == 200:
+            etag = f'W/"{hashlib.md5(body).hexdigest()}"'
+            headers["ETag"] = etag
+            if self.headers.get("If-None-Match") == etag:
+                status, body = 304, b""
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _parse_args(
+    argv: Optional[List[str]] = None,
+) -> Tuple[argparse.Namespace, FakeGitLabConfig]:
+    parser = argparse.ArgumentParser(description="本地 GitLab API 模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8929)
+    parser.add_argument("--merge-requests", type=int, default=3, help="MR 数量")
+    parser.add_argument("--files", type=int, default=20, help="每个 MR 的文件数")
+    parser.add_argument("--lines", type=int, default=40, help="每个文件新增的行数")
+    parser.add_argument("--commits", type=int, default=30)
+    parser.add_argument("--notes", type=int, default=10)
+    parser.add_argument("--discussions", type=int, default=5)
+    parser.add_argument("--max-per-page", type=int, default=100, help="单页最大条数")
+    parser.add_argument(
+        "--omit-totals", action="store_true", help="不返回 X-Total-Pages"
+    )
+    parser.add_argument("--latency", type=float, default=0.0, help="请求延迟（秒）")
+    parser.add_argument(
+        "--rate-limit-every", type=int, default=0, help="每 N 个请求返回一次 429"
+    )
+    parser.add_argument("--retry-after", default="1", help="429 的 Retry-After")
+    parser.add_argument(
+        "--llm-latency", type=float, default=0.0, help="模拟 LLM 接口的延迟（秒）"
+    )
+    parser.add_argument(
+        "--too-large-files",
+        type=int,
+        default=0,
+        help="/diffs 中标记为 too_large 的文件数",
+    )
+    args = parser.parse_args(argv)
+    config = FakeGitLabConfig(
+        merge_requests=args.merge_requests,
+        files=args.files,
+        lines_per_file=args.lines,
+        commits=args.commits,
+        notes=args.notes,
+        discussions=args.discussions,
+        max_per_page=args.max_per_page,
+        omit_totals=args.omit_totals,
+        latency=args.latency,
+        rate_limit_every=args.rate_limit_every,
+        retry_after=args.retry_after,
+        llm_latency=args.llm_latency,
+        too_large_files=args.too_large_files,
+    )
+    return args, config
+
+
+def main(argv: Optional[List[str]] = None):
+    args, config = _parse_args(argv)
+    server = FakeGitLabServer(config, host=args.host, port=args.port)
+    print("GitLab 模拟服务已启动，配置以下环境变量后运行 bot：")
+    print(f"  GITLAB_BASE_URL={server.base_url}")
+    print("  GITLAB_PRIVATE_TOKEN=fake-token")
+    print(f"  OPENAI_BASE_URL={server.base_url}/v1")
+    print("  OPENAI_API_KEY=fake-key")
+    for merge_request in server.data.merge_requests.values():
+        print(f"MR: {merge_request['web_url']}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+生成文件与压缩文件识别
+
+锁文件、压缩后的 bundle、快照、protobuf 生成代码、大型 JSON 数据等文件对代码审查没有价值，
+却会消耗大量 token。这里用几条廉价的启发式规则逐个文件判断：
+
+- 路径：常见的生成文件名与后缀，如 "*.min.js"、"*.pb.go"、"__snapshots__/"、各类锁文件
+- 标记：文件头部（从第 1 行开始的 hunk 的前若干行）新增了 "@generated"、"Code generated ... DO NOT EDIT" 等完整的生成声明
+- 行长度：新增行的平均长度过长，通常是压缩后的代码
+- 熵：新增内容的字符熵接近随机数据，通常是 base64 或压缩后的内容
+- 行数：数据类文件（json、csv、svg 等）新增行数过多
+
+命中的文件会设置 DiffFile.skipped_reason，format_diff_for_review 只输出文件名与原因（stub），
+GENERATED_FILES_MODE=drop 时不出现在发给 LLM 的内容中，=off 时关闭识别。
+
+环境变量：
+    GENERATED_FILES_MODE: stub（默认）、drop 或 off
+    GENERATED_MAX_DATA_LINES: 数据类文件新增行数上限，默认 500
+"""
+
+import math
+import os
+import re
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from gitlab.path_matcher import get_path_matcher
+
+GENERATED_PATTERNS = [
+    # 锁文件
+    "pnpm-lock.yaml",
+    "package-lock.json",
+    "yarn.lock",
+    "Cargo.lock",
+    "poetry.lock",
+    "Pipfile.lock",
+    "composer.lock",
+    "Gemfile.lock",
+    "go.sum",
+    "uv.lock",
+    # 压缩与构建产物
+    "*.min.js",
+    "*.min.css",
+    "*.map",
+    "*.bundle.js",
+    # 快照
+    "__snapshots__/",
+    "*.snap",
+    # 生成代码
+    "*.pb.go",
+    "*.pb.h",
+    "*.pb.cc",
+    "*_pb2.py",
+    "*_pb2_grpc.py",
+    "*.pb.ts",
+    "*.generated.*",
+    "*.g.dart",
+]
+
+# 生成代码在文件头部的声明，按完整的短语匹配，避免普通注释中的 "autogenerated"、"do not edit" 误判
+GENERATED_MARKERS = tuple(
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in (
+        r"@generated\b",
+        r"\bcode generated\b.*\bdo not edit\b",
+        r"<auto-generated\b",
+        r"\b(this|the) (file|code) (is|was|has been) "
+        r"(auto-?generated|automatically generated|generated)\b",
+        r"\bauto-?generated (file|code)\b",
+        r"^\W*do not edit\W*$",
+    )
+)
+
+DATA_EXTENSIONS = (".json", ".csv", ".tsv", ".xml", ".svg", ".geojson", ".ndjson")
+
+# 只检查文件前若干行中新增的内容是否有生成标记
+MARKER_SCAN_LINES = 20
+# 新增行平均长度超过该值视为压缩代码
+MINIFIED_AVG_LINE_LENGTH = 200
+# 计算熵时最多采样的字符数
+ENTROPY_SAMPLE_CHARS = 8192
+# 熵（bit/字符）超过该值且平均行长较长时视为编码或压缩内容；源码通常在 4.5 左右，base64 约为 6
+HIGH_ENTROPY_BITS = 5.5
+HIGH_ENTROPY_MIN_LINE_LENGTH = 80
+
+DEFAULT_MAX_DATA_LINES = 500
+
+MODE_STUB = "stub"
+MODE_DROP = "drop"
+MODE_OFF = "off"
+
+
+def get_generated_files_mode() -> str:
+    """GENERATED_FILES_MODE，取值 stub、drop、off"""
+    mode = os.getenv("GENERATED_FILES_MODE", MODE_STUB).lower()
+    if mode not in (MODE_STUB, MODE_DROP, MODE_OFF):
+        raise ValueError(
+            f"GENERATED_FILES_MODE 只能是 stub、drop 或 off，当前为 {mode}"
+        )
+    return mode
+
+
+def classify_diff_file(diff_file) -> Optional[str]:
+    """
+    判断文件是否为生成文件或压缩文件
+
+    Args:
+        diff_file: DiffFile 或 IndexedFile
+
+    Returns:
+        Optional[str]: 命中时返回原因，否则返回 None
+    """
+    if diff_file.is_binary:
+        return None
+
+    path = diff_file.new_path
+    if get_path_matcher(GENERATED_PATTERNS).match(path):
+        return "生成文件"
+
+    added = [content for _, content in diff_file.added_lines]
+    if not added:
+        return None
+
+    marker = _find_header_marker(diff_file)
+    if marker:
+        return f"包含生成标记 {marker!r}"
+
+    total_length = sum(len(content) for content in added)
+    average_length = total_length / len(added)
+    if average_length > MINIFIED_AVG_LINE_LENGTH:
+        return f"疑似压缩代码，平均行长 {average_length:.0f}"
+
+    if average_length > HIGH_ENTROPY_MIN_LINE_LENGTH:
+        entropy = _entropy(added)
+        if entropy > HIGH_ENTROPY_BITS:
+            return f"疑似编码内容，字符熵 {entropy:.1f}"
+
+    max_data_lines = int(
+        os.getenv("GENERATED_MAX_DATA_LINES") or DEFAULT_MAX_DATA_LINES
+    )
+    if path.lower().endswith(DATA_EXTENSIONS) and len(added) > max_data_lines:
+        return f"大型数据文件，新增 {len(added)} 行"
+
+    return None
+
+
+def mark_generated_files(diff_files) -> List[Tuple[str, str]]:
+    """
+    识别生成文件并设置 skipped_reason
+
+    Args:
+        diff_files: DiffParser 解析出的文件，会被原地修改
+
+    Returns:
+        List[Tuple[str, str]]: 被跳过的 (文件路径, 原因)
+    """
+    mode = get_generated_files_mode()
+    skipped = []
+    for diff_file in diff_files:
+        reason = None if mode == MODE_OFF else classify_diff_file(diff_file)
+        diff_file.skipped_reason = reason
+        if reason:
+            skipped.append((diff_file.new_path, reason))
+    return skipped
+
+
+def files_for_review(diff_files) -> list:
+    """
+    返回需要交给 format_diff_for_review 的文件
+
+    stub 模式下保留被跳过的文件（只输出文件名与原因），drop 模式下将其去掉
+    """
+    if get_generated_files_mode() != MODE_DROP:
+        return list(diff_files)
+    return [diff_file for diff_file in diff_files if not diff_file.skipped_reason]
+
+
+def skipped_files(diff_files) -> List[Tuple[str, str]]:
+    """已标记为跳过的 (文件路径, 原因)"""
+    return [
+        (diff_file.new_path, diff_file.skipped_reason)
+        for diff_file in diff_files
+        if diff_file.skipped_reason
+    ]
+
+
+def _find_header_marker(diff_file) -> Optional[str]:
+    """
+    在文件头部新增的行中查找生成标记
+
+    只检查从第 1 行开始的 hunk（新文件或修改了文件开头），
+    文件中间新增的注释即使提到 "autogenerated" 也不会被当作生成声明
+    """
+    header_end = max(
+        (
+            hunk.new_start + hunk.new_count
+            for hunk in diff_file.hunks
+            if hunk.new_start <= 1
+        ),
+        default=0,
+    )
+    header_end = min(header_end, MARKER_SCAN_LINES + 1)
+    for line_number, content in diff_file.added_lines:
+        if line_number >= header_end:
+            break
+        for pattern in GENERATED_MARKERS:
+            match = pattern.search(content)
+            if match:
+                return match.group(0).strip()
+    return None
+
+
+def _entropy(lines: List[str]) -> float:
+    """采样内容的香农熵（bit/字符）"""
+    sample = []
+    size = 0
+    for line in lines:
+        sample.append(line)
+        size += len(line)
+        if size >= ENTROPY_SAMPLE_CHARS:
+            break
+    text = "".join(sample)[:ENTROPY_SAMPLE_CHARS]
+    if not text:
+        return 0.0
+    counts = Counter(text)
+    total = len(text)
+    return -sum(count / total * math.log2(count / total) for count in counts.values())
@@ -0,0 +1,228 @@
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from urllib.parse import unquote
+
+from gitlab.client import get_client
+
+# 一次请求获取 MR 元数据、diff refs、文件变更统计、commits 与评论
+MERGE_REQUEST_BUNDLE_QUERY = """
+query MergeRequestBundle(
+  $fullPath: ID!
+  $iid: String!
+  $commitsAfter: String
+  $notesAfter: String
+) {
+  project(fullPath: $fullPath) {
+    id
+    mergeRequest(iid: $iid) {
+      iid
+      title
+      description
+      state
+      webUrl
+      sourceBranch
+      targetBranch
+      diffRefs {
+        baseSha
+        headSha
+        startSha
+      }
+      diffStats {
+        path
+        additions
+        deletions
+      }
+      commits(first: 100, after: $commitsAfter) {
+        pageInfo {
+          hasNextPage
+          endCursor
+        }
+        nodes {
+          sha
+          shortId
+          title
+          message
+          authorName
+          authoredDate
+          committedDate
+          webUrl
+        }
+      }
+      notes(first: 100, after: $notesAfter) {
+        pageInfo {
+          hasNextPage
+          endCursor
+        }
+        nodes {
+          body
+          system
+          createdAt
+        }
+      }
+    }
+  }
+}
+"""
+
+# 根据源分支查找打开状态的 MR，替代 REST 的项目查询 + MR 查询两次请求
+MERGE_REQUEST_BY_BRANCH_QUERY = """
+query MergeRequestByBranch($fullPath: ID!, $branch: String!) {
+  project(fullPath: $fullPath) {
+    mergeRequests(sourceBranches: [$branch], state: opened, first: 1) {
+      nodes {
+        iid
+        webUrl
+      }
+    }
+  }
+}
+"""
+
+
+@dataclass
+class MergeRequestBundle:
+    """GraphQL 一次获取的 MR 数据，字段结构与对应的 REST 接口保持一致"""
+
+    detail: Dict[str, Any]
+    commits: List[Dict[str, Any]] = field(default_factory=list)
+    notes: List[Dict[str, Any]] = field(default_factory=list)
+    diff_stats: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def versions(self) -> List[Dict[str, Any]]:
+        """与 get_merge_request_versions 相同结构的最新版本信息"""
+        diff_refs = self.detail.get("diff_refs") or {}
+        if not diff_refs:
+            return []
+        return [
+            {
+                "base_commit_sha": diff_refs.get("base_sha"),
+                "head_commit_sha": diff_refs.get("head_sha"),
+                "start_commit_sha": diff_refs.get("start_sha"),
+            }
+        ]
+
+
+def use_graphql() -> bool:
+    """是否启用 GraphQL 获取 MR 数据，通过 GITLAB_USE_GRAPHQL=1 开启"""
+    return os.getenv("GITLAB_USE_GRAPHQL", "").lower() in ("1", "true", "yes")
+
+
+def _full_path(project_id: str) -> str:
+    """REST 使用 URL 编码的项目路径，GraphQL 使用原始路径"""
+    return unquote(project_id)
+
+
+def fetch_merge_request_bundle(project_id: str, mr_number: str) -> MergeRequestBundle:
+    """
+    通过 GraphQL 获取 MR 元数据、commits、评论与文件变更统计
+
+    commits 或评论超过 100 条时，继续请求剩余的分页。
+
+    Args:
+        project_id: URL 编码的项目路径，与 REST 接口一致
+        mr_number: MR 编号
+
+    Returns:
+        MergeRequestBundle: commits 与评论均按时间倒序（最新在前），与 REST 接口一致
+    """
+    variables = {
+        "fullPath": _full_path(project_id),
+        "iid": str(mr_number),
+        "commitsAfter": None,
+        "notesAfter": None,
+    }
+    bundle: Optional[MergeRequestBundle] = None
+    commits_done = notes_done = False
+
+    while True:
+        data = get_client().graphql(MERGE_REQUEST_BUNDLE_QUERY, dict(variables))
+        project = data.get("project") or {}
+        merge_request = project.get("mergeRequest")
+        if not merge_request:
+            raise ValueError(f"未找到 MR: {variables['fullPath']}!{mr_number}")
+
+        if bundle is None:
+            bundle = MergeRequestBundle(
+                detail=_to_rest_detail(merge_request),
+                diff_stats=merge_request.get("diffStats") or [],
+            )
+
+        commits = merge_request["commits"]
+        notes = merge_request["notes"]
+        if not commits_done:
+            bundle.commits.extend(_to_rest_commit(node) for node in commits["nodes"])
+            commits_done = not commits["pageInfo"]["hasNextPage"]
+            variables["commitsAfter"] = commits["pageInfo"]["endCursor"]
+        if not notes_done:
+            bundle.notes.extend(_to_rest_note(node) for node in notes["nodes"])
+            notes_done = not notes["pageInfo"]["hasNextPage"]
+            variables["notesAfter"] = notes["pageInfo"]["endCursor"]
+
+        if commits_done and notes_done:
+            break
+
+    # REST 接口中 commits 与评论都是最新在前
+    bundle.commits.sort(key=lambda commit: commit["committed_date"] or "", reverse=True)
+    bundle.notes.sort(key=lambda note: note["created_at"] or "", reverse=True)
+    return bundle
+
+
+def find_merge_request_url_by_branch(project_path: str, source_branch: str) -> str:
+    """
+    通过 GraphQL 根据源分支查找打开状态的 MR
+
+    Raises:
+        ValueError: 如果找不到对应分支的 MR
+    """
+    data = get_client().graphql(
+        MERGE_REQUEST_BY_BRANCH_QUERY,
+        {"fullPath": project_path, "branch": source_branch},
+    )
+    project = data.get("project") or {}
+    nodes = (project.get("mergeRequests") or {}).get("nodes") or []
+    if not nodes:
+        raise ValueError(f"未找到源分支为 '{source_branch}' 的 MR")
+    return nodes[0]["webUrl"]
+
+
+def _to_rest_detail(merge_request: Dict[str, Any]) -> Dict[str, Any]:
+    diff_refs = merge_request.get("diffRefs") or {}
+    return {
+        "iid": int(merge_request["iid"]),
+        "title": merge_request.get("title"),
+        "description": merge_request.get("description"),
+        "state": merge_request.get("state"),
+        "web_url": merge_request.get("webUrl"),
+        "source_branch": merge_request.get("sourceBranch"),
+        "target_branch": merge_request.get("targetBranch"),
+        "diff_refs": {
+            "base_sha": diff_refs.get("baseSha"),
+            "head_sha": diff_refs.get("headSha"),
+            "start_sha": diff_refs.get("startSha"),
+        }
+        if diff_refs
+        else None,
+    }
+
+
+def _to_rest_commit(node: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": node["sha"],
+        "short_id": node["shortId"],
+        "title": node.get("title"),
+        "message": node.get("message") or "",
+        "author_name": node.get("authorName"),
+        "authored_date": node.get("authoredDate"),
+        "committed_date": node.get("committedDate"),
+        "web_url": node.get("webUrl"),
+    }
+
+
+def _to_rest_note(node: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "body": node.get("body") or "",
+        "system": node.get("system", False),
+        "created_at": node.get("createdAt"),
+    }
@@ -0,0 +1,193 @@
+import hashlib
+from typing import Any, Callable, Dict, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from utils.disk_cache import DiskCache, make_cache_key
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 缓存内容已是解码后的数据，这些响应头不再适用
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+class _TeeReader:
+    """包装流式响应的 raw，在调用方读取的同时把内容写入缓存"""
+
+    def __init__(self, raw, writer, on_error: Callable[[OSError], None]):
+        self._raw = raw
+        self._writer = writer
+        self._on_error = on_error
+
+    def read(self, amt: Optional[int] = None, *args, **kwargs) -> bytes:
+        data = self._raw.read(amt, decode_content=True)
+        if self._writer is None:
+            return data
+        try:
+            if data:
+                self._writer.write(data)
+            else:
+                self._writer.commit()
+        except OSError as e:
+            # 写缓存失败不影响调用方读取响应
+            self._writer.abort()
+            self._writer = None
+            self._on_error(e)
+        return data
+
+    def close(self):
+        # 未读完就关闭时内容不完整，不能写入缓存
+        if self._writer is not None:
+            self._writer.abort()
+        self._raw.close()
+
+    def release_conn(self):
+        release_conn = getattr(self._raw, "release_conn", None)
+        if release_conn:
+            release_conn()
+
+
+class HttpCache:
+    """
+    基于 ETag 的 GitLab GET 请求缓存
+
+    以 URL + 查询参数为 key 保存响应体与 ETag，再次请求时携带 If-None-Match，
+    GitLab 返回 304 时直接使用磁盘上的内容。
+    缓存目录不可用（不存在、只读等）时记录一次警告，请求照常发送，不使用缓存。
+    """
+
+    def __init__(self, disk_cache: DiskCache, namespace: str = ""):
+        """
+        Args:
+            disk_cache: 底层磁盘缓存
+            namespace: 缓存命名空间，用于隔离不同 token 的缓存
+        """
+        self.disk_cache = disk_cache
+        self.namespace = namespace
+        self._warned = False
+
+    def _cache_error(self, error: OSError):
+        """缓存读写失败，只在第一次记录警告"""
+        if not self._warned:
+            self._warned = True
+            logger.warning(
+                f"HTTP cache unavailable, sending requests uncached: {error}"
+            )
+
+    @staticmethod
+    def namespace_for_token(token: str) -> str:
+        """根据 token 生成命名空间，避免在缓存中保存 token 明文"""
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+
+    def key(self, url: str, params: Optional[Dict[str, Any]]) -> str:
+        return make_cache_key(self.namespace, url, sorted((params or {}).items()))
+
+    def fetch(
+        self,
+        send: Callable[..., requests.Response],
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        stream: bool = False,
+        **kwargs: Any,
+    ) -> requests.Response:
+        """
+        发送带条件的 GET 请求
+
+        Args:
+            send: 实际发送请求的函数，签名同 requests.Session.request
+            url: 完整 URL
+            params: 查询参数
+            headers: 额外请求头
+            stream: 是否流式读取响应
+        """
+        key = self.key(url, params)
+        try:
+            entry = self.disk_cache.lookup(key)
+        except OSError as e:
+            self._cache_error(e)
+            entry = None
+        request_headers = dict(headers or {})
+        if entry is not None:
+            request_headers["If-None-Match"] = entry[0]["etag"]
+
+        response = send(
+            "GET", url, params=params, headers=request_headers, stream=stream, **kwargs
+        )
+
+        if response.status_code == 304 and entry is not None:
+            cached = self._cached_response(entry, response, stream)
+            if cached is not None:
+                return cached
+            # 条目在此期间被淘汰，重新发送无条件请求
+            request_headers.pop("If-None-Match", None)
+            response = send(
+                "GET",
+                url,
+                params=params,
+                headers=request_headers,
+                stream=stream,
+                **kwargs,
+            )
+
+        etag = response.headers.get("ETag")
+        if response.status_code == 200 and etag:
+            self._store(key, etag, response, stream)
+
+        return response
+
+    def _cached_response(
+        self, entry, not_modified: requests.Response, stream: bool
+    ) -> Optional[requests.Response]:
+        meta, body_path = entry
+        try:
+            body = open(body_path, "rb")
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            self._cache_error(e)
+            return None
+        not_modified.close()
+
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = "OK"
+        response.url = meta["url"]
+        response.encoding = meta.get("encoding")
+        response.request = not_modified.request
+        response.headers = CaseInsensitiveDict(meta["headers"])
+        # 速率限制等响应头以本次 304 响应为准
+        for name, value in not_modified.headers.items():
+            if name.lower().startswith("ratelimit"):
+                response.headers[name] = value
+
+        if stream:
+            response.raw = body
+        else:
+            with body:
+                response._content = body.read()
+        response.from_cache = True
+        return response
+
+    def _store(self, key: str, etag: str, response: requests.Response, stream: bool):
+        meta = {
+            "etag": etag,
+            "url": response.url,
+            "encoding": response.encoding,
+            "headers": {
+                name: value
+                for name, value in response.headers.items()
+                if name.lower() not in _DROPPED_HEADERS
+            },
+        }
+        try:
+            if stream:
+                response.raw = _TeeReader(
+                    response.raw, self.disk_cache.writer(key, meta), self._cache_error
+                )
+            else:
+                self.disk_cache.put(key, response.content, meta)
+        except OSError as e:
+            self._cache_error(e)
@@ -0,0 +1,178 @@
+"""
+行级评论定位
+
+LLM 返回的 file_path / line_number 经常不在 diff 中，直接创建 diff 讨论会得到 400。
+LineAnchorIndex 按文件记录 diff 中出现的新增、删除与上下文行号，发请求前先解析评论位置：
+- 命中新增行使用 new_line，命中删除行使用 old_line，命中上下文行同时使用 old_line 与 new_line
+- 都没有命中时在同一侧（删除行为原文件，其他为新文件）吸附到距离最近的变更行或上下文行，超出距离则丢弃
+
+每次查找都是在有序数组上二分，复杂度 O(log n)。
+"""
+
+import os
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+# 吸附到最近变更行的最大距离（行）
+DEFAULT_SNAP_DISTANCE = 3
+
+
+@dataclass(frozen=True)
+class LineAnchor:
+    """解析后的评论位置，可直接用于 create_diff_discussion"""
+
+    old_path: str
+    new_path: str
+    line_type: str  # "new", "old", "both"
+    new_line: Optional[int] = None
+    old_line: Optional[int] = None
+    snapped: bool = False
+
+    @property
+    def line_number(self) -> int:
+        """line_type 为 "old" 时是原文件行号，否则是新文件行号"""
+        return self.old_line if self.line_type == "old" else self.new_line
+
+
+class FileLineIndex:
+    """单个文件的行号索引，所有数组按行号升序"""
+
+    def __init__(self, diff_file):
+        self.old_path: str = diff_file.old_path
+        self.new_path: str = diff_file.new_path
+        added, removed, context = [], [], []
+        for hunk in diff_file.hunks:
+            for line in hunk.lines:
+                if line.line_type == "added":
+                    added.append(line.new_line_number)
+                elif line.line_type == "removed":
+                    removed.append(line.old_line_number)
+                else:
+                    context.append((line.new_line_number, line.old_line_number))
+
+        context.sort()
+        self.added = array("i", sorted(added))
+        self.removed = array("i", sorted(removed))
+        self.context_new = array("i", (new_line for new_line, _ in context))
+        self.context_old = array("i", (old_line for _, old_line in context))
+
+    def resolve(
+        self, line_number: int, line_type: str, max_distance: int
+    ) -> Optional[LineAnchor]:
+        """
+        解析一条评论的位置
+
+        "removed" 的行号是原文件行号，只在删除行与上下文行的原文件行号中查找；
+        其他类型的行号是新文件行号，只在新增行与上下文行的新文件行号中查找。
+        只有一侧有行时（新增或删除的文件）使用该侧。
+
+        Args:
+            line_number: LLM 给出的行号
+            line_type: LLM 给出的行类型
+            max_distance: 吸附的最大距离，0 表示只接受精确命中
+
+        Returns:
+            Optional[LineAnchor]: 无法定位时返回 None
+        """
+        old_side = line_type == "removed"
+        if old_side and not (self.removed or self.context_old):
+            old_side = False
+        elif not old_side and not (self.added or self.context_new):
+            old_side = True
+
+        if old_side:
+            changed, context, other = self.removed, self.context_old, self.context_new
+        else:
+            changed, context, other = self.added, self.context_new, self.context_old
+
+        # 距离相同时优先变更行
+        candidates = []
+        nearest = _nearest_index(changed, line_number)
+        if nearest is not None:
+            candidates.append((abs(changed[nearest] - line_number), 0, nearest))
+        nearest = _nearest_index(context, line_number)
+        if nearest is not None:
+            candidates.append((abs(context[nearest] - line_number), 1, nearest))
+        if not candidates:
+            return None
+        distance, is_context, nearest = min(candidates)
+        if distance > max_distance:
+            return None
+
+        snapped = distance > 0
+        if is_context:
+            lines = (context[nearest], other[nearest])
+            old_line, new_line = lines if old_side else lines[::-1]
+            return self._anchor(
+                "both", new_line=new_line, old_line=old_line, snapped=snapped
+            )
+        if old_side:
+            return self._anchor("old", old_line=changed[nearest], snapped=snapped)
+        return self._anchor("new", new_line=changed[nearest], snapped=snapped)
+
+    def _anchor(self, line_type: str, **kwargs) -> LineAnchor:
+        return LineAnchor(self.old_path, self.new_path, line_type, **kwargs)
+
+
+class LineAnchorIndex:
+    """MR 中所有文件的行号索引"""
+
+    def __init__(self, diff_files: Iterable, max_distance: Optional[int] = None):
+        """
+        Args:
+            diff_files: DiffParser 解析出的文件
+            max_distance: 吸附的最大距离，默认读取环境变量 LINE_COMMENT_SNAP_DISTANCE
+        """
+        if max_distance is None:
+            max_distance = int(
+                os.getenv("LINE_COMMENT_SNAP_DISTANCE", DEFAULT_SNAP_DISTANCE)
+            )
+        self.max_distance = max_distance
+        self._files: Dict[str, FileLineIndex] = {}
+        for diff_file in diff_files:
+            if diff_file.is_binary:
+                continue
+            index = FileLineIndex(diff_file)
+            self._files[diff_file.new_path] = index
+            # 删除或重命名的文件也允许用原路径定位
+            self._files.setdefault(diff_file.old_path, index)
+
+    def resolve(
+        self, file_path: str, line_number, line_type: str = "added"
+    ) -> Optional[LineAnchor]:
+        """
+        解析 LLM 返回的评论位置
+
+        Args:
+            file_path: 文件路径
+            line_number: 行号
+            line_type: "added"、"removed" 或 "modified"
+
+        Returns:
+            Optional[LineAnchor]: 文件不在 diff 中或附近没有变更行时返回 None
+        """
+        index = self._files.get((file_path or "").lstrip("/"))
+        if index is None:
+            return None
+        try:
+            line_number = int(line_number)
+        except (TypeError, ValueError):
+            return None
+        return index.resolve(line_number, line_type, self.max_distance)
+
+    def __contains__(self, file_path: str) -> bool:
+        return file_path in self._files
+
+
+def _nearest_index(values: array, value: int) -> Optional[int]:
+    """有序数组中与 value 最接近的元素的下标，距离相同时取较小的元素"""
+    if not values:
+        return None
+    index = bisect_left(values, value)
+    if index == 0:
+        return 0
+    if index == len(values):
+        return index - 1
+    return index - 1 if value - values[index - 1] <= values[index] - value else index
@@ -1,12 +1,14 @@
 import json
 import os
 from dataclasses import dataclass
+from typing import Iterator, List, Optional
+from urllib.parse import quote
 
-import requests
-
-from gitlab.auth import base_url, headers
+from gitlab.client import get_client
+from gitlab.diff_parser import DiffFile, DiffParser
 from gitlab.util import (
     filter_files_from_diff,
+    iter_filtered_diff_lines,
     parse_merge_request_url,
     parse_project_name,
 )
@@ -33,39 +35,120 @@ class Commit:
 
 def get_merge_request_detail(project_id: str, mr_number: str):
     """获取 MR 详情"""
-    url = f"{base_url}/projects/{project_id}/merge_requests/{mr_number}"
-    response = requests.get(url, headers=headers)
+    path = f"/projects/{project_id}/merge_requests/{mr_number}"
+    response = get_client().get(path)
     return response.json()
 
 
+# 流式读取 raw diff 时每次读取的字节数
+RAW_DIFF_CHUNK_SIZE = 64 * 1024
+
+
 def get_merge_request_raw_diff(
     project_id: str,
     mr_number: str,
-    files_to_filter: list[str] = ["pnpm-lock.yaml", "package-lock.json"],
+    files_to_filter: Optional[List[str]] = None,
+    stream: bool = False,
 ):
-    """获取 MR 原始差异"""
-    url = f"{base_url}/projects/{project_id}/merge_requests/{mr_number}/raw_diffs"
-    response = requests.get(url, headers=headers)
+    """
+    获取 MR 原始差异
+
+    Args:
+        project_id: 项目 ID
+        mr_number: MR 编号
+        files_to_filter: 需要过滤的文件，为空时使用 SKIP_FILES
+        stream: 是否流式下载，边下载边过滤，内存中不会保留未过滤的完整 diff
+    """
+    if stream:
+        return "\n".join(
+            iter_merge_request_raw_diff(project_id, mr_number, files_to_filter)
+        )
+
+    path = f"/projects/{project_id}/merge_requests/{mr_number}/raw_diffs"
+    response = get_client().get(path)
     original_raw_content = response.content.decode("utf-8")
 
-    # 过滤掉 pnpm-lock.yaml 文件
+    # 过滤掉 SKIP_FILES 中的文件
     raw_content = filter_files_from_diff(original_raw_content, files_to_filter)
 
     return raw_content
 
 
+def iter_merge_request_raw_diff(
+    project_id: str,
+    mr_number: str,
+    files_to_filter: Optional[List[str]] = None,
+) -> Iterator[str]:
+    """
+    流式获取 MR 原始差异，逐行产出过滤后的内容（不含换行符）
+
+    "\n".join 的结果与 get_merge_request_raw_diff 相同
+    """
+    path = f"/projects/{project_id}/merge_requests/{mr_number}/raw_diffs"
+    response = get_client().get(path, stream=True)
+    try:
+        yield from iter_filtered_diff_lines(
+            _iter_response_lines(response), files_to_filter
+        )
+    finally:
+        response.close()
+
+
+def iter_merge_request_diff_files(
+    project_id: str,
+    mr_number: str,
+    files_to_filter: Optional[List[str]] = None,
+) -> Iterator[DiffFile]:
+    """
+    流式获取并解析 MR 原始差异，每个文件解析完成后立即产出
+
+    边下载边过滤、边解析，内存中只保留当前正在解析的文件
+    """
+    yield from DiffParser().parse_diff_iter(
+        iter_merge_request_raw_diff(project_id, mr_number, files_to_filter)
+    )
+
+
+def _iter_response_lines(response) -> Iterator[str]:
+    """
+    按 "\n" 切分响应内容
+
+    不使用 requests 的 iter_lines：它会把 \r 等字符也当作换行，破坏 diff 内容
+    """
+    remainder = b""
+    for chunk in response.iter_content(chunk_size=RAW_DIFF_CHUNK_SIZE):
+        lines = (remainder + chunk).split(b"\n")
+        remainder = lines.pop()
+        for line in lines:
+            yield line.decode("utf-8")
+    yield remainder.decode("utf-8")
+
+
+def iter_merge_request_diff(project_id: str, mr_number: str) -> Iterator[dict]:
+    """
+    逐个文件获取 MR 差异（自动翻页）
+    @link https://docs.gitlab.com/api/merge_requests/#list-merge-request-diffs
+    """
+    path = f"/projects/{project_id}/merge_requests/{mr_number}/diffs"
+    return get_client().paginate(path)
+
+
 def get_merge_request_diff(project_id: str, mr_number: str):
     """
     获取 MR 差异
     @link https://docs.gitlab.com/api/merge_requests/#list-merge-request-diffs
     """
-    url = f"{base_url}/projects/{project_id}/merge_requests/{mr_number}/diffs"
-    params = {
-        # "per_page": 999,  # 每页显示的数量
-    }
-    response = requests.get(url, headers=headers, params=params)
+    return list(iter_merge_request_diff(project_id, mr_number))
 
-    return response.json()
+
+def iter_merge_request_commits(project_id: str, mr_number: str) -> Iterator[dict]:
+    """
+    逐条获取 MR 提交记录（自动翻页），最新的 commit 在前
+
+    https://docs.gitlab.com/api/merge_requests/#get-single-merge-request-commits
+    """
+    path = f"/projects/{project_id}/merge_requests/{mr_number}/commits"
+    return get_client().paginate(path)
 
 
 def get_merge_request_commits(
@@ -87,10 +170,18 @@ def get_merge_request_commits(
 
     https://docs.gitlab.com/api/merge_requests/#get-single-merge-request-commits
     """
-    url = f"{base_url}/projects/{project_id}/merge_requests/{mr_number}/commits"
-    response = requests.get(url, headers=headers)
-    all_commits = response.json()
+    all_commits = list(iter_merge_request_commits(project_id, mr_number))
+    return select_commits_since(all_commits, start_commit_hash)
+
 
+def select_commits_since(
+    all_commits: list[dict], start_commit_hash: str = None
+) -> list[dict]:
+    """
+    从倒序（最新在前）的 commits 中选出从 start_commit_hash 开始到最新的部分（包含起始 commit）
+
+    找不到 start_commit_hash 或未指定时返回全部 commits
+    """
     # 如果没有指定起始 commit，返回所有 commits
     if not start_commit_hash:
         return all_commits
@@ -134,15 +225,61 @@ def get_compare_diff_from_commits(
     Returns:
         str: 差异内容
     """
-    url = f"{base_url}/projects/{project_id}/repository/compare"
+    path = f"/projects/{project_id}/repository/compare"
     params = {
         "from": from_commit,
         "to": to_commit,
     }
-    response = requests.get(url, headers=headers, params=params)
+    response = get_client().get(path, params=params)
     return response.json()
 
 
+def get_repository_file_raw(
+    project_id: str, file_path: str, ref: str, max_bytes: Optional[int] = None
+) -> Optional[bytes]:
+    """
+    获取指定版本的文件内容
+
+    docs: https://docs.gitlab.com/api/repository_files/#get-raw-file-from-repository
+
+    Args:
+        project_id: 项目 ID
+        file_path: 文件路径
+        ref: 分支、tag 或 commit
+        max_bytes: 大小上限，为 None 时不限制；流式读取，
+            Content-Length 超过上限或读取的内容超过上限时立即停止下载
+
+    Returns:
+        Optional[bytes]: 文件内容，文件不存在时返回 None
+
+    Raises:
+        ValueError: 文件超过 max_bytes
+    """
+    path = f"/projects/{project_id}/repository/files/{quote(file_path, safe='')}/raw"
+    if max_bytes is None:
+        response = get_client().get(path, params={"ref": ref})
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.content
+
+    response = get_client().get(path, params={"ref": ref}, stream=True)
+    try:
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        if int(response.headers.get("Content-Length") or 0) > max_bytes:
+            raise ValueError(f"文件 {file_path} 超过 {max_bytes} 字节")
+        content = bytearray()
+        for chunk in response.iter_content(chunk_size=RAW_DIFF_CHUNK_SIZE):
+            content += chunk
+            if len(content) > max_bytes:
+                raise ValueError(f"文件 {file_path} 超过 {max_bytes} 字节")
+        return bytes(content)
+    finally:
+        response.close()
+
+
 def create_merge_request(
     project_id: str,
     source_branch: str,
@@ -171,7 +308,7 @@ def create_merge_request(
 
     Docs: https://docs.gitlab.com/ee/api/merge_requests.html#create-mr
     """
-    url = f"{base_url}/projects/{project_id}/merge_requests"
+    path = f"/projects/{project_id}/merge_requests"
 
     data = {
         "source_branch": source_branch,
@@ -188,7 +325,7 @@ def create_merge_request(
     if assignee_id:
         data["assignee_id"] = assignee_id
 
-    response = requests.post(url, headers=headers, json=data)
+    response = get_client().post(path, json=data)
     response.raise_for_status()
     return response.json()
 
@@ -203,9 +340,9 @@ def get_user_by_username(username: str) -> dict:
     Returns:
         dict: 用户信息，包含 id 等字段
     """
-    url = f"{base_url}/users"
+    path = "/users"
     params = {"username": username}
-    response = requests.get(url, headers=headers, params=params)
+    response = get_client().get(path, params=params)
     response.raise_for_status()
 
     users = response.json()
@@ -227,9 +364,9 @@ def get_project_by_path(project_path: str) -> dict:
     """
     # URL encode 项目路径
     encoded_path = parse_project_name(project_path)
-    url = f"{base_url}/projects/{encoded_path}"
+    path = f"/projects/{encoded_path}"
 
-    response = requests.get(url, headers=headers)
+    response = get_client().get(path)
     response.raise_for_status()
     return response.json()
 
@@ -248,13 +385,13 @@ def get_merge_request_by_source_branch(project_id: str, source_branch: str) -> d
     Raises:
         ValueError: 如果找不到对应分支的 MR
     """
-    url = f"{base_url}/projects/{project_id}/merge_requests"
+    path = f"/projects/{project_id}/merge_requests"
     params = {
         "source_branch": source_branch,
         "state": "opened",  # 只查找打开状态的 MR
     }
 
-    response = requests.get(url, headers=headers, params=params)
+    response = get_client().get(path, params=params)
     response.raise_for_status()
 
     mrs = response.json()
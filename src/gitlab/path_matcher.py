@@ -0,0 +1,122 @@
+"""
+gitignore 风格的路径匹配
+
+SKIP_FILES 与 files_to_filter 中的每一项都是一个 glob，规则与 .gitignore 一致：
+- 不含 "/" 的模式匹配任意目录下的同名文件或目录，如 "pnpm-lock.yaml"、"*.min.js"
+- 含 "/" 的模式相对仓库根目录匹配，如 "dist/**"、"src/generated/*.ts"，开头的 "/" 可省略
+- 以 "/" 结尾的模式只匹配目录，如 "icon/"
+- "*" 与 "?" 不跨越 "/"，"**" 匹配任意层级目录，"[abc]" 匹配字符集合
+- 匹配到目录时，目录下的所有文件都会被匹配
+
+所有模式编译成一个正则，同一组模式在进程内只编译一次。
+"""
+
+import functools
+import re
+from typing import Iterable, List, Tuple
+
+
+class PathMatcher:
+    """由一组 glob 编译而成的路径匹配器"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: Tuple[str, ...] = tuple(
+            pattern.strip() for pattern in patterns if pattern and pattern.strip()
+        )
+        fragments = [_translate(pattern) for pattern in self.patterns]
+        self._regex = (
+            re.compile("|".join(f"(?:{fragment})" for fragment in fragments))
+            if fragments
+            else None
+        )
+
+    def match(self, path: str) -> bool:
+        """路径是否匹配任意一个模式"""
+        if self._regex is None:
+            return False
+        return self._regex.fullmatch(path.lstrip("/")) is not None
+
+    def __bool__(self) -> bool:
+        return self._regex is not None
+
+    def __repr__(self) -> str:
+        return f"PathMatcher({list(self.patterns)!r})"
+
+
+@functools.lru_cache(maxsize=64)
+def _compile(patterns: Tuple[str, ...]) -> PathMatcher:
+    return PathMatcher(patterns)
+
+
+def get_path_matcher(patterns: Iterable[str]) -> PathMatcher:
+    """
+    获取一组模式对应的匹配器，相同的模式复用已编译的匹配器
+
+    Args:
+        patterns: glob 列表，如 ["pnpm-lock.yaml", "dist/**", "*.min.js"]
+    """
+    if isinstance(patterns, PathMatcher):
+        return patterns
+    return _compile(tuple(patterns))
+
+
+def _translate(pattern: str) -> str:
+    """将一个 gitignore 风格的 glob 转换为正则"""
+    directory_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+
+    # 只有结尾的 "/" 时不算锚定，与 .gitignore 一致
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+
+    regex = _translate_glob(pattern)
+    if not anchored:
+        regex = f"(?:.*/)?{regex}"
+
+    # 目录模式必须匹配到某个目录，普通模式还可以匹配文件本身
+    return f"{regex}/.*" if directory_only else f"{regex}(?:/.*)?"
+
+
+def _translate_glob(pattern: str) -> str:
+    parts: List[str] = []
+    i, n = 0, len(pattern)
+    while i < n:
+        char = pattern[i]
+        if pattern.startswith("**/", i) and (i == 0 or pattern[i - 1] == "/"):
+            # "**/"：零或多层目录
+            parts.append("(?:.*/)?")
+            i += 3
+        elif (
+            pattern.startswith("**", i)
+            and i + 2 == n
+            and (i == 0 or pattern[i - 1] == "/")
+        ):
+            # 结尾的 "/**"：目录下的所有内容
+            parts.append(".*")
+            i += 2
+        elif char == "*":
+            # 普通的 "*"，连续多个 "*" 与一个等价
+            while i < n and pattern[i] == "*":
+                i += 1
+            parts.append("[^/]*")
+        elif char == "?":
+            parts.append("[^/]")
+            i += 1
+        elif char == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                parts.append(re.escape(char))
+                i += 1
+            else:
+                body = pattern[i + 1 : end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                parts.append(f"[{body}]")
+                i = end + 1
+        elif char == "\\" and i + 1 < n:
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(char))
+            i += 1
+    return "".join(parts)
@@ -0,0 +1,126 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+
+# 需要重试的状态码：429 为速率限制，5xx 为 GitLab 临时不可用
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+
+class RateLimiter:
+    """
+    GitLab 请求调度器
+
+    - 令牌桶：平时以 rate 的速率发放令牌，允许 burst 个请求的突发
+    - 读取 RateLimit-Remaining / RateLimit-Reset，按剩余配额降低发放速率，
+      配额耗尽时暂停到重置时间
+    - 429 / 5xx 时优先使用 Retry-After，否则使用带抖动的指数退避
+
+    同一进程内的所有请求共享一个实例，暂停对所有线程同时生效。
+    """
+
+    def __init__(
+        self,
+        rate: float = 10.0,
+        burst: int = 20,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ):
+        """
+        Args:
+            rate: 每秒最多发放的令牌数
+            burst: 令牌桶容量
+            max_retries: 单个请求的最大重试次数
+            base_delay: 指数退避的初始等待秒数
+            max_delay: 单次等待的上限秒数
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated_at
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    def acquire(self):
+        """获取一个令牌，必要时阻塞等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._blocked_until - now
+                if wait <= 0:
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def update(self, headers: Mapping[str, str]):
+        """根据 GitLab 返回的 RateLimit-* 响应头调整发放速率"""
+        remaining = headers.get("RateLimit-Remaining")
+        reset = headers.get("RateLimit-Reset")
+        if remaining is None or not reset:
+            return
+
+        remaining = int(remaining)
+        seconds_left = max(0.0, float(reset) - time.time())
+
+        with self._lock:
+            if remaining <= 0:
+                self.block_for(seconds_left, locked=True)
+            elif seconds_left > 0:
+                # 把剩余配额平均分配到重置前的时间窗口内
+                self.rate = min(self.max_rate, remaining / seconds_left)
+                self._tokens = min(self._tokens, remaining)
+            else:
+                self.rate = self.max_rate
+
+    def block_for(self, seconds: float, locked: bool = False):
+        """暂停所有请求 seconds 秒"""
+        if locked:
+            until = time.monotonic() + seconds
+            self._blocked_until = max(self._blocked_until, until)
+            return
+        with self._lock:
+            self.block_for(seconds, locked=True)
+
+    def backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """
+        计算第 attempt 次重试前的等待时间，并暂停所有请求
+
+        Args:
+            attempt: 已重试次数，从 0 开始
+            retry_after: Retry-After 响应头，可以是秒数或 HTTP 日期
+        """
+        delay = _parse_retry_after(retry_after)
+        if delay is None:
+            # full jitter：在 [0, base * 2^attempt] 内随机，避免多个进程同时重试
+            delay = random.uniform(0, self.base_delay * (2**attempt))
+        delay = min(delay, self.max_delay)
+        self.block_for(delay)
+        return delay
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,224 @@
+"""
+增量代码审查的状态
+
+以 项目 + MR + 审查配置（模型与 prompt）为 key，保存上次审查的 head_commit_sha 与每个文件的审查结果。
+每个文件的结果按该文件 hunk 的指纹（路径、hunk 范围与每行内容的哈希）存储，
+下次审查时只把指纹变化的文件发给 LLM，其余文件沿用上次的结果。
+
+环境变量：
+    CODE_REVIEW_INCREMENTAL: 设为 0 关闭，每次都审查全部文件且不保存状态，默认开启
+    CODE_REVIEW_FULL: 设为 1 时本次不沿用上次的结果、重新审查全部文件，但仍保存本次的状态（CLI 的 --full-review）
+    CODE_REVIEW_STATE_DIR: 状态目录，默认 ~/.cache/gitlab-merge-request-bot/review
+    CODE_REVIEW_STATE_SIZE_MB: 状态总大小上限，默认 16
+"""
+
+import functools
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from gitlab.auth import get_gitlab_config
+from gitlab.diff_parser import DiffFile
+from gitlab.http_cache import HttpCache
+from utils.disk_cache import DEFAULT_CACHE_ROOT, DiskCache, make_cache_key
+
+DEFAULT_REVIEW_STATE_SIZE_MB = 16
+
+# 状态或指纹的计算方式变化时递增，旧状态自然失效
+STATE_FORMAT_VERSION = 1
+
+
+def file_fingerprint(diff_file: DiffFile) -> str:
+    """
+    计算文件 hunk 的指纹，路径、hunk 范围、行类型或行内容任一变化时指纹都会变化
+
+    hunk 的起始行号也计入指纹：其他提交让文件行号发生偏移时，上次的行级评论位置已经不准确，需要重新审查
+    """
+    digest = hashlib.sha256()
+    digest.update(
+        json.dumps(
+            [
+                diff_file.old_path,
+                diff_file.new_path,
+                diff_file.is_new_file,
+                diff_file.is_deleted_file,
+                diff_file.is_binary,
+            ]
+        ).encode("utf-8")
+    )
+    for hunk in diff_file.hunks:
+        digest.update(
+            f"\n@@ {hunk.old_start},{hunk.old_count} {hunk.new_start},{hunk.new_count}\n".encode()
+        )
+        digest.update(bytes(hunk.line_types))
+        for content in hunk.contents:
+            digest.update(content.encode("utf-8"))
+            digest.update(b"\n")
+    return digest.hexdigest()
+
+
+@dataclass
+class FileReview:
+    """单个文件的审查结果"""
+
+    fingerprint: str
+    line_comments: List[Dict[str, Any]] = field(default_factory=list)
+    # 文件所在块的总体评估与总体建议，一个文件被拆成多块时有多条
+    summaries: List[str] = field(default_factory=list)
+    general_suggestions: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ReviewState:
+    """一个 MR 上次审查的状态"""
+
+    head_sha: Optional[str]
+    files: Dict[str, FileReview] = field(default_factory=dict)
+
+    def split_files(
+        self, diff_files: List[DiffFile]
+    ) -> Tuple[List[DiffFile], Dict[str, FileReview]]:
+        """
+        按指纹把文件分为需要重新审查的与可以沿用结果的
+
+        Returns:
+            (指纹变化或新出现的文件, {new_path: 沿用的审查结果})
+        """
+        changed = []
+        reused = {}
+        for diff_file in diff_files:
+            previous = self.files.get(diff_file.new_path)
+            if previous is not None and previous.fingerprint == file_fingerprint(
+                diff_file
+            ):
+                reused[diff_file.new_path] = previous
+            else:
+                changed.append(diff_file)
+        return changed, reused
+
+
+def build_file_reviews(
+    chunks: List[Tuple[List[DiffFile], Dict[str, Any]]],
+) -> Dict[str, FileReview]:
+    """
+    把各块的审查结果按文件拆开
+
+    行级评论按 file_path 归属到对应文件，块的总体评估与总体建议记在块中的每个文件上
+
+    Args:
+        chunks: [(块中的文件, 该块的审查结果), ...]
+
+    Returns:
+        Dict[str, FileReview]: {new_path: 审查结果}
+    """
+    reviews: Dict[str, FileReview] = {}
+    for diff_files, result in chunks:
+        comments = result.get("line_comments") or []
+        summary = result.get("overall_summary")
+        suggestions = result.get("general_suggestions") or []
+        for diff_file in diff_files:
+            review = reviews.get(diff_file.new_path)
+            if review is None:
+                review = FileReview(fingerprint=file_fingerprint(diff_file))
+                reviews[diff_file.new_path] = review
+            paths = {diff_file.new_path, diff_file.old_path}
+            review.line_comments.extend(
+                comment
+                for comment in comments
+                if (comment.get("file_path") or "").lstrip("/") in paths
+                and comment not in review.line_comments
+            )
+            if summary and summary not in review.summaries:
+                review.summaries.append(summary)
+            for suggestion in suggestions:
+                if suggestion not in review.general_suggestions:
+                    review.general_suggestions.append(suggestion)
+    return reviews
+
+
+class ReviewStateStore:
+    """按 MR 保存增量审查的状态"""
+
+    def __init__(self, disk_cache: DiskCache, namespace: str = ""):
+        """
+        Args:
+            disk_cache: 底层磁盘缓存
+            namespace: 缓存命名空间，用于隔离不同 GitLab 实例与 token
+        """
+        self.disk_cache = disk_cache
+        self.namespace = namespace
+
+    def key(self, project_id: str, mr_number: str, review_config: str) -> str:
+        return make_cache_key(
+            "review",
+            STATE_FORMAT_VERSION,
+            self.namespace,
+            str(project_id),
+            str(mr_number),
+            review_config,
+        )
+
+    def load(
+        self, project_id: str, mr_number: str, review_config: str
+    ) -> Optional[ReviewState]:
+        """
+        读取上次审查的状态
+
+        Args:
+            project_id: 项目 ID
+            mr_number: MR 编号
+            review_config: 审查配置的标识，模型或 prompt 变化后旧结果不再沿用
+
+        Returns:
+            Optional[ReviewState]: 没有审查过、状态损坏或无法读取时返回 None
+        """
+        try:
+            entry = self.disk_cache.get(self.key(project_id, mr_number, review_config))
+        except OSError:
+            return None
+        if entry is None:
+            return None
+        try:
+            data = json.loads(entry[1])
+            return ReviewState(
+                head_sha=data["head_sha"],
+                files={
+                    path: FileReview(**review) for path, review in data["files"].items()
+                },
+            )
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def save(
+        self, project_id: str, mr_number: str, review_config: str, state: ReviewState
+    ):
+        """保存本次审查的状态，覆盖上次的状态"""
+        body = json.dumps(asdict(state), ensure_ascii=False).encode("utf-8")
+        self.disk_cache.put(
+            self.key(project_id, mr_number, review_config),
+            body,
+            meta={"head_sha": state.head_sha, "files": len(state.files)},
+        )
+
+
+def is_full_review() -> bool:
+    """CODE_REVIEW_FULL=1 时本次重新审查全部文件，不读取上次的状态"""
+    return os.getenv("CODE_REVIEW_FULL", "0").lower() in ("1", "true", "yes")
+
+
+@functools.lru_cache(maxsize=1)
+def get_review_state_store() -> Optional[ReviewStateStore]:
+    """根据环境变量创建增量审查状态存储，CODE_REVIEW_INCREMENTAL=0 时返回 None"""
+    if os.getenv("CODE_REVIEW_INCREMENTAL", "1").lower() in ("0", "false", "no"):
+        return None
+    directory = os.getenv("CODE_REVIEW_STATE_DIR") or DEFAULT_CACHE_ROOT / "review"
+    size_mb = int(
+        os.getenv("CODE_REVIEW_STATE_SIZE_MB") or DEFAULT_REVIEW_STATE_SIZE_MB
+    )
+    api_url, private_token = get_gitlab_config()
+    return ReviewStateStore(
+        DiskCache(directory, max_bytes=size_mb * 1024 * 1024),
+        namespace=HttpCache.namespace_for_token(f"{api_url}\n{private_token}"),
+    )
@@ -0,0 +1,180 @@
+import asyncio
+import time
+from unittest.mock import Mock, patch
+
+from gitlab.client import AsyncGitLabClient, GitLabClient, _parse_timeout, get_client
+
+
+class TestGitLabClient:
+    """测试 GitLabClient"""
+
+    def test_session_carries_token(self):
+        """测试 Session 携带 PRIVATE-TOKEN 并保持连接"""
+        client = GitLabClient("https://gitlab.example.com/api/v4/", "glpat-test")
+
+        assert client.session.headers["PRIVATE-TOKEN"] == "glpat-test"
+        assert client.session.headers["Connection"] == "keep-alive"
+
+    def test_pool_size(self):
+        """测试连接池大小配置"""
+        client = GitLabClient("https://gitlab.example.com/api/v4", "t", pool_size=3)
+
+        adapter = client.session.get_adapter("https://gitlab.example.com")
+        assert adapter._pool_maxsize == 3
+        assert adapter._pool_block is True
+
+    def test_url_join(self):
+        """测试 API 路径拼接"""
+        client = GitLabClient("https://gitlab.example.com/api/v4/", "t")
+
+        assert (
+            client.url("/projects/1/merge_requests")
+            == "https://gitlab.example.com/api/v4/projects/1/merge_requests"
+        )
+        assert (
+            client.url("https://other.example.com/x") == "https://other.example.com/x"
+        )
+
+    def test_default_and_per_call_timeout(self):
+        """测试默认超时与单次调用超时"""
+        client = GitLabClient("https://gitlab.example.com/api/v4", "t", timeout=7)
+        client.session.request = Mock()
+
+        client.get("/user")
+        assert client.session.request.call_args.kwargs["timeout"] == 7
+
+        client.get("/user", timeout=1)
+        assert client.session.request.call_args.kwargs["timeout"] == 1
+
+    def test_parse_timeout(self):
+        """测试超时配置解析"""
+        assert _parse_timeout(None) == (5.0, 60.0)
+        assert _parse_timeout("30") == 30.0
+        assert _parse_timeout("3,90") == (3.0, 90.0)
+
+    @patch("gitlab.client._client", None)
+    def test_get_client_is_shared(self):
+        """测试进程内共享同一个客户端"""
+        assert get_client() is get_client()
+
+
+class TestAsyncGitLabClient:
+    """测试 AsyncGitLabClient"""
+
+    def test_run_concurrently(self):
+        """测试独立调用并发执行，总耗时约等于最慢的一次调用"""
+        client = GitLabClient("https://gitlab.example.com/api/v4", "t", pool_size=4)
+        async_client = AsyncGitLabClient(client)
+
+        def slow_call(value):
+            time.sleep(0.2)
+            return value
+
+        async def main():
+            return await asyncio.gather(
+                async_client.run(slow_call, 1),
+                async_client.run(slow_call, 2),
+                async_client.run(slow_call, 3),
+            )
+
+        start = time.perf_counter()
+        result = asyncio.run(main())
+        elapsed = time.perf_counter() - start
+
+        assert result == [1, 2, 3]
+        assert elapsed < 0.5
+
+    def test_max_concurrency(self):
+        """测试并发数受限"""
+        client = GitLabClient("https://gitlab.example.com/api/v4", "t")
+        async_client = AsyncGitLabClient(client, max_concurrency=1)
+
+        async def main():
+            return await asyncio.gather(
+                async_client.run(time.sleep, 0.1), async_client.run(time.sleep, 0.1)
+            )
+
+        start = time.perf_counter()
+        asyncio.run(main())
+        assert time.perf_counter() - start >= 0.2
+
+    def test_get_uses_sync_client(self):
+        """测试异步 GET 复用同步客户端"""
+        client = GitLabClient("https://gitlab.example.com/api/v4", "t")
+        client.session.request = Mock(return_value="response")
+
+        result = asyncio.run(AsyncGitLabClient(client).get("/user"))
+
+        assert result == "response"
+        args, kwargs = client.session.request.call_args
+        assert args == ("GET", "https://gitlab.example.com/api/v4/user")
+
+
+def _page_response(items, headers=None, links=None):
+    response = Mock()
+    response.json.return_value = items
+    response.headers = headers or {}
+    response.links = links or {}
+    return response
+
+
+class TestPaginate:
+    """测试 GitLabClient.paginate"""
+
+    def setup_method(self):
+        self.client = GitLabClient("https://gitlab.example.com/api/v4", "t")
+
+    def test_single_page(self):
+        """测试只有一页时只请求一次"""
+        self.client.get = Mock(return_value=_page_response([1, 2]))
+
+        assert list(self.client.paginate("/notes")) == [1, 2]
+        self.client.get.assert_called_once_with("/notes", params={"per_page": 100})
+
+    def test_total_pages_fetched_in_order(self):
+        """测试已知总页数时并发获取剩余页面并保持顺序"""
+        pages = {
+            1: _page_response([1, 2], {"X-Page": "1", "X-Total-Pages": "3"}),
+            2: _page_response([3, 4]),
+            3: _page_response([5]),
+        }
+
+        def fake_get(path, params=None):
+            page = params.get("page", 1)
+            if page == 2:
+                time.sleep(0.05)  # 第二页较慢，结果仍需按顺序返回
+            return pages[page]
+
+        self.client.get = Mock(side_effect=fake_get)
+
+        assert list(self.client.paginate("/commits")) == [1, 2, 3, 4, 5]
+        assert self.client.get.call_count == 3
+
+    def test_follow_next_page_header(self):
+        """测试没有总页数时跟随 X-Next-Page"""
+        self.client.get = Mock(
+            side_effect=[
+                _page_response([1], {"X-Next-Page": "2"}),
+                _page_response([2], {"X-Next-Page": ""}),
+            ]
+        )
+
+        assert list(self.client.paginate("/notes", {"sort": "desc"})) == [1, 2]
+        self.client.get.assert_called_with(
+            "/notes", params={"per_page": 100, "sort": "desc", "page": "2"}
+        )
+
+    def test_follow_keyset_link(self):
+        """测试 keyset 分页跟随 Link rel=next"""
+        next_url = "https://gitlab.example.com/api/v4/notes?cursor=abc"
+        self.client.get = Mock(
+            side_effect=[
+                _page_response([1], links={"next": {"url": next_url}}),
+                _page_response([2]),
+            ]
+        )
+
+        result = list(self.client.paginate("/notes", {"pagination": "keyset"}))
+
+        assert result == [1, 2]
+        self.client.get.assert_called_with(next_url)
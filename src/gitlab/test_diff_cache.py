@@ -0,0 +1,133 @@
+from unittest.mock import Mock
+
+import pytest
+
+from gitlab.diff_cache import (
+    DiffCache,
+    load_merge_request_diff_files,
+    load_merge_request_raw_diff,
+)
+from gitlab.diff_parser import DiffParser, format_diff_for_review
+from gitlab.fake_server import FakeGitLabConfig
+from gitlab.merge_request import get_merge_request_raw_diff
+from utils.disk_cache import DiskCache
+
+RAW_DIFFS = "GET /api/v4/projects/1/merge_requests/1/raw_diffs"
+
+
+@pytest.fixture
+def diff_cache(tmp_path, monkeypatch):
+    cache = DiffCache(DiskCache(tmp_path, max_bytes=10 * 1024 * 1024), "test")
+    monkeypatch.setattr("gitlab.diff_cache.get_diff_cache", lambda: cache)
+    return cache
+
+
+class TestDiffCache:
+    """测试按 head_commit_sha 缓存 diff"""
+
+    raw_diff = """diff --git a/a.py b/a.py
+--- a/a.py
++++ b/a.py
+@@ -1 +1 @@
+-a
++b
+"""
+
+    def test_roundtrip(self, diff_cache):
+        diff_files = DiffParser().parse_diff(self.raw_diff)
+        diff_files[0].changed_lines  # 缓存的变更行不写入磁盘
+
+        diff_cache.put("1", "2", "sha", self.raw_diff, diff_files)
+        cached = diff_cache.get("1", "2", "sha")
+
+        assert cached.raw_diff == self.raw_diff
+        assert cached.diff_files == diff_files
+        assert cached.diff_files[0].changed_lines == diff_files[0].changed_lines
+
+    def test_key_includes_head_sha_and_filter(self, diff_cache):
+        diff_cache.put("1", "2", "sha", self.raw_diff, files_to_filter=["*.lock"])
+
+        assert diff_cache.get("1", "2", "other-sha", ["*.lock"]) is None
+        assert diff_cache.get("1", "2", "sha", ["*.json"]) is None
+        assert diff_cache.get("1", "2", "sha", ["*.lock"]).diff_files is None
+
+    def test_no_head_sha(self, diff_cache):
+        diff_cache.put("1", "2", None, self.raw_diff)
+
+        assert diff_cache.get("1", "2", None) is None
+
+    def test_corrupted_entry(self, diff_cache):
+        key = diff_cache.key("1", "2", "sha")
+        diff_cache.disk_cache.put(key, b"not zlib")
+
+        assert diff_cache.get("1", "2", "sha") is None
+
+    def test_unreadable_cache(self, diff_cache, monkeypatch):
+        """测试缓存目录无法读取时视为未命中"""
+        monkeypatch.setattr(
+            diff_cache.disk_cache, "get", Mock(side_effect=PermissionError)
+        )
+
+        assert diff_cache.get("1", "2", "sha") is None
+
+
+class TestLoadWithCache:
+    """测试未变更的 MR 不再下载与解析"""
+
+    def test_diff_files_cached(self, fake_gitlab, diff_cache):
+        first = load_merge_request_diff_files("1", "1", "sha")
+        second = load_merge_request_diff_files("1", "1", "sha")
+
+        expected = DiffParser().parse_diff(get_merge_request_raw_diff("1", "1"))
+        assert first == second == (expected, format_diff_for_review(expected))
+        # 第三次是上面 get_merge_request_raw_diff 的请求
+        assert fake_gitlab.request_log[RAW_DIFFS] == 2
+
+    def test_raw_diff_shared_between_workflows(self, fake_gitlab, diff_cache):
+        """测试 merge 写入的原始 diff 可被 code-review 复用"""
+        raw_diff = load_merge_request_raw_diff("1", "1", "sha")
+        diff_files, _ = load_merge_request_diff_files("1", "1", "sha")
+
+        assert diff_files == DiffParser().parse_diff(raw_diff)
+        assert fake_gitlab.request_log[RAW_DIFFS] == 1
+        cached = diff_cache.get(
+            "1", "1", "sha", ["pnpm-lock.yaml", "package-lock.json"]
+        )
+        assert cached.diff_files == diff_files
+
+    def test_skip_files_env(self, fake_gitlab, diff_cache, monkeypatch):
+        """测试未指定过滤文件时使用 SKIP_FILES，且过滤规则计入缓存 key"""
+        monkeypatch.setenv("SKIP_FILES", '["src/module_0/**"]')
+        diff_files, _ = load_merge_request_diff_files("1", "1", "sha")
+
+        assert diff_files
+        assert not any(f.new_path.startswith("src/module_0/") for f in diff_files)
+
+        monkeypatch.delenv("SKIP_FILES")
+        diff_files, _ = load_merge_request_diff_files("1", "1", "sha")
+        assert any(f.new_path.startswith("src/module_0/") for f in diff_files)
+
+    @pytest.mark.parametrize(
+        "fake_gitlab",
+        [FakeGitLabConfig(files=2, too_large_files=1)],
+        indirect=True,
+    )
+    def test_incomplete_diff_not_used_for_review(
+        self, fake_gitlab, diff_cache, monkeypatch
+    ):
+        """测试 merge 写入的缺少过大文件内容的 diff 不会被 code-review 使用"""
+        monkeypatch.setenv("DIFF_SOURCE", "api")
+        refs = fake_gitlab.data.merge_requests[1]["diff_refs"]
+        base_sha, head_sha = refs["base_sha"], refs["head_sha"]
+
+        load_merge_request_raw_diff("1", "1", head_sha, fetch_truncated=False)
+        diff_files, _ = load_merge_request_diff_files(
+            "1", "1", head_sha, base_sha=base_sha
+        )
+
+        assert diff_files[0].hunks
+        # code-review 补全的 diff 可被 merge 复用
+        raw_diff = load_merge_request_raw_diff(
+            "1", "1", head_sha, fetch_truncated=False
+        )
+        assert DiffParser().parse_diff(raw_diff) == diff_files
@@ -0,0 +1,154 @@
+import re
+
+from benchmarks.synthetic import make_synthetic_diff
+from gitlab.diff_chunker import (
+    TRUNCATED_MARKER,
+    chunk_diff_files,
+    compare_diff_sections,
+    estimate_tokens,
+    group_diff_sections,
+    pack_diff_files,
+    split_diff_sections,
+)
+from gitlab.diff_parser import DiffParser, format_diff_for_review
+
+RAW_DIFF = make_synthetic_diff(64 * 1024, lock_every=0)
+DIFF_FILES = DiffParser().parse_diff(RAW_DIFF)
+
+
+def _multi_hunk_file():
+    lines = ["diff --git a/big.py b/big.py", "--- a/big.py", "+++ b/big.py"]
+    for i in range(20):
+        start = i * 100 + 1
+        lines.append(f"@@ -{start},1 +{start},2 @@")
+        lines.append(f" context_{i}")
+        lines.append(f"+added_{i} = compute({i})  # {'x' * 200}")
+    return DiffParser().parse_diff("\n".join(lines) + "\n")[0]
+
+
+class TestEstimateTokens:
+    """测试 token 估算"""
+
+    def test_ascii(self):
+        assert estimate_tokens("a" * 400) == 101
+
+    def test_non_ascii_counts_more(self):
+        assert estimate_tokens("中" * 100) > estimate_tokens("a" * 100)
+
+
+class TestChunkDiffFiles:
+    """测试按 token 预算分块"""
+
+    def test_no_budget_single_chunk(self):
+        chunks = chunk_diff_files(DIFF_FILES, 0)
+
+        assert chunks == [format_diff_for_review(DIFF_FILES)]
+
+    def test_chunks_join_to_full_diff(self):
+        """测试未拆开文件时，各块拼接起来与整体格式化结果一致，且每块不超过预算"""
+        chunks = chunk_diff_files(DIFF_FILES, 2000)
+
+        assert len(chunks) > 1
+        assert "\n".join(chunks) == format_diff_for_review(DIFF_FILES)
+        assert all(estimate_tokens(chunk) <= 2000 for chunk in chunks)
+        assert all(chunk.startswith("## ") for chunk in chunks)
+
+    def test_split_large_file_by_hunk(self):
+        """测试超过预算的文件按 hunk 拆开，每块都带文件标题"""
+        diff_file = _multi_hunk_file()
+
+        chunks = chunk_diff_files([diff_file], 300)
+
+        assert len(chunks) > 1
+        assert all(chunk.startswith("## 文件: big.py") for chunk in chunks)
+        joined = "\n".join(chunks)
+        assert all(f"added_{i} =" in joined for i in range(20))
+
+    def test_split_large_hunk_by_line(self):
+        """测试单个超过预算的 hunk 按行拆开，每段重新计算起始行号"""
+        lines = ["diff --git a/a.py b/a.py", "--- a/a.py", "+++ b/a.py"]
+        lines.append("@@ -10,400 +10,400 @@")
+        for i in range(200):
+            lines.extend([f" keep_{i}", f"-old_{i} = {i}", f"+new_{i} = compute({i})"])
+        diff_file = DiffParser().parse_diff("\n".join(lines) + "\n")[0]
+        (hunk,) = diff_file.hunks
+
+        chunks = chunk_diff_files([diff_file], 500)
+
+        assert len(chunks) > 1
+        assert all(estimate_tokens(chunk) <= 500 for chunk in chunks)
+        assert all(chunk.startswith("## 文件: a.py") for chunk in chunks)
+        joined = "\n".join(chunks)
+        assert all(f"+ new_{i} =" in joined for i in range(200))
+
+        # 各段的 hunk 头部首尾相接，行号与原 hunk 一致
+        headers = [
+            tuple(map(int, match))
+            for match in re.findall(r"@@ -(\d+),(\d+) \+(\d+),(\d+) @@", joined)
+        ]
+        assert len(headers) == len(chunks)
+        assert headers[0][::2] == (10, 10)
+        for previous, current in zip(headers, headers[1:]):
+            assert current[0] == previous[0] + previous[1]
+            assert current[2] == previous[2] + previous[3]
+        assert sum(header[3] for header in headers) == 400
+
+    def test_pack_tracks_files(self):
+        """测试每块记录其中的文件，被拆开的文件出现在多个块中"""
+        packed = pack_diff_files(DIFF_FILES, 2000)
+
+        assert [text for text, _ in packed] == chunk_diff_files(DIFF_FILES, 2000)
+        assert [f for _, files in packed for f in files] == DIFF_FILES
+
+        big = _multi_hunk_file()
+        packed = pack_diff_files([big], 300)
+        assert all(files == [big] for _, files in packed)
+
+
+class TestDiffSections:
+    """测试生成摘要时按文件切分与按目录分组"""
+
+    def test_split_sections(self):
+        sections = split_diff_sections("preamble\n" + RAW_DIFF)
+
+        assert [path for path, _ in sections] == [
+            diff_file.new_path for diff_file in DIFF_FILES
+        ]
+        assert "\n".join(text for _, text in sections) == RAW_DIFF
+
+    def test_compare_sections_match_raw_diff(self):
+        compare = {
+            "diffs": [
+                {
+                    "old_path": "a/x.py",
+                    "new_path": "a/x.py",
+                    "new_file": True,
+                    "diff": "@@ -0,0 +1 @@\n+x\n",
+                }
+            ]
+        }
+
+        sections = compare_diff_sections(compare)
+
+        assert sections[0][0] == "a/x.py"
+        parsed = DiffParser().parse_diff(sections[0][1])[0]
+        assert parsed.is_new_file
+        assert parsed.added_lines == [(1, "x")]
+
+    def test_group_by_directory(self):
+        sections = [
+            ("a/1.py", "x" * 400),
+            ("b/1.py", "y" * 400),
+            ("a/2.py", "z" * 400),
+        ]
+
+        groups = group_diff_sections(sections, 250)
+
+        assert groups == ["x" * 400 + "\n" + "z" * 400, "y" * 400]
+
+    def test_truncate_large_file(self):
+        groups = group_diff_sections([("a.py", "x" * 10000)], 100)
+
+        assert len(groups) == 1
+        assert groups[0].endswith(TRUNCATED_MARKER)
+        assert estimate_tokens(groups[0]) <= 100
@@ -0,0 +1,113 @@
+import pytest
+
+from gitlab.diff_index import IndexedDiff, parse_diff_indexed
+from gitlab.diff_parser import DiffParser, format_diff_for_review
+
+SAMPLE_DIFF = """diff --git a/src/example.py b/src/example.py
+index 1234567..abcdefg 100644
+--- a/src/example.py
++++ b/src/example.py
+@@ -1,7 +1,8 @@ class Example:
+ def hello():
+-    print("Hello")
++    print("你好")
+     return True
+ 
+ def goodbye():
++    print("Goodbye")
+     return False
+@@ -15,6 +16,7 @@ def main():
+     hello()
++    print("Done")
+\\ No newline at end of file
+diff --git a/src/new.py b/src/new.py
+new file mode 100644
+--- /dev/null
++++ b/src/new.py
+@@ -0,0 +1,2 @@
++import os
++print(os.getcwd())
+diff --git a/src/old.py b/src/old.py
+deleted file mode 100644
+--- a/src/old.py
++++ /dev/null
+@@ -1 +0,0 @@
+-print("bye")
+diff --git a/logo.png b/logo.png
+Binary files a/logo.png and b/logo.png differ
+"""
+
+
+def _snapshot(files):
+    """把解析结果转换为可比较的结构"""
+    return [
+        (
+            file.old_path,
+            file.new_path,
+            file.is_new_file,
+            file.is_deleted_file,
+            file.is_binary,
+            [
+                (
+                    hunk.old_start,
+                    hunk.old_count,
+                    hunk.new_start,
+                    hunk.new_count,
+                    hunk.header,
+                    [
+                        (
+                            line.line_number,
+                            line.content,
+                            line.line_type,
+                            line.old_line_number,
+                            line.new_line_number,
+                        )
+                        for line in hunk.lines
+                    ],
+                )
+                for hunk in file.hunks
+            ],
+        )
+        for file in files
+    ]
+
+
+class TestIndexedDiff:
+    """测试偏移量索引的 diff 与 DiffParser.parse_diff 结果一致"""
+
+    parser = DiffParser()
+
+    @pytest.mark.parametrize("content", [SAMPLE_DIFF, SAMPLE_DIFF.rstrip("\n"), ""])
+    def test_same_as_parse_diff(self, content):
+        expected = self.parser.parse_diff(content)
+        indexed = parse_diff_indexed(content)
+
+        assert _snapshot(indexed) == _snapshot(expected)
+
+    def test_existing_callers(self):
+        """测试 format_diff_for_review 与 get_changed_lines 可直接使用"""
+        expected = self.parser.parse_diff(SAMPLE_DIFF)
+        indexed = self.parser.parse_diff_indexed(SAMPLE_DIFF.encode("utf-8"))
+
+        assert format_diff_for_review(indexed) == format_diff_for_review(expected)
+        assert self.parser.get_changed_lines(indexed) == self.parser.get_changed_lines(
+            expected
+        )
+        assert self.parser.get_added_lines(indexed) == self.parser.get_added_lines(
+            expected
+        )
+
+    def test_single_buffer(self):
+        """测试传入 bytes 时不拷贝，行内容按偏移量解码"""
+        raw = SAMPLE_DIFF.encode("utf-8")
+        indexed = IndexedDiff(raw)
+
+        assert indexed.buffer is raw
+        assert len(indexed) == 4
+        assert indexed.line_count == 13
+        assert indexed[0].hunks[0].lines[2].content == '    print("你好")'
+        assert indexed[-1].is_binary
+
+    def test_index_out_of_range(self):
+        with pytest.raises(IndexError):
+            parse_diff_indexed(SAMPLE_DIFF)[4]
@@ -0,0 +1,56 @@
+import pytest
+
+from benchmarks.synthetic import make_synthetic_diff
+from gitlab.diff_parallel import (
+    iter_diff_chunks,
+    parse_and_format_diff,
+    parse_and_format_lines,
+    split_diff,
+)
+from gitlab.diff_parser import DiffParser, format_diff_for_review
+
+CONTENT = "preamble\n" + make_synthetic_diff(600 * 1024, lock_every=0)
+
+
+@pytest.fixture(scope="module")
+def expected():
+    diff_files = DiffParser().parse_diff(CONTENT)
+    return diff_files, format_diff_for_review(diff_files)
+
+
+class TestSplitDiff:
+    """测试在文件边界切分 diff"""
+
+    def test_split_at_file_boundaries(self):
+        chunks = list(split_diff(CONTENT, 64 * 1024))
+
+        assert len(chunks) > 1
+        assert "\n".join(chunks) == CONTENT
+        assert all(chunk.startswith("diff --git") for chunk in chunks[1:])
+
+    def test_chunks_from_lines(self):
+        """测试流式行合并成块的结果与 split_diff 一致"""
+        chunks = list(iter_diff_chunks(iter(CONTENT.split("\n")), 64 * 1024))
+
+        assert chunks == list(split_diff(CONTENT, 64 * 1024))
+
+
+class TestParallelParse:
+    """测试多进程解析的结果与单进程一致"""
+
+    def test_below_threshold(self, expected):
+        assert parse_and_format_diff(CONTENT, threshold=len(CONTENT) + 1) == expected
+
+    def test_parallel(self, expected):
+        assert parse_and_format_diff(CONTENT, threshold=1, workers=2) == expected
+
+    def test_parallel_lines(self, expected):
+        lines = iter(CONTENT.split("\n"))
+
+        assert parse_and_format_lines(lines, threshold=1, workers=2) == expected
+
+    def test_lines_disabled(self, expected, monkeypatch):
+        """测试阈值为 0 时关闭多进程"""
+        monkeypatch.setenv("DIFF_PARALLEL_THRESHOLD", "0")
+
+        assert parse_and_format_lines(iter(CONTENT.split("\n"))) == expected
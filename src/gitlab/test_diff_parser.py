@@ -0,0 +1,125 @@
+import io
+from array import array
+
+from gitlab.diff_index import LINE_ADDED, LINE_CONTEXT, LINE_REMOVED
+from gitlab.diff_parser import DiffHunk, DiffLine, DiffParser
+
+SAMPLE_DIFF = """diff --git a/src/example.py b/src/example.py
+index 1234567..abcdefg 100644
+--- a/src/example.py
++++ b/src/example.py
+@@ -1,4 +1,5 @@
+ def hello():
+-    print("Hello")
++    print("Hello World")
++    print("!")
+     return True
+diff --git a/logo.png b/logo.png
+Binary files a/logo.png and b/logo.png differ
+"""
+
+
+class TestColumnarHunk:
+    """测试 hunk 按列存储行类型与行号"""
+
+    def test_line_numbers_filled_in_parse(self):
+        """测试行号在解析时一并写入类型数组"""
+        hunk = DiffParser().parse_diff(SAMPLE_DIFF)[0].hunks[0]
+
+        assert hunk.line_types == bytearray(
+            [LINE_CONTEXT, LINE_REMOVED, LINE_ADDED, LINE_ADDED, LINE_CONTEXT]
+        )
+        assert hunk.old_numbers == array("i", [1, 2, 0, 0, 3])
+        assert hunk.new_numbers == array("i", [1, 0, 2, 3, 4])
+
+    def test_lines_compat(self):
+        """测试 lines 属性仍返回 DiffLine 列表"""
+        hunk = DiffParser().parse_diff(SAMPLE_DIFF)[0].hunks[0]
+
+        assert hunk.lines[1] == DiffLine(
+            line_number=2,
+            content='    print("Hello")',
+            line_type="removed",
+            old_line_number=2,
+            new_line_number=None,
+        )
+
+    def test_construct_from_lines(self):
+        """测试用 DiffLine 列表构造 hunk 时会重新计算行号"""
+        hunk = DiffHunk(
+            old_start=10,
+            old_count=1,
+            new_start=20,
+            new_count=2,
+            lines=[
+                DiffLine(line_number=1, content="a", line_type="removed"),
+                DiffLine(line_number=2, content="b", line_type="added"),
+            ],
+            header="",
+        )
+
+        assert [
+            (line.old_line_number, line.new_line_number) for line in hunk.lines
+        ] == [
+            (10, None),
+            (None, 20),
+        ]
+
+
+class TestChangedLines:
+    """测试按文件预先计算的变更行"""
+
+    def test_changed_and_added_lines(self):
+        parser = DiffParser()
+        files = parser.parse_diff(SAMPLE_DIFF)
+
+        assert parser.get_changed_lines(files) == {
+            "src/example.py": [
+                (2, "removed", '    print("Hello")'),
+                (2, "added", '    print("Hello World")'),
+                (3, "added", '    print("!")'),
+            ]
+        }
+        assert parser.get_added_lines(files) == {
+            "src/example.py": [(2, '    print("Hello World")'), (3, '    print("!")')]
+        }
+
+    def test_changed_lines_cached(self):
+        """测试重复查询直接返回缓存的结果"""
+        diff_file = DiffParser().parse_diff(SAMPLE_DIFF)[0]
+
+        assert diff_file.changed_lines is diff_file.changed_lines
+        assert diff_file.added_lines is diff_file.added_lines
+
+
+class TestParseDiffIter:
+    """测试流式解析"""
+
+    def test_same_as_parse_diff(self):
+        parser = DiffParser()
+
+        assert list(parser.parse_diff_iter(SAMPLE_DIFF.split("\n"))) == (
+            parser.parse_diff(SAMPLE_DIFF)
+        )
+
+    def test_file_like_lines(self):
+        """测试可直接传入带换行符的文件对象"""
+        parser = DiffParser()
+
+        files = list(parser.parse_diff_iter(io.StringIO(SAMPLE_DIFF)))
+
+        assert files == parser.parse_diff(SAMPLE_DIFF)
+
+    def test_yields_file_before_input_exhausted(self):
+        """测试下一个文件开始时立即产出上一个文件"""
+        consumed = []
+
+        def lines():
+            for line in SAMPLE_DIFF.split("\n"):
+                consumed.append(line)
+                yield line
+
+        first = next(DiffParser().parse_diff_iter(lines()))
+
+        assert first.new_path == "src/example.py"
+        assert consumed[-1] == "diff --git a/logo.png b/logo.png"
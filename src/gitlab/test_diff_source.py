@@ -0,0 +1,163 @@
+import pytest
+
+from gitlab.diff_parser import DiffParser
+from gitlab.diff_source import (
+    file_header_lines,
+    get_diff_source,
+    iter_merge_request_api_diff_lines,
+    iter_merge_request_diff_lines,
+)
+from gitlab.fake_server import LOCK_FILE, FakeGitLabConfig
+from gitlab.merge_request import get_merge_request_raw_diff, get_repository_file_raw
+
+
+def _file_requests(server):
+    return sum(
+        count
+        for key, count in server.request_log.items()
+        if "/repository/files/" in key
+    )
+
+
+def _shas(server, iid=1):
+    refs = server.data.merge_requests[iid]["diff_refs"]
+    return refs["base_sha"], refs["head_sha"]
+
+
+class TestApiDiffSource:
+    """测试由 /diffs 接口拼出的 diff"""
+
+    def test_same_files_as_raw_diff(self, fake_gitlab):
+        """测试解析结果与 raw_diffs 一致，锁文件同样被过滤"""
+        lines = iter_merge_request_api_diff_lines("1", "1")
+        files = list(DiffParser().parse_diff_iter(lines))
+
+        assert files == DiffParser().parse_diff(get_merge_request_raw_diff("1", "1"))
+        assert all(file.new_path != LOCK_FILE for file in files)
+
+    def test_select_source_by_env(self, fake_gitlab, monkeypatch):
+        monkeypatch.setenv("DIFF_SOURCE", "api")
+        list(iter_merge_request_diff_lines("1", "1"))
+        assert fake_gitlab.request_log["GET /api/v4/projects/1/merge_requests/1/diffs"]
+        assert "GET /api/v4/projects/1/merge_requests/1/raw_diffs" not in (
+            fake_gitlab.request_log
+        )
+
+        monkeypatch.setenv("DIFF_SOURCE", "json")
+        with pytest.raises(ValueError):
+            get_diff_source()
+
+    @pytest.mark.parametrize(
+        "fake_gitlab",
+        [FakeGitLabConfig(files=3, too_large_files=4)],
+        indirect=True,
+    )
+    def test_fetch_too_large_files_lazily(self, fake_gitlab):
+        """测试过大的文件按 base / head 获取内容后在本地计算 diff，被过滤的文件不获取"""
+        base_sha, head_sha = _shas(fake_gitlab)
+        lines = iter_merge_request_api_diff_lines(
+            "1", "1", base_sha=base_sha, head_sha=head_sha
+        )
+        files = list(DiffParser().parse_diff_iter(lines))
+        expected = DiffParser().parse_diff(get_merge_request_raw_diff("1", "1"))
+
+        assert [file.new_path for file in files] == [file.new_path for file in expected]
+        for file, expected_file in zip(files, expected):
+            assert file.changed_lines == expected_file.changed_lines
+            assert file.added_lines == expected_file.added_lines
+        # 3 个文件各获取 base 与 head 两个版本，锁文件被过滤，不获取
+        assert _file_requests(fake_gitlab) == 6
+
+    @pytest.mark.parametrize(
+        "fake_gitlab",
+        [FakeGitLabConfig(files=2, too_large_files=1)],
+        indirect=True,
+    )
+    def test_too_large_without_shas_keeps_header(self, fake_gitlab):
+        files = list(
+            DiffParser().parse_diff_iter(iter_merge_request_api_diff_lines("1", "1"))
+        )
+
+        assert [file.new_path for file in files] == [
+            "src/module_0/file_0.py",
+            "src/module_1/file_1.py",
+        ]
+        assert files[0].hunks == []
+        assert files[1].hunks
+        assert _file_requests(fake_gitlab) == 0
+
+    @pytest.mark.parametrize(
+        "fake_gitlab",
+        [FakeGitLabConfig(files=2, too_large_files=1)],
+        indirect=True,
+    )
+    def test_skip_too_large_when_not_needed(self, fake_gitlab):
+        """测试 fetch_truncated 为 False 时不获取过大文件的内容"""
+        base_sha, head_sha = _shas(fake_gitlab)
+        lines = iter_merge_request_api_diff_lines(
+            "1", "1", base_sha=base_sha, head_sha=head_sha, fetch_truncated=False
+        )
+        files = list(DiffParser().parse_diff_iter(lines))
+
+        assert files[0].hunks == []
+        assert _file_requests(fake_gitlab) == 0
+
+    def test_file_raw_size_limit(self, fake_gitlab):
+        """测试超过大小上限的文件不读取内容"""
+        _, head_sha = _shas(fake_gitlab)
+        path = "src/module_0/file_0.py"
+        content = get_repository_file_raw("1", path, head_sha)
+
+        assert get_repository_file_raw("1", path, head_sha, len(content)) == content
+        with pytest.raises(ValueError):
+            get_repository_file_raw("1", path, head_sha, len(content) - 1)
+
+    @pytest.mark.parametrize(
+        "fake_gitlab",
+        [FakeGitLabConfig(files=2, too_large_files=1)],
+        indirect=True,
+    )
+    def test_max_file_size(self, fake_gitlab, monkeypatch):
+        """测试超过 DIFF_SOURCE_MAX_FILE_KB 的文件只保留文件头"""
+        monkeypatch.setenv("DIFF_SOURCE_MAX_FILE_KB", "0")
+        base_sha, head_sha = _shas(fake_gitlab)
+        lines = iter_merge_request_api_diff_lines(
+            "1", "1", base_sha=base_sha, head_sha=head_sha
+        )
+        files = list(DiffParser().parse_diff_iter(lines))
+
+        assert files[0].hunks == []
+        assert _file_requests(fake_gitlab) == 1
+
+
+class TestFileHeaderLines:
+    """测试由 /diffs 字段拼出的文件头"""
+
+    def _parse(self, item):
+        lines = file_header_lines(item) + ["@@ -0,0 +1 @@", "+x"]
+        return DiffParser().parse_diff("\n".join(lines) + "\n")[0]
+
+    def test_new_file(self):
+        file = self._parse(
+            {
+                "old_path": "a.py",
+                "new_path": "a.py",
+                "new_file": True,
+                "b_mode": "100644",
+            }
+        )
+        assert file.is_new_file
+        assert not file.is_deleted_file
+
+    def test_deleted_file(self):
+        file = self._parse(
+            {"old_path": "a.py", "new_path": "a.py", "deleted_file": True}
+        )
+        assert file.is_deleted_file
+
+    def test_renamed_file(self):
+        file = self._parse(
+            {"old_path": "old.py", "new_path": "new.py", "renamed_file": True}
+        )
+        assert (file.old_path, file.new_path) == ("old.py", "new.py")
+        assert not file.is_new_file
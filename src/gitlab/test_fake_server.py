@@ -0,0 +1,98 @@
+import pytest
+
+from gitlab.client import GitLabClient
+from gitlab.comment import create_comment, get_comment, get_merge_request_versions
+from gitlab.diff_parser import DiffParser
+from gitlab.fake_server import FakeGitLabConfig
+from gitlab.http_cache import HttpCache
+from gitlab.merge_request import (
+    get_merge_request_commits,
+    get_merge_request_diff,
+    get_merge_request_raw_diff,
+    iter_merge_request_diff_files,
+)
+from utils.disk_cache import DiskCache
+
+
+class TestFakeGitLabServer:
+    """通过真实 HTTP 请求测试 GitLab 接口封装"""
+
+    @pytest.mark.parametrize(
+        "fake_gitlab",
+        [FakeGitLabConfig(commits=45, max_per_page=10)],
+        indirect=True,
+    )
+    def test_parallel_pagination(self, fake_gitlab):
+        """测试根据 X-Total-Pages 并发翻页，并保持顺序"""
+        commits = get_merge_request_commits("1", "1")
+
+        assert len(commits) == 45
+        assert commits == fake_gitlab.data.commits(1)
+        assert (
+            fake_gitlab.request_log["GET /api/v4/projects/1/merge_requests/1/commits"]
+            == 5
+        )
+
+    @pytest.mark.parametrize(
+        "fake_gitlab",
+        [FakeGitLabConfig(files=25, max_per_page=10, omit_totals=True)],
+        indirect=True,
+    )
+    def test_link_pagination(self, fake_gitlab):
+        """测试没有 X-Total-Pages 时跟随 Link 翻页"""
+        diffs = get_merge_request_diff("group%2Fproject", "1")
+
+        assert len(diffs) == 26
+
+    def test_stream_raw_diff_filters_lock_file(self, fake_gitlab):
+        """测试流式下载 raw diff 并过滤锁文件，与非流式结果一致"""
+        streamed = get_merge_request_raw_diff("1", "1", stream=True)
+
+        assert "pnpm-lock.yaml" not in streamed
+        assert "src/module_0/file_0.py" in streamed
+        assert streamed == get_merge_request_raw_diff("1", "1")
+
+    def test_stream_diff_files(self, fake_gitlab):
+        """测试边下载边解析的结果与解析完整 raw diff 一致"""
+        files = list(iter_merge_request_diff_files("1", "1"))
+
+        assert files == DiffParser().parse_diff(get_merge_request_raw_diff("1", "1"))
+        assert all(file.new_path != "pnpm-lock.yaml" for file in files)
+
+    @pytest.mark.parametrize(
+        "fake_gitlab",
+        [FakeGitLabConfig(rate_limit_every=2, retry_after="0")],
+        indirect=True,
+    )
+    def test_retry_injected_429(self, fake_gitlab):
+        """测试注入的 429 被透明重试"""
+        versions = get_merge_request_versions("1", "1")
+        versions_again = get_merge_request_versions("1", "1")
+
+        assert versions == versions_again
+        assert versions[0]["head_commit_sha"]
+        assert fake_gitlab.request_count == 3
+
+    def test_create_and_list_notes(self, fake_gitlab):
+        """测试创建评论后可以读取"""
+        create_comment("1", "2", "<!-- start-commit-hash: abc -->")
+
+        notes = get_comment("1", "2")
+
+        assert notes[0]["body"] == "<!-- start-commit-hash: abc -->"
+        assert len(notes) == fake_gitlab.config.notes + 1
+
+    def test_etag_revalidation(self, fake_gitlab, tmp_path):
+        """测试 ETag 缓存：第二次请求返回 304 并使用本地缓存"""
+        client = GitLabClient(
+            fake_gitlab.api_url,
+            "fake-token",
+            http_cache=HttpCache(DiskCache(tmp_path, max_bytes=10 * 1024 * 1024)),
+        )
+
+        first = client.get("/projects/1/merge_requests/1/raw_diffs")
+        second = client.get("/projects/1/merge_requests/1/raw_diffs")
+
+        assert second.from_cache
+        assert second.content == first.content
+        client.close()
@@ -0,0 +1,163 @@
+import base64
+import random
+
+import pytest
+
+from gitlab.diff_index import parse_diff_indexed
+from gitlab.diff_parser import DiffParser, format_diff_for_review
+from gitlab.generated_detector import (
+    classify_diff_file,
+    files_for_review,
+    mark_generated_files,
+)
+
+
+def _file_diff(path: str, added_lines) -> str:
+    lines = [
+        f"diff --git a/{path} b/{path}",
+        f"--- a/{path}",
+        f"+++ b/{path}",
+        f"@@ -0,0 +1,{len(added_lines)} @@",
+    ]
+    lines.extend(f"+{line}" for line in added_lines)
+    return "\n".join(lines) + "\n"
+
+
+def _classify(path: str, added_lines):
+    return classify_diff_file(DiffParser().parse_diff(_file_diff(path, added_lines))[0])
+
+
+NORMAL_CODE = [f"    value_{i} = compute({i}, flag=True)" for i in range(50)]
+
+
+class TestClassifyDiffFile:
+    """测试生成文件的识别规则"""
+
+    def test_normal_code(self):
+        assert _classify("src/app.py", NORMAL_CODE) is None
+
+    @pytest.mark.parametrize(
+        "path",
+        [
+            "web/yarn.lock",
+            "static/app.min.js",
+            "api/user.pb.go",
+            "src/__snapshots__/a.ts.snap",
+        ],
+    )
+    def test_known_paths(self, path):
+        assert _classify(path, NORMAL_CODE) == "生成文件"
+
+    def test_generated_marker(self):
+        lines = ["// Code generated by protoc-gen-go. DO NOT EDIT."] + NORMAL_CODE
+
+        assert _classify("api/user.go", lines).startswith("包含生成标记")
+
+    @pytest.mark.parametrize(
+        "marker",
+        [
+            "# @generated by scripts/build_schema.py",
+            "<!-- This file was automatically generated. -->",
+            "// <auto-generated />",
+            "# DO NOT EDIT",
+        ],
+    )
+    def test_generated_marker_phrases(self, marker):
+        assert _classify("src/schema.py", [marker] + NORMAL_CODE).startswith(
+            "包含生成标记"
+        )
+
+    def test_marker_words_in_ordinary_comment(self):
+        """测试普通注释中提到 autogenerated、do not edit 不视为生成声明"""
+        comment = "# created_at is autogenerated by the database, do not edit manually"
+
+        assert _classify("src/models.py", [comment] + NORMAL_CODE) is None
+
+    def test_marker_outside_file_header(self):
+        """测试只检查从第 1 行开始的 hunk，文件中间新增的标记不算"""
+        content = """diff --git a/api/user.go b/api/user.go
+--- a/api/user.go
++++ b/api/user.go
+@@ -10,2 +10,3 @@
+ func a() {}
++// Code generated by hand. DO NOT EDIT.
+ func b() {}
+"""
+        diff_file = DiffParser().parse_diff(content)[0]
+
+        assert classify_diff_file(diff_file) is None
+        header = content.replace("@@ -10,2 +10,3 @@", "@@ -1,2 +1,3 @@")
+        assert classify_diff_file(DiffParser().parse_diff(header)[0]).startswith(
+            "包含生成标记"
+        )
+
+    def test_minified(self):
+        lines = ["var a=1;" * 100]
+
+        assert _classify("static/vendor.js", lines).startswith("疑似压缩代码")
+
+    def test_high_entropy(self):
+        rng = random.Random(0)
+        lines = [
+            base64.b64encode(bytes(rng.randrange(256) for _ in range(90))).decode()
+            for _ in range(20)
+        ]
+
+        assert _classify("assets/blob.txt", lines).startswith("疑似编码内容")
+
+    def test_large_data_file(self, monkeypatch):
+        monkeypatch.setenv("GENERATED_MAX_DATA_LINES", "10")
+        lines = [f'  "key_{i}": {i},' for i in range(20)]
+
+        assert _classify("fixtures/data.json", lines) == "大型数据文件，新增 20 行"
+        assert _classify("src/data.py", lines) is None
+
+
+class TestMarkGeneratedFiles:
+    """测试识别结果对格式化的影响"""
+
+    content = _file_diff("src/app.py", NORMAL_CODE[:2]) + _file_diff(
+        "static/app.min.js", ["var a=1;"]
+    )
+
+    def test_stub(self):
+        diff_files = DiffParser().parse_diff(self.content)
+
+        skipped = mark_generated_files(diff_files)
+        formatted = format_diff_for_review(files_for_review(diff_files))
+
+        assert skipped == [("static/app.min.js", "生成文件")]
+        assert "## 文件: static/app.min.js (已跳过: 生成文件)" in formatted
+        assert "var a=1;" not in formatted
+        assert "value_0" in formatted
+
+    def test_drop(self, monkeypatch):
+        monkeypatch.setenv("GENERATED_FILES_MODE", "drop")
+        diff_files = DiffParser().parse_diff(self.content)
+
+        mark_generated_files(diff_files)
+        formatted = format_diff_for_review(files_for_review(diff_files))
+
+        assert "app.min.js" not in formatted
+        assert len(diff_files) == 2
+
+    def test_off(self, monkeypatch):
+        monkeypatch.setenv("GENERATED_FILES_MODE", "off")
+        diff_files = DiffParser().parse_diff(self.content)
+
+        assert mark_generated_files(diff_files) == []
+        assert "var a=1;" in format_diff_for_review(files_for_review(diff_files))
+
+    def test_invalid_mode(self, monkeypatch):
+        monkeypatch.setenv("GENERATED_FILES_MODE", "maybe")
+
+        with pytest.raises(ValueError):
+            mark_generated_files([])
+
+    def test_indexed_diff(self):
+        """测试偏移量索引的 diff 也可以标记"""
+        indexed = parse_diff_indexed(self.content)
+
+        mark_generated_files(indexed)
+
+        assert [file.skipped_reason for file in indexed] == [None, "生成文件"]
@@ -0,0 +1,132 @@
+from unittest.mock import Mock, patch
+
+import pytest
+
+from gitlab.client import GitLabClient
+from gitlab.graphql import fetch_merge_request_bundle, find_merge_request_url_by_branch
+
+
+def _merge_request(commits, notes, commits_next=None, notes_next=None):
+    return {
+        "project": {
+            "id": "gid://gitlab/Project/1",
+            "mergeRequest": {
+                "iid": "12",
+                "title": "feat: test",
+                "description": "",
+                "state": "opened",
+                "webUrl": "https://gitlab.example.com/group/project/-/merge_requests/12",
+                "sourceBranch": "feat",
+                "targetBranch": "master",
+                "diffRefs": {"baseSha": "b", "headSha": "h", "startSha": "s"},
+                "diffStats": [{"path": "a.py", "additions": 3, "deletions": 1}],
+                "commits": {
+                    "pageInfo": {
+                        "hasNextPage": commits_next is not None,
+                        "endCursor": commits_next,
+                    },
+                    "nodes": commits,
+                },
+                "notes": {
+                    "pageInfo": {
+                        "hasNextPage": notes_next is not None,
+                        "endCursor": notes_next,
+                    },
+                    "nodes": notes,
+                },
+            },
+        }
+    }
+
+
+def _commit(sha, committed_date):
+    return {
+        "sha": sha,
+        "shortId": sha[:3],
+        "title": f"commit {sha}",
+        "message": f"commit {sha}\n",
+        "committedDate": committed_date,
+    }
+
+
+class TestFetchMergeRequestBundle:
+    """测试 GraphQL 批量获取 MR 数据"""
+
+    @patch("gitlab.graphql.get_client")
+    def test_single_round_trip(self, mock_get_client):
+        """测试一次请求得到与 REST 结构一致的数据"""
+        graphql = mock_get_client.return_value.graphql
+        graphql.return_value = _merge_request(
+            [_commit("aaa111", "2024-01-01"), _commit("bbb222", "2024-01-02")],
+            [{"body": "<!-- start-commit-hash: aaa -->", "createdAt": "2024-01-03"}],
+        )
+
+        bundle = fetch_merge_request_bundle("group%2Fproject", "12")
+
+        graphql.assert_called_once()
+        variables = graphql.call_args.args[1]
+        assert variables["fullPath"] == "group/project"
+        assert variables["iid"] == "12"
+
+        # commits 最新在前，字段与 REST 一致
+        assert [commit["id"] for commit in bundle.commits] == ["bbb222", "aaa111"]
+        assert bundle.commits[0]["short_id"] == "bbb"
+        assert bundle.notes[0]["body"] == "<!-- start-commit-hash: aaa -->"
+        assert bundle.diff_stats[0]["path"] == "a.py"
+        assert bundle.versions == [
+            {"base_commit_sha": "b", "head_commit_sha": "h", "start_commit_sha": "s"}
+        ]
+
+    @patch("gitlab.graphql.get_client")
+    def test_follow_cursors(self, mock_get_client):
+        """测试 commits 超过一页时继续请求"""
+        graphql = mock_get_client.return_value.graphql
+        graphql.side_effect = [
+            _merge_request([_commit("aaa111", "2024-01-01")], [], commits_next="c1"),
+            _merge_request([_commit("bbb222", "2024-01-02")], []),
+        ]
+
+        bundle = fetch_merge_request_bundle("group%2Fproject", "12")
+
+        assert graphql.call_count == 2
+        assert graphql.call_args.args[1]["commitsAfter"] == "c1"
+        assert len(bundle.commits) == 2
+
+    @patch("gitlab.graphql.get_client")
+    def test_merge_request_not_found(self, mock_get_client):
+        """测试 MR 不存在"""
+        mock_get_client.return_value.graphql.return_value = {
+            "project": {"mergeRequest": None}
+        }
+
+        with pytest.raises(ValueError, match="未找到 MR"):
+            fetch_merge_request_bundle("group%2Fproject", "404")
+
+    @patch("gitlab.graphql.get_client")
+    def test_find_merge_request_by_branch(self, mock_get_client):
+        """测试根据分支查找 MR"""
+        mock_get_client.return_value.graphql.return_value = {
+            "project": {"mergeRequests": {"nodes": [{"iid": "1", "webUrl": "url"}]}}
+        }
+
+        assert find_merge_request_url_by_branch("group/project", "feat") == "url"
+
+
+class TestClientGraphql:
+    """测试 GitLabClient.graphql"""
+
+    def test_graphql_url(self):
+        """测试由 REST 地址推导 GraphQL 地址"""
+        client = GitLabClient("https://gitlab.example.com/api/v4", "t")
+
+        assert client.graphql_url == "https://gitlab.example.com/api/graphql"
+
+    def test_graphql_errors(self):
+        """测试 GraphQL 返回 errors 时抛出异常"""
+        client = GitLabClient("https://gitlab.example.com/api/v4", "t")
+        response = Mock()
+        response.json.return_value = {"errors": [{"message": "boom"}]}
+        client.session.request = Mock(return_value=response)
+
+        with pytest.raises(RuntimeError, match="boom"):
+            client.graphql("query { currentUser { id } }")
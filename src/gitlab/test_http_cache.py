@@ -0,0 +1,141 @@
+import io
+import os
+from unittest.mock import Mock
+
+import requests
+
+from gitlab.http_cache import HttpCache
+from utils.disk_cache import DiskCache
+
+
+def _response(status_code, body=b"", headers=None, url="https://gitlab/api/v4/x"):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response.url = url
+    response._content = body
+    response.raw = io.BytesIO(body)
+    return response
+
+
+def _stream_response(body, headers):
+    response = requests.Response()
+    response.status_code = 200
+    response.headers.update(headers)
+    response.url = "https://gitlab/api/v4/raw"
+    raw = Mock()
+    data = io.BytesIO(body)
+    raw.read.side_effect = lambda amt=None, decode_content=False: data.read(amt)
+    response.raw = raw
+    return response
+
+
+class TestHttpCache:
+    """测试基于 ETag 的 HTTP 缓存"""
+
+    def test_store_and_revalidate(self, tmp_path):
+        """测试 200 响应写入缓存，304 时从磁盘返回内容"""
+        cache = HttpCache(DiskCache(tmp_path, max_bytes=1024 * 1024))
+        send = Mock(return_value=_response(200, b'{"id": 1}', {"ETag": 'W/"v1"'}))
+
+        first = cache.fetch(send, "https://gitlab/api/v4/x", params={"a": 1})
+        assert first.json() == {"id": 1}
+        assert "If-None-Match" not in send.call_args.kwargs["headers"]
+
+        send.return_value = _response(304, headers={"RateLimit-Remaining": "9"})
+        second = cache.fetch(send, "https://gitlab/api/v4/x", params={"a": 1})
+
+        assert send.call_args.kwargs["headers"]["If-None-Match"] == 'W/"v1"'
+        assert second.status_code == 200
+        assert second.json() == {"id": 1}
+        assert second.from_cache is True
+        assert second.headers["RateLimit-Remaining"] == "9"
+
+    def test_params_are_part_of_key(self, tmp_path):
+        """测试不同查询参数使用不同的缓存条目"""
+        cache = HttpCache(DiskCache(tmp_path, max_bytes=1024 * 1024))
+        send = Mock(return_value=_response(200, b"[]", {"ETag": '"v1"'}))
+
+        cache.fetch(send, "https://gitlab/api/v4/x", params={"page": 1})
+        cache.fetch(send, "https://gitlab/api/v4/x", params={"page": 2})
+
+        assert "If-None-Match" not in send.call_args.kwargs["headers"]
+
+    def test_response_without_etag_not_cached(self, tmp_path):
+        """测试没有 ETag 的响应不写入缓存"""
+        cache = HttpCache(DiskCache(tmp_path, max_bytes=1024 * 1024))
+        send = Mock(return_value=_response(200, b"[]"))
+
+        cache.fetch(send, "https://gitlab/api/v4/x")
+        cache.fetch(send, "https://gitlab/api/v4/x")
+
+        assert "If-None-Match" not in send.call_args.kwargs["headers"]
+
+    def test_evicted_entry_refetches(self, tmp_path):
+        """测试条目在 304 前被淘汰时重新发送无条件请求"""
+        disk_cache = DiskCache(tmp_path, max_bytes=1024 * 1024)
+        cache = HttpCache(disk_cache)
+        send = Mock(return_value=_response(200, b"v1", {"ETag": '"v1"'}))
+        cache.fetch(send, "https://gitlab/api/v4/x")
+
+        key = cache.key("https://gitlab/api/v4/x", None)
+        disk_cache._body_path(key).unlink()
+        send.side_effect = [
+            _response(304),
+            _response(200, b"v2", {"ETag": '"v2"'}),
+        ]
+
+        result = cache.fetch(send, "https://gitlab/api/v4/x")
+
+        assert result.content == b"v2"
+        assert "If-None-Match" not in send.call_args.kwargs["headers"]
+
+    def test_stream_is_teed_into_cache(self, tmp_path):
+        """测试流式响应在读取时写入缓存，304 时以流的方式返回"""
+        cache = HttpCache(DiskCache(tmp_path, max_bytes=1024 * 1024))
+        body = b"diff --git a/a b/a\n+line\n" * 100
+        send = Mock(return_value=_stream_response(body, {"ETag": '"raw"'}))
+
+        first = cache.fetch(send, "https://gitlab/api/v4/raw", stream=True)
+        assert b"".join(first.iter_content(64)) == body
+
+        send.return_value = _response(304)
+        second = cache.fetch(send, "https://gitlab/api/v4/raw", stream=True)
+
+        assert second.from_cache is True
+        assert b"".join(second.iter_content(64)) == body
+
+    def test_unusable_cache_dir_sends_uncached(self, tmp_path):
+        """测试缓存目录不可用时请求照常发送，不使用缓存"""
+        (tmp_path / "file").write_text("")
+        cache = HttpCache(DiskCache(tmp_path / "file" / "http", max_bytes=1024))
+        body = b"+line\n" * 10
+        send = Mock(return_value=_response(200, b'{"id": 1}', {"ETag": '"v1"'}))
+
+        assert cache.fetch(send, "https://gitlab/api/v4/x").json() == {"id": 1}
+        assert cache.fetch(send, "https://gitlab/api/v4/x").json() == {"id": 1}
+        assert "If-None-Match" not in send.call_args.kwargs["headers"]
+
+        send.return_value = _response(200, body, {"ETag": '"raw"'})
+        response = cache.fetch(send, "https://gitlab/api/v4/raw", stream=True)
+        assert b"".join(response.iter_content(16)) == body
+
+
+class TestDiskCache:
+    """测试磁盘缓存的大小上限与 LRU 淘汰"""
+
+    def test_lru_eviction(self, tmp_path):
+        """测试超过上限时淘汰最久未使用的条目"""
+        cache = DiskCache(tmp_path, max_bytes=2500)
+        cache.put("a" * 64, b"x" * 1000)
+        cache.put("b" * 64, b"x" * 1000)
+        # 将 a 标记为较早写入，再访问一次使其成为最近使用
+        os.utime(cache._meta_path("a" * 64), (1, 1))
+        os.utime(cache._meta_path("b" * 64), (2, 2))
+        assert cache.get("a" * 64) is not None
+
+        cache.put("c" * 64, b"x" * 1000)
+
+        assert cache.get("a" * 64) is not None
+        assert cache.get("b" * 64) is None
+        assert cache.get("c" * 64) is not None
@@ -0,0 +1,102 @@
+import pytest
+
+from gitlab.diff_parser import DiffParser
+from gitlab.line_anchor import LineAnchor, LineAnchorIndex
+
+SAMPLE_DIFF = """diff --git a/src/app.py b/src/app.py
+--- a/src/app.py
++++ b/src/app.py
+@@ -10,5 +10,6 @@ def main():
+     setup()
+-    run(1)
++    run(2)
++    report()
+     teardown()
+     exit()
+@@ -40,3 +41,3 @@ def helper():
+     a = 1
+-    b = 2
++    b = 3
+diff --git a/old_name.py b/new_name.py
+--- a/old_name.py
++++ b/new_name.py
+@@ -1,2 +1,2 @@
+-x = 1
++x = 2
+ y = 2
+diff --git a/logo.png b/logo.png
+Binary files a/logo.png and b/logo.png differ
+"""
+
+
+@pytest.fixture
+def index():
+    return LineAnchorIndex(DiffParser().parse_diff(SAMPLE_DIFF), max_distance=3)
+
+
+class TestLineAnchorIndex:
+    """测试评论位置的校验与吸附"""
+
+    def test_added_line(self, index):
+        anchor = index.resolve("src/app.py", 12, "added")
+
+        assert anchor == LineAnchor("src/app.py", "src/app.py", "new", new_line=12)
+
+    def test_removed_line(self, index):
+        anchor = index.resolve("src/app.py", 11, "removed")
+
+        assert anchor.line_type == "old"
+        assert anchor.line_number == 11
+
+    def test_context_line_uses_both_line_numbers(self, index):
+        """测试上下文行同时使用原文件与新文件的行号"""
+        anchor = index.resolve("src/app.py", 13, "modified")
+
+        assert anchor.line_type == "both"
+        assert (anchor.old_line, anchor.new_line) == (12, 13)
+
+    def test_snap_to_nearest_changed_line(self, index):
+        anchor = index.resolve("src/app.py", 45, "added")
+
+        assert anchor.line_type == "new"
+        assert anchor.new_line == 42
+        assert anchor.snapped
+
+    def test_snap_within_old_side(self, index):
+        """测试删除行只在原文件行号中吸附，不与新文件行号比较"""
+        anchor = index.resolve("src/app.py", 44, "removed")
+
+        assert anchor.line_type == "old"
+        assert anchor.old_line == 41
+        assert anchor.snapped
+
+    def test_snap_to_context_line(self, index):
+        """测试附近只有上下文行时吸附到上下文行，同时使用两侧行号"""
+        anchor = index.resolve("src/app.py", 16, "added")
+
+        assert anchor.line_type == "both"
+        assert (anchor.old_line, anchor.new_line) == (13, 14)
+        assert anchor.snapped
+
+    def test_drop_far_away_line(self, index):
+        assert index.resolve("src/app.py", 100, "added") is None
+
+    def test_unknown_or_binary_file(self, index):
+        assert index.resolve("src/other.py", 12) is None
+        assert index.resolve("logo.png", 1) is None
+
+    def test_renamed_file(self, index):
+        """测试重命名文件可以用原路径定位，并保留 old_path"""
+        anchor = index.resolve("old_name.py", 1, "removed")
+
+        assert (anchor.old_path, anchor.new_path) == ("old_name.py", "new_name.py")
+        assert anchor.line_type == "old"
+
+    def test_invalid_line_number(self, index):
+        assert index.resolve("src/app.py", "abc") is None
+
+    def test_snap_distance_from_env(self, monkeypatch):
+        monkeypatch.setenv("LINE_COMMENT_SNAP_DISTANCE", "0")
+        index = LineAnchorIndex(DiffParser().parse_diff(SAMPLE_DIFF))
+
+        assert index.resolve("src/app.py", 45, "added") is None
@@ -101,11 +101,13 @@ class TestParseMergeRequestUrl:
 class TestGetMergeRequestDetail:
     """测试 get_merge_request_detail 函数"""
 
-    @patch("gitlab.merge_request.requests.get")
+    @patch("gitlab.client.GitLabClient.get")
     def test_get_merge_request_detail_success(self, mock_get):
         """测试成功获取MR详情"""
         # 模拟响应数据
         mock_response = Mock()
+        mock_response.headers = {}
+        mock_response.links = {}
         mock_response.json.return_value = {
             "id": 123,
             "title": "Test MR",
@@ -121,17 +123,18 @@ class TestGetMergeRequestDetail:
         mock_get.assert_called_once()
         args, kwargs = mock_get.call_args
         assert "projects/group%2Fproject/merge_requests/123" in args[0]
-        assert "headers" in kwargs
 
         # 验证返回结果
         assert result["id"] == 123
         assert result["title"] == "Test MR"
         assert result["state"] == "opened"
 
-    @patch("gitlab.merge_request.requests.get")
+    @patch("gitlab.client.GitLabClient.get")
     def test_get_merge_request_detail_api_error(self, mock_get):
         """测试API请求错误"""
         mock_response = Mock()
+        mock_response.headers = {}
+        mock_response.links = {}
         mock_response.json.side_effect = Exception("JSON decode error")
         mock_get.return_value = mock_response
 
@@ -142,12 +145,14 @@ class TestGetMergeRequestDetail:
 class TestGetMergeRequestRawDiff:
     """测试 get_merge_request_raw_diff 函数"""
 
-    @patch("gitlab.merge_request.requests.get")
+    @patch("gitlab.client.GitLabClient.get")
     @patch("gitlab.merge_request.filter_files_from_diff")
     def test_get_raw_diff_success(self, mock_filter, mock_get):
         """测试成功获取原始diff"""
         # 模拟响应
         mock_response = Mock()
+        mock_response.headers = {}
+        mock_response.links = {}
         mock_response.content = b"diff --git a/file.py b/file.py\n+added line"
         mock_get.return_value = mock_response
 
@@ -161,19 +166,20 @@ class TestGetMergeRequestRawDiff:
         args, kwargs = mock_get.call_args
         assert "projects/group%2Fproject/merge_requests/123/raw_diffs" in args[0]
 
-        # 验证过滤函数调用
+        # 验证过滤函数调用，未指定过滤文件时由 filter_files_from_diff 使用 SKIP_FILES
         mock_filter.assert_called_once_with(
-            "diff --git a/file.py b/file.py\n+added line",
-            ["pnpm-lock.yaml", "package-lock.json"],
+            "diff --git a/file.py b/file.py\n+added line", None
         )
 
         assert result == "filtered diff content"
 
-    @patch("gitlab.merge_request.requests.get")
+    @patch("gitlab.client.GitLabClient.get")
     @patch("gitlab.merge_request.filter_files_from_diff")
     def test_get_raw_diff_custom_filter(self, mock_filter, mock_get):
         """测试自定义过滤文件列表"""
         mock_response = Mock()
+        mock_response.headers = {}
+        mock_response.links = {}
         mock_response.content = b"diff content"
         mock_get.return_value = mock_response
         mock_filter.return_value = "filtered content"
@@ -184,24 +190,49 @@ class TestGetMergeRequestRawDiff:
         # 验证过滤函数使用了自定义过滤列表
         mock_filter.assert_called_once_with("diff content", custom_filters)
 
-    @patch("gitlab.merge_request.requests.get")
+    @patch("gitlab.client.GitLabClient.get")
     def test_get_raw_diff_encoding_error(self, mock_get):
         """测试编码错误处理"""
         mock_response = Mock()
+        mock_response.headers = {}
+        mock_response.links = {}
         mock_response.content = b"\xff\xfe invalid utf-8"
         mock_get.return_value = mock_response
 
         with pytest.raises(UnicodeDecodeError):
             get_merge_request_raw_diff("group%2Fproject", "123")
 
+    @patch("gitlab.client.GitLabClient.get")
+    def test_get_raw_diff_stream(self, mock_get):
+        """测试流式获取原始diff，跨 chunk 的行也能正确拼接"""
+        content = (
+            "diff --git a/pnpm-lock.yaml b/pnpm-lock.yaml\n+lock\n"
+            "diff --git a/测试.py b/测试.py\n+中文内容\n"
+        ).encode("utf-8")
+        mock_response = Mock()
+        mock_response.iter_content.return_value = [
+            content[i : i + 7] for i in range(0, len(content), 7)
+        ]
+        mock_get.return_value = mock_response
+
+        result = get_merge_request_raw_diff("group%2Fproject", "123", stream=True)
+
+        args, kwargs = mock_get.call_args
+        assert "raw_diffs" in args[0]
+        assert kwargs["stream"] is True
+        assert result == "diff --git a/测试.py b/测试.py\n+中文内容\n"
+        mock_response.close.assert_called_once()
+
 
 class TestGetMergeRequestDiff:
     """测试 get_merge_request_diff 函数"""
 
-    @patch("gitlab.merge_request.requests.get")
+    @patch("gitlab.client.GitLabClient.get")
     def test_get_diff_success(self, mock_get):
         """测试成功获取diff"""
         mock_response = Mock()
+        mock_response.headers = {}
+        mock_response.links = {}
         mock_response.json.return_value = [
             {
                 "old_path": "file1.py",
@@ -226,10 +257,12 @@ class TestGetMergeRequestDiff:
         assert result[0]["old_path"] == "file1.py"
         assert result[0]["new_path"] == "file1.py"
 
-    @patch("gitlab.merge_request.requests.get")
+    @patch("gitlab.client.GitLabClient.get")
     def test_get_diff_empty_response(self, mock_get):
         """测试空的diff响应"""
         mock_response = Mock()
+        mock_response.headers = {}
+        mock_response.links = {}
         mock_response.json.return_value = []
         mock_get.return_value = mock_response
 
@@ -241,10 +274,12 @@ class TestGetMergeRequestDiff:
 class TestGetMergeRequestCommits:
     """测试 get_merge_request_commits 函数"""
 
-    @patch("gitlab.merge_request.requests.get")
+    @patch("gitlab.client.GitLabClient.get")
     def test_get_commits_success(self, mock_get):
         """测试成功获取提交记录"""
         mock_response = Mock()
+        mock_response.headers = {}
+        mock_response.links = {}
         mock_response.json.return_value = [
             {
                 "id": "abc123",
@@ -279,10 +314,12 @@ class TestGetMergeRequestCommits:
         assert result[0]["title"] == "Test commit"
         assert result[0]["author_name"] == "Test Author"
 
-    @patch("gitlab.merge_request.requests.get")
+    @patch("gitlab.client.GitLabClient.get")
     def test_get_commits_multiple_commits(self, mock_get):
         """测试获取多个提交记录"""
         mock_response = Mock()
+        mock_response.headers = {}
+        mock_response.links = {}
         mock_response.json.return_value = [
             {
                 "id": "commit1",
@@ -329,10 +366,12 @@ class TestGetMergeRequestCommits:
         assert result[0]["title"] == "First commit"
         assert result[1]["title"] == "Second commit"
 
-    @patch("gitlab.merge_request.requests.get")
+    @patch("gitlab.client.GitLabClient.get")
     def test_get_commits_empty_response(self, mock_get):
         """测试空的提交记录响应"""
         mock_response = Mock()
+        mock_response.headers = {}
+        mock_response.links = {}
         mock_response.json.return_value = []
         mock_get.return_value = mock_response
 
@@ -340,7 +379,7 @@ class TestGetMergeRequestCommits:
 
         assert result == []
 
-    @patch("gitlab.merge_request.requests.get")
+    @patch("gitlab.client.GitLabClient.get")
     def test_get_commits_api_error(self, mock_get):
         """测试API错误"""
         mock_get.side_effect = Exception("Network error")
@@ -353,13 +392,15 @@ class TestIntegration:
     """集成测试"""
 
     @patch.dict(os.environ, {"GITLAB_BASE_URL": "https://gitlab.example.com"})
-    @patch("gitlab.merge_request.requests.get")
+    @patch("gitlab.client.GitLabClient.get")
     def test_full_workflow(self, mock_get):
         """测试完整工作流程"""
 
         # 设置mock响应
         def mock_requests_get(url, **kwargs):
             mock_response = Mock()
+            mock_response.headers = {}
+            mock_response.links = {}
             if "merge_requests/123" in url and url.endswith("/123"):
                 # MR详情
                 mock_response.json.return_value = {
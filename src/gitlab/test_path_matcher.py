@@ -0,0 +1,109 @@
+import pytest
+
+from gitlab.path_matcher import PathMatcher, get_path_matcher
+from gitlab.util import filter_files_from_diff
+
+
+class TestPathMatcher:
+    """测试 gitignore 风格的路径匹配"""
+
+    @pytest.mark.parametrize(
+        "pattern, path, expected",
+        [
+            # 不含 "/" 的模式匹配任意层级的文件名
+            ("pnpm-lock.yaml", "pnpm-lock.yaml", True),
+            ("pnpm-lock.yaml", "packages/app/pnpm-lock.yaml", True),
+            ("lock", "src/clock.ts", False),
+            ("*.min.js", "static/js/app.min.js", True),
+            ("*.min.js", "static/js/app.js", False),
+            ("*.lock", "Cargo.lock", True),
+            # 含 "/" 的模式相对根目录匹配
+            ("dist/**", "dist/assets/app.js", True),
+            ("dist/**", "packages/dist/app.js", False),
+            ("/vendor", "vendor/lib/a.go", True),
+            ("src/*.ts", "src/index.ts", True),
+            ("src/*.ts", "src/utils/index.ts", False),
+            # "**" 匹配任意层级目录
+            ("**/*.lock", "a/b/c/yarn.lock", True),
+            ("**/*.lock", "yarn.lock", True),
+            ("src/**/generated/*.ts", "src/generated/api.ts", True),
+            ("src/**/generated/*.ts", "src/a/b/generated/api.ts", True),
+            # 以 "/" 结尾只匹配目录
+            ("icon/", "assets/icon/button.vue", True),
+            ("icon/", "icon", False),
+            # 匹配到目录时，目录下的文件都会被匹配
+            ("node_modules", "node_modules/pkg/index.js", True),
+            # 字符集合与 "?"
+            ("file[0-9].py", "file3.py", True),
+            ("file[!0-9].py", "file3.py", False),
+            ("file?.py", "fileA.py", True),
+            ("file?.py", "file/.py", False),
+        ],
+    )
+    def test_match(self, pattern, path, expected):
+        assert PathMatcher([pattern]).match(path) is expected
+
+    def test_multiple_patterns(self):
+        """测试多个模式编译为一个匹配器"""
+        matcher = PathMatcher(["*.min.js", "dist/**", "pnpm-lock.yaml"])
+
+        assert matcher.match("a/b.min.js")
+        assert matcher.match("dist/x")
+        assert matcher.match("pnpm-lock.yaml")
+        assert not matcher.match("src/main.py")
+
+    def test_empty_patterns(self):
+        """测试空模式不匹配任何路径"""
+        matcher = PathMatcher(["", "  "])
+
+        assert not matcher
+        assert not matcher.match("anything")
+
+    def test_matcher_is_cached(self):
+        """测试相同的模式复用同一个匹配器"""
+        assert get_path_matcher(["a", "b"]) is get_path_matcher(("a", "b"))
+
+
+class TestFilterWithGlobs:
+    """测试 filter_files_from_diff 使用 glob 过滤"""
+
+    content = """diff --git a/src/clock.ts b/src/clock.ts
+--- a/src/clock.ts
++++ b/src/clock.ts
+@@ -1 +1 @@
+-a
++b
+diff --git a/dist/app.min.js b/dist/app.min.js
+--- a/dist/app.min.js
++++ b/dist/app.min.js
+@@ -1 +1 @@
+-a
++b
+diff --git a/packages/web/yarn.lock b/packages/web/yarn.lock
+--- a/packages/web/yarn.lock
++++ b/packages/web/yarn.lock
+@@ -1 +1 @@
+-a
++b
+"""
+
+    def test_no_substring_over_match(self):
+        """测试 "lock" 不会过滤 clock.ts"""
+        assert filter_files_from_diff(self.content, ["lock"]) == self.content
+
+    def test_glob_patterns(self):
+        """测试 glob 过滤"""
+        result = filter_files_from_diff(self.content, ["**/*.lock", "dist/**"])
+
+        assert "src/clock.ts" in result
+        assert "app.min.js" not in result
+        assert "yarn.lock" not in result
+
+    def test_skip_files_env(self, monkeypatch):
+        """测试 SKIP_FILES 支持 glob"""
+        monkeypatch.setenv("SKIP_FILES", '["*.min.js"]')
+
+        result = filter_files_from_diff(self.content, [])
+
+        assert "app.min.js" not in result
+        assert "yarn.lock" in result
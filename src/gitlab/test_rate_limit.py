@@ -0,0 +1,113 @@
+import time
+from email.utils import formatdate
+from unittest.mock import Mock, patch
+
+from gitlab.client import GitLabClient
+from gitlab.rate_limit import RateLimiter, _parse_retry_after
+
+
+def _response(status_code, headers=None):
+    response = Mock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    return response
+
+
+class TestRateLimiter:
+    """测试 RateLimiter"""
+
+    def test_token_bucket_limits_rate(self):
+        """测试令牌耗尽后按速率发放"""
+        limiter = RateLimiter(rate=50, burst=1)
+
+        start = time.perf_counter()
+        for _ in range(4):
+            limiter.acquire()
+
+        # 第一个令牌来自桶内，其余 3 个需要约 3 / 50 秒
+        assert time.perf_counter() - start >= 0.05
+
+    def test_remaining_quota_lowers_rate(self):
+        """测试按剩余配额降低发放速率"""
+        limiter = RateLimiter(rate=10, burst=20)
+
+        limiter.update(
+            {"RateLimit-Remaining": "10", "RateLimit-Reset": str(time.time() + 10)}
+        )
+
+        assert 0.9 <= limiter.rate <= 1.1
+        assert limiter._tokens <= 10
+
+    def test_exhausted_quota_blocks_until_reset(self):
+        """测试配额耗尽时暂停到重置时间"""
+        limiter = RateLimiter()
+
+        limiter.update(
+            {"RateLimit-Remaining": "0", "RateLimit-Reset": str(time.time() + 30)}
+        )
+
+        assert limiter._blocked_until - time.monotonic() > 25
+
+    def test_backoff_prefers_retry_after(self):
+        """测试优先使用 Retry-After"""
+        limiter = RateLimiter(max_delay=60)
+
+        assert limiter.backoff(0, "7") == 7
+        assert limiter.backoff(0, "600") == 60
+
+    @patch("gitlab.rate_limit.random.uniform", side_effect=lambda a, b: b)
+    def test_exponential_backoff(self, _mock_uniform):
+        """测试没有 Retry-After 时的指数退避"""
+        limiter = RateLimiter(base_delay=1, max_delay=10)
+
+        assert limiter.backoff(0) == 1
+        assert limiter.backoff(2) == 4
+        assert limiter.backoff(5) == 10
+
+    def test_parse_retry_after_http_date(self):
+        """测试解析 HTTP 日期格式的 Retry-After"""
+        delay = _parse_retry_after(formatdate(time.time() + 20, usegmt=True))
+
+        assert 15 <= delay <= 20
+        assert _parse_retry_after("invalid") is None
+
+
+class TestClientRetry:
+    """测试 GitLabClient 的重试"""
+
+    def _client(self, responses, max_retries=3):
+        limiter = RateLimiter(rate=1000, burst=100, max_retries=max_retries)
+        limiter.backoff = Mock(return_value=0)
+        client = GitLabClient(
+            "https://gitlab.example.com/api/v4", "t", rate_limiter=limiter
+        )
+        client.session.request = Mock(side_effect=responses)
+        return client
+
+    def test_retry_on_429(self):
+        """测试 429 后按 Retry-After 重试"""
+        client = self._client([_response(429, {"Retry-After": "1"}), _response(200)])
+
+        response = client.get("/user")
+
+        assert response.status_code == 200
+        assert response.retries == 1
+        client.rate_limiter.backoff.assert_called_once_with(0, "1")
+
+    def test_give_up_after_max_retries(self):
+        """测试超过最大重试次数后返回最后一次响应"""
+        client = self._client([_response(429)] * 3, max_retries=2)
+
+        response = client.get("/user")
+
+        assert response.status_code == 429
+        assert client.session.request.call_count == 3
+
+    def test_post_not_retried_on_5xx(self):
+        """测试 POST 遇到 5xx 不重试，避免重复创建评论"""
+        client = self._client([_response(502), _response(201)])
+
+        response = client.post("/projects/1/notes", json={"body": "x"})
+
+        assert response.status_code == 502
+        client.session.request.assert_called_once()
@@ -0,0 +1,151 @@
+from unittest.mock import Mock
+
+import pytest
+
+from gitlab.diff_parser import DiffParser
+from gitlab.review_state import (
+    FileReview,
+    ReviewState,
+    ReviewStateStore,
+    build_file_reviews,
+    file_fingerprint,
+)
+from utils.disk_cache import DiskCache
+
+
+def _parse(body: str):
+    return DiffParser().parse_diff(body)
+
+
+A_DIFF = """diff --git a/a.py b/a.py
+--- a/a.py
++++ b/a.py
+@@ -1,2 +1,2 @@
+ keep
+-old
++new
+"""
+
+B_DIFF = """diff --git a/b.py b/b.py
+--- a/b.py
++++ b/b.py
+@@ -10 +10 @@
+-x = 1
++x = 2
+"""
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ReviewStateStore(DiskCache(tmp_path, max_bytes=1024 * 1024), "test")
+
+
+class TestFileFingerprint:
+    """测试文件 hunk 的指纹"""
+
+    def test_same_hunks_same_fingerprint(self):
+        assert file_fingerprint(_parse(A_DIFF)[0]) == file_fingerprint(
+            _parse(A_DIFF)[0]
+        )
+
+    @pytest.mark.parametrize(
+        "changed",
+        [
+            A_DIFF.replace("+new", "+newer"),
+            A_DIFF.replace("@@ -1,2 +1,2 @@", "@@ -5,2 +5,2 @@"),
+            A_DIFF.replace(" keep", "+keep").replace("-1,2 +1,2", "-1 +1,3"),
+            A_DIFF.replace("b/a.py", "b/c.py"),
+        ],
+    )
+    def test_changes_detected(self, changed):
+        """测试行内容、hunk 位置、行类型与路径的变化都会改变指纹"""
+        assert file_fingerprint(_parse(changed)[0]) != file_fingerprint(
+            _parse(A_DIFF)[0]
+        )
+
+
+class TestReviewState:
+    """测试增量审查的状态"""
+
+    def test_split_files(self):
+        a_file, b_file = _parse(A_DIFF + B_DIFF)
+        state = ReviewState(
+            head_sha="old",
+            files={
+                "a.py": FileReview(fingerprint=file_fingerprint(a_file)),
+                "b.py": FileReview(fingerprint="stale"),
+            },
+        )
+        new_file = _parse(A_DIFF.replace("a.py", "new.py"))[0]
+
+        changed, reused = state.split_files([a_file, b_file, new_file])
+
+        assert changed == [b_file, new_file]
+        assert list(reused) == ["a.py"]
+
+    def test_build_file_reviews(self):
+        a_file, b_file = _parse(A_DIFF + B_DIFF)
+        result = {
+            "overall_summary": "整体不错",
+            "line_comments": [
+                {"file_path": "a.py", "line_number": 2, "message": "a"},
+                {"file_path": "/b.py", "line_number": 10, "message": "b"},
+                {"file_path": "missing.py", "line_number": 1, "message": "c"},
+            ],
+            "general_suggestions": ["补充测试"],
+        }
+
+        reviews = build_file_reviews([([a_file, b_file], result)])
+
+        assert reviews["a.py"].fingerprint == file_fingerprint(a_file)
+        assert [c["message"] for c in reviews["a.py"].line_comments] == ["a"]
+        assert [c["message"] for c in reviews["b.py"].line_comments] == ["b"]
+        assert reviews["b.py"].summaries == ["整体不错"]
+        assert reviews["b.py"].general_suggestions == ["补充测试"]
+
+    def test_file_split_across_chunks(self):
+        a_file = _parse(A_DIFF)[0]
+        first = {"overall_summary": "第一部分", "line_comments": []}
+        second = {
+            "overall_summary": "第二部分",
+            "line_comments": [{"file_path": "a.py", "line_number": 2}],
+        }
+
+        reviews = build_file_reviews([([a_file], first), ([a_file], second)])
+
+        assert reviews["a.py"].summaries == ["第一部分", "第二部分"]
+        assert len(reviews["a.py"].line_comments) == 1
+
+
+class TestReviewStateStore:
+    """测试增量审查状态的读写"""
+
+    def test_roundtrip(self, store):
+        state = ReviewState(
+            head_sha="sha",
+            files={
+                "a.py": FileReview(
+                    fingerprint="f",
+                    line_comments=[{"file_path": "a.py", "line_number": 1}],
+                    summaries=["总结"],
+                )
+            },
+        )
+
+        store.save("1", "2", "config", state)
+
+        assert store.load("1", "2", "config") == state
+        assert store.load("1", "3", "config") is None
+        # 模型或 prompt 变化后不沿用上次的结果
+        assert store.load("1", "2", "other-config") is None
+
+    def test_corrupted_state(self, store):
+        store.disk_cache.put(store.key("1", "2", "config"), b"{not json")
+
+        assert store.load("1", "2", "config") is None
+
+    def test_unreadable_state(self, store, monkeypatch):
+        """测试状态目录无法读取时视为没有审查过"""
+        monkeypatch.setattr(store.disk_cache, "get", Mock(side_effect=PermissionError))
+
+        assert store.load("1", "2", "config") is None
@@ -1,4 +1,8 @@
-from gitlab.util import filter_files_from_diff, parse_merge_request_url
+from gitlab.util import (
+    filter_files_from_diff,
+    iter_filtered_diff_lines,
+    parse_merge_request_url,
+)
 
 
 class TestFilterFilesFromDiff:
@@ -377,6 +381,36 @@ diff --git a/icon/button.vue b/icon/button.vue
         assert "package-lock.json" in result
         assert "diff --git a/icon/gd.vue b/icon/gd.vue" in result
 
+    def test_header_only_at_line_start(self):
+        """测试文件内容中出现的 "diff --git" 不会被当作文件头"""
+        content = """diff --git a/docs/git.md b/docs/git.md
+--- a/docs/git.md
++++ b/docs/git.md
+@@ -1,1 +1,2 @@
+ # Git
++运行 git diff 会输出 diff --git a/pnpm-lock.yaml b/pnpm-lock.yaml 这样的文件头
+diff --git a/pnpm-lock.yaml b/pnpm-lock.yaml
+--- a/pnpm-lock.yaml
++++ b/pnpm-lock.yaml
+@@ -1,1 +1,1 @@
+-a
++b
+"""
+        result = filter_files_from_diff(content, ["pnpm-lock.yaml"])
+
+        assert result == content[: content.index("\ndiff --git a/pnpm-lock.yaml") + 1]
+        assert "这样的文件头" in result
+
+    def test_return_original_when_nothing_filtered(self):
+        """测试没有过滤任何文件时返回原字符串本身"""
+        content = """preamble
+diff --git a/file1.py b/file1.py
++x
+"""
+        result = filter_files_from_diff(content, ["other.py"])
+
+        assert result is content
+
 
 class TestParseMergeRequestUrl:
     """测试 parse_merge_request_url 函数"""
@@ -396,3 +430,53 @@ class TestParseMergeRequestUrl:
         project_id, mr_number = parse_merge_request_url(url, "https://git.gaoding.com")
         assert project_id == "npm%2Fgdicon-cli"
         assert mr_number == "7"
+
+
+class TestIterFilteredDiffLines:
+    """测试 iter_filtered_diff_lines 流式过滤"""
+
+    content = """diff --git a/pnpm-lock.yaml b/pnpm-lock.yaml
+index 1234567..abcdefg 100644
+--- a/pnpm-lock.yaml
++++ b/pnpm-lock.yaml
+@@ -1,2 +1,2 @@
+-lockfileVersion: 5
++lockfileVersion: 6
+diff --git a/src/main.py b/src/main.py
+index 2345678..bcdefgh 100644
+--- a/src/main.py
++++ b/src/main.py
+@@ -1,3 +1,4 @@
+ def main():
++    print("pnpm-lock.yaml")
+     pass
+"""
+
+    def test_same_result_as_filter_files_from_diff(self):
+        """测试与 filter_files_from_diff 结果一致"""
+        lines = iter_filtered_diff_lines(self.content.split("\n"), ["pnpm-lock.yaml"])
+
+        result = "\n".join(lines)
+
+        assert result == filter_files_from_diff(self.content, ["pnpm-lock.yaml"])
+        assert "lockfileVersion" not in result
+        assert 'print("pnpm-lock.yaml")' in result
+
+    def test_keep_all_when_nothing_matches(self):
+        """测试没有匹配的文件时原样输出"""
+        lines = iter_filtered_diff_lines(self.content.split("\n"), ["nonexistent"])
+
+        assert "\n".join(lines) == self.content
+
+    def test_is_lazy(self):
+        """测试逐行产出，不需要先读取完整内容"""
+
+        def source():
+            yield "diff --git a/keep.py b/keep.py"
+            yield "+kept"
+            raise AssertionError("不应读取更多的行")
+
+        lines = iter_filtered_diff_lines(source(), ["pnpm-lock.yaml"])
+
+        assert next(lines) == "diff --git a/keep.py b/keep.py"
+        assert next(lines) == "+kept"
@@ -1,16 +1,18 @@
 import json
 import os
 import re
-from typing import List
+from typing import Iterable, Iterator, List, Optional, Tuple
 from urllib.parse import quote
 
+from gitlab.path_matcher import PathMatcher, get_path_matcher
+
 
 def get_skip_files():
-    """获取跳过的文件列表"""
+    """获取跳过的文件列表，SKIP_FILES 为 JSON 数组，每一项是 gitignore 风格的 glob"""
     skip_files = os.getenv("SKIP_FILES")
     if skip_files:
         return json.loads(skip_files)
-    return ["pnpm-lock.yaml"]
+    return ["pnpm-lock.yaml", "package-lock.json"]
 
 
 def parse_project_name(project_name: str):
@@ -40,113 +42,202 @@ def parse_merge_request_url(url: str, origin_url: str | None = None):
 
 
 def filter_files_from_diff(
-    content: str, files_to_filter: List[str] = ["pnpm-lock.yaml"]
+    content: str, files_to_filter: Optional[List[str]] = None
 ) -> str:
-    """过滤掉指定文件的 diff 内容"""
-    if not content.strip():
-        return content
+    """
+    过滤掉指定文件的 diff 内容
+
+    只扫描一遍：定位行首的 "diff --git" 文件头，逐个 section 判断是否过滤，
+    只拼接保留下来的区间。文件内容中出现的 "diff --git"（不在行首）不会被当作文件头。
+    没有需要过滤的 section 时直接返回原字符串，不产生任何拷贝。
 
-    # 如果没有需要过滤的文件，直接返回原内容
+    Args:
+        content: 原始 diff
+        files_to_filter: 需要过滤的文件，gitignore 风格的 glob，如 "*.lock"、"dist/**"；
+            为空时使用 SKIP_FILES
+    """
     if not files_to_filter:
         files_to_filter = get_skip_files()
+    matcher = get_path_matcher(files_to_filter)
+
+    kept_spans = []
+    filtered = False
+    for start, end, should_filter in _iter_diff_sections(content, matcher):
+        if should_filter:
+            filtered = True
+        elif kept_spans and kept_spans[-1][1] == start:
+            # 相邻的保留区间合并，减少切片次数
+            kept_spans[-1][1] = end
+        else:
+            kept_spans.append([start, end])
 
-    if "diff --git" not in content:
+    if not filtered:
         return content
+    return "".join(content[start:end] for start, end in kept_spans)
 
-    # 按 diff 头部分割内容
-    diff_sections = content.split("diff --git")
 
-    # 非标准 diff 格式时，返回原始内容
-    if len(diff_sections) == 0:
-        return content
+# 匹配 diff --git 头部的文件路径：a/path/to/file b/path/to/file
+_DIFF_PATH_PATTERN = r"^[\s]*a/(.+?)\s+b/(.+?)(?:\s|$)"
+_DIFF_PATH_RE = re.compile(_DIFF_PATH_PATTERN)
+# 用于 match(content, pos, endpos)：^ 不会在 pos 处匹配，因此去掉 ^
+_DIFF_HEADER_PATH_RE = re.compile(_DIFF_PATH_PATTERN[1:])
 
-    # 过滤掉指定文件的 sections
-    filtered_sections = []
+_DIFF_HEADER = "diff --git"
+# 行首的 diff 文件头：内容开头，或紧跟在换行符之后
+_DIFF_HEADER_AT_LINE_START = "\n" + _DIFF_HEADER
 
-    for section in diff_sections:
-        if not section.strip():
-            # 空的section直接跳过
-            continue
 
-        # 检查是否应该过滤这个section
-        should_filter = _should_filter_section(section, files_to_filter)
+def _iter_diff_header_positions(content: str) -> Iterator[int]:
+    """依次产出行首 "diff --git" 的位置，str.find 为 C 实现的快速查找"""
+    if content.startswith(_DIFF_HEADER):
+        yield 0
+    position = content.find(_DIFF_HEADER_AT_LINE_START)
+    while position != -1:
+        yield position + 1
+        position = content.find(_DIFF_HEADER_AT_LINE_START, position + 1)
 
-        if not should_filter:
-            filtered_sections.append(section)
 
-    # 重新组合内容
-    if not filtered_sections:
-        return ""
+def _iter_diff_sections(
+    content: str, matcher: PathMatcher
+) -> Iterator[Tuple[int, int, bool]]:
+    """
+    遍历 diff 中的 section
 
-    # 第一个section前面需要加上 "diff --git"
-    filtered_content = "diff --git" + "diff --git".join(filtered_sections)
+    Yields:
+        (起始位置, 结束位置, 是否过滤)；第一个文件头之前的内容作为一个不过滤的 section
+    """
+    starts = list(_iter_diff_header_positions(content))
+    if not starts:
+        return
+    if starts[0] > 0:
+        yield 0, starts[0], False
+
+    starts.append(len(content))
+    for start, end in zip(starts, starts[1:]):
+        line_end = content.find("\n", start, end)
+        if line_end == -1:
+            line_end = end
+        match = _DIFF_HEADER_PATH_RE.match(content, start + len(_DIFF_HEADER), line_end)
+        if match:
+            should_filter = matcher.match(match.group(1)) or matcher.match(
+                match.group(2)
+            )
+        else:
+            # 无法从头部解析出路径时，用前 5 行的 ---/+++ 行判断
+            should_filter = _fallback_filter_check(
+                _head_lines(content, start, end, 5), matcher
+            )
+        yield start, end, should_filter
+
+
+def _head_lines(content: str, start: int, end: int, count: int) -> str:
+    """取 content[start:end] 的前 count 行，不拷贝整个 section"""
+    position = start
+    for _ in range(count):
+        position = content.find("\n", position, end)
+        if position == -1:
+            return content[start:end]
+        position += 1
+    return content[start:position]
+
+
+def iter_filtered_diff_lines(
+    lines: Iterable[str], files_to_filter: Optional[List[str]] = None
+) -> Iterator[str]:
+    """
+    流式过滤 diff：逐行读取，丢弃指定文件的 section，过滤规则与 filter_files_from_diff 相同
+
+    Args:
+        lines: 不含换行符的 diff 行，"\n".join(lines) 即为原始 diff
+        files_to_filter: 需要过滤的文件，为空时使用 SKIP_FILES
+
+    Yields:
+        保留下来的行
+    """
+    if not files_to_filter:
+        files_to_filter = get_skip_files()
+    matcher = get_path_matcher(files_to_filter)
 
-    return filtered_content
+    # skipping: 当前 section 是否被过滤；pending: 尚未能判断是否过滤的行
+    skipping = False
+    kept_any = False
+    pending: List[str] = []
 
+    for line in lines:
+        if line.startswith("diff --git"):
+            # 上一个 section 不足 5 行就结束了，用已有的行判断
+            if pending:
+                if not _fallback_filter_check("\n".join(pending), matcher):
+                    kept_any = True
+                    yield from pending
+                pending = []
+
+            section_header = line[len("diff --git") :]
+            if _DIFF_PATH_RE.match(section_header.strip()):
+                skipping = _should_filter_section(section_header, matcher)
+                if not skipping:
+                    kept_any = True
+                    yield line
+            else:
+                # 无法从头部解析出路径，缓存前 5 行后再用 ---/+++ 行判断
+                skipping = False
+                pending = [line]
+            continue
 
-def _should_filter_section(section: str, files_to_filter: List[str]) -> bool:
-    """检查是否应该过滤这个diff section"""
+        if pending:
+            pending.append(line)
+            if len(pending) == 5:
+                skipping = _fallback_filter_check("\n".join(pending), matcher)
+                if not skipping:
+                    kept_any = True
+                    yield from pending
+                pending = []
+            continue
 
-    # 提取文件路径的正则表达式
-    # 匹配 diff --git 头部的文件路径：a/path/to/file b/path/to/file
-    path_pattern = r"^[\s]*a/(.+?)\s+b/(.+?)(?:\s|$)"
+        if not skipping:
+            kept_any = True
+            yield line
 
-    # 查找section的第一行（包含文件路径信息）
-    first_line = section.split("\n")[0].strip()
+    if pending:
+        skipping = _fallback_filter_check("\n".join(pending), matcher)
+        if not skipping:
+            kept_any = True
+            yield from pending
 
-    match = re.match(path_pattern, first_line)
-    if not match:
-        # 如果无法匹配到标准的git diff格式，fallback到简单的文件名检查
-        return _fallback_filter_check(section, files_to_filter)
-
-    # 获取源文件和目标文件路径
-    source_path = match.group(1)
-    target_path = match.group(2)
-
-    # 检查是否需要过滤
-    for filter_file in files_to_filter:
-        # 检查完整路径是否包含要过滤的文件名
-        if _path_contains_file(source_path, filter_file) or _path_contains_file(
-            target_path, filter_file
-        ):
-            return True
+    # 最后一个 section 被过滤时，补回上一个 section 末尾的换行
+    if skipping and kept_any:
+        yield ""
 
-    return False
 
+def _should_filter_section(section: str, matcher: PathMatcher) -> bool:
+    """检查是否应该过滤这个diff section"""
 
-def _path_contains_file(file_path: str, filter_file: str) -> bool:
-    """检查文件路径是否包含要过滤的文件"""
+    # 查找section的第一行（包含文件路径信息）
+    first_line = section.partition("\n")[0].strip()
 
-    # 方法1: 完全匹配文件名
-    file_name = file_path.split("/")[-1]  # 获取文件名部分
-    if file_name == filter_file:
-        return True
+    match = _DIFF_PATH_RE.match(first_line)
+    if not match:
+        # 如果无法匹配到标准的git diff格式，fallback到 ---/+++ 行检查
+        return _fallback_filter_check(section, matcher)
 
-    # 方法2: 文件名包含匹配（更宽松）
-    if filter_file in file_name:
-        return True
+    # 源文件或目标文件任意一个匹配即过滤
+    return matcher.match(match.group(1)) or matcher.match(match.group(2))
 
-    # 方法3: 路径包含匹配（最宽松，用于处理目录等情况）
-    if filter_file in file_path:
-        return True
 
-    return False
+# --- a/path 或 +++ b/path
+_FALLBACK_PATH_RE = re.compile(r"^(?:---|\+\+\+) [ab]/(.+?)\s*$")
 
 
-def _fallback_filter_check(section: str, files_to_filter: List[str]) -> bool:
+def _fallback_filter_check(section: str, matcher: PathMatcher) -> bool:
     """备用的过滤检查方法，用于处理非标准格式"""
 
     # 在section的前几行中查找文件路径信息
     lines = section.split("\n")[:5]  # 只检查前5行
 
     for line in lines:
-        # 查找包含文件路径的行
-        if ("---" in line and ("a/" in line or "b/" in line)) or (
-            "+++" in line and ("a/" in line or "b/" in line)
-        ):
-            for filter_file in files_to_filter:
-                if filter_file in line:
-                    return True
+        match = _FALLBACK_PATH_RE.match(line)
+        if match and matcher.match(match.group(1)):
+            return True
 
     return False
 
@@ -1,16 +1,14 @@
 from datetime import datetime, timedelta
 from typing import Any, Dict, List
 
-import requests
-
-from gitlab.auth import base_url, headers
+from gitlab.client import get_client
 from gitlab.merge_request import get_merge_request_commits
 
 
 def get_current_user_info() -> Dict[str, Any]:
     """获取当前用户信息"""
-    url = f"{base_url}/user"
-    response = requests.get(url, headers=headers)
+    path = "/user"
+    response = get_client().get(path)
     response.raise_for_status()
     return response.json()
 
@@ -39,10 +37,10 @@ def fetch_recent_merge_requests(
     # 构建API URL和参数
     if project_id:
         # 获取特定项目的MR
-        url = f"{base_url}/projects/{project_id}/merge_requests"
+        path = f"/projects/{project_id}/merge_requests"
     else:
         # 获取用户所有项目的MR
-        url = f"{base_url}/merge_requests"
+        path = "/merge_requests"
 
     params = {
         "author_id": user_id,  # 只获取当前用户创建的MR
@@ -50,32 +48,16 @@ def fetch_recent_merge_requests(
         "updated_after": start_date.isoformat(),  # 更新时间在指定日期之后
         "order_by": "created_at",  # 按创建时间排序
         "sort": "desc",  # 降序排列（最新的在前）
-        "per_page": 100,  # 每页100条记录
     }
 
     all_merge_requests = []
     states = ["opened", "merged"]  # 定义要获取的状态列表
 
     for state in states:
-        page = 1
-        while True:
-            params["state"] = state  # 设置当前要获取的状态
-            params["page"] = page
-            response = requests.get(url, headers=headers, params=params)
-            response.raise_for_status()
-
-            merge_requests = response.json()
-
-            if not merge_requests:
-                break
-
-            all_merge_requests.extend(merge_requests)
-
-            # 检查是否还有更多页面
-            if len(merge_requests) < params["per_page"]:
-                break
-
-            page += 1
+        # 设置当前要获取的状态，分页由 paginate 处理
+        all_merge_requests.extend(
+            get_client().paginate(path, params={**params, "state": state})
+        )
 
     # 为每个MR获取提交记录
     enriched_merge_requests = []
@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+SRC_DIR = Path(__file__).parent
+
+# version / --help 的启动时间预算（秒），包含解释器自身的启动时间
+STARTUP_BUDGET = 1.0
+
+# 这些模块只应在执行对应子命令时导入
+HEAVY_MODULES = ["requests", "openai", "pocketflow", "bs4", "asyncio"]
+
+
+def _run(*args: str) -> subprocess.CompletedProcess:
+    """在没有 GitLab / OpenAI 凭证的环境中运行命令"""
+    env = {
+        key: value
+        for key, value in os.environ.items()
+        if not key.startswith(("GITLAB_", "OPENAI_"))
+    }
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=SRC_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=30,
+    )
+
+
+class TestCliStartup:
+    """测试 CLI 启动不加载重量级依赖"""
+
+    @pytest.mark.parametrize("argv", [["version"], ["--help"]])
+    def test_startup_without_credentials(self, argv):
+        """测试未配置凭证时 version 与 --help 也能在预算内完成"""
+        start = time.perf_counter()
+        result = _run("cli.py", *argv)
+        elapsed = time.perf_counter() - start
+
+        assert result.returncode == 0, result.stderr
+        assert elapsed < STARTUP_BUDGET
+
+    def test_no_heavy_imports(self):
+        """测试导入 cli 时不加载 requests、openai、pocketflow 等模块"""
+        code = (
+            "import sys, cli; "
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+        )
+        result = _run("-c", code)
+
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip() == ""
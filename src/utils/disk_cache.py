@@ -0,0 +1,191 @@
+"""
+磁盘缓存模块
+
+按 key 存储二进制内容与 JSON 元数据，总大小超过上限时按最近使用时间（LRU）淘汰。
+读取失败（包括目录不可用等 OSError）视为未命中；写入失败时抛出 OSError，由调用方决定是否忽略。
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_CACHE_ROOT = Path.home() / ".cache" / "gitlab-merge-request-bot"
+
+
+def make_cache_key(*parts: Any) -> str:
+    """将任意可 JSON 序列化的内容组合为稳定的缓存 key"""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CacheWriter:
+    """流式写入缓存条目，commit 之前条目对读取方不可见"""
+
+    def __init__(self, cache: "DiskCache", key: str, meta: Dict[str, Any]):
+        self._cache = cache
+        self._key = key
+        self._meta = meta
+        self._size = 0
+        self._done = False
+        body_path = cache._body_path(key)
+        body_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=body_path.parent, suffix=".tmp")
+        self._tmp_path = Path(tmp_name)
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, data: bytes):
+        self._file.write(data)
+        self._size += len(data)
+
+    def commit(self):
+        """写入完成，发布条目"""
+        if self._done:
+            return
+        self._done = True
+        self._file.close()
+        self._cache._publish(self._key, self._tmp_path, self._meta, self._size)
+
+    def abort(self):
+        """放弃写入，删除临时文件"""
+        if self._done:
+            return
+        self._done = True
+        self._file.close()
+        self._tmp_path.unlink(missing_ok=True)
+
+
+class DiskCache:
+    """
+    基于文件的 LRU 缓存
+
+    每个条目由 <key>.body（内容）与 <key>.meta（JSON 元数据）组成，
+    写入采用临时文件 + rename，多个进程共享同一目录也不会读到半写入的条目。
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        """
+        Args:
+            directory: 缓存目录
+            max_bytes: 缓存总大小上限（字节）
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+
+    def _body_path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.body"
+
+    def _meta_path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.meta"
+
+    def lookup(self, key: str) -> Optional[Tuple[Dict[str, Any], Path]]:
+        """
+        查找条目并刷新其最近使用时间
+
+        Returns:
+            (元数据, 内容文件路径)，不存在或无法读取时返回 None
+        """
+        meta_path = self._meta_path(key)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(meta_path)
+        except OSError:
+            # 只读的缓存目录仍然可以读取，只是不再刷新 LRU 顺序
+            pass
+        return meta, self._body_path(key)
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, Any], bytes]]:
+        """读取条目的元数据与内容，不存在时返回 None"""
+        entry = self.lookup(key)
+        if entry is None:
+            return None
+        meta, body_path = entry
+        try:
+            return meta, body_path.read_bytes()
+        except OSError:
+            return None
+
+    def put(self, key: str, body: bytes, meta: Optional[Dict[str, Any]] = None):
+        """写入条目"""
+        writer = self.writer(key, meta)
+        try:
+            writer.write(body)
+        except BaseException:
+            writer.abort()
+            raise
+        writer.commit()
+
+    def writer(self, key: str, meta: Optional[Dict[str, Any]] = None) -> CacheWriter:
+        """创建流式写入器，适用于无法一次性放入内存的内容"""
+        return CacheWriter(self, key, meta or {})
+
+    def delete(self, key: str):
+        """删除条目"""
+        size = self._entry_size(key)
+        self._meta_path(key).unlink(missing_ok=True)
+        self._body_path(key).unlink(missing_ok=True)
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes -= size
+
+    def _entry_size(self, key: str) -> int:
+        size = 0
+        for path in (self._meta_path(key), self._body_path(key)):
+            try:
+                size += path.stat().st_size
+            except FileNotFoundError:
+                pass
+        return size
+
+    def _publish(self, key: str, tmp_path: Path, meta: Dict[str, Any], size: int):
+        old_size = self._entry_size(key)
+        meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+
+        os.replace(tmp_path, self._body_path(key))
+        fd, meta_tmp = tempfile.mkstemp(dir=tmp_path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(meta_bytes)
+        os.replace(meta_tmp, self._meta_path(key))
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += size + len(meta_bytes) - old_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _scan_size(self) -> int:
+        return sum(
+            path.stat().st_size
+            for path in self.directory.glob("*/*")
+            if path.suffix in (".body", ".meta")
+        )
+
+    def _evict(self):
+        """按 meta 文件的修改时间从旧到新淘汰，直到总大小低于上限"""
+        entries = []
+        for meta_path in self.directory.glob("*/*.meta"):
+            try:
+                entries.append((meta_path.stat().st_mtime, meta_path.stem))
+            except FileNotFoundError:
+                continue
+        entries.sort()
+
+        total = self._scan_size()
+        for _, key in entries:
+            if total <= self.max_bytes:
+                break
+            size = self._entry_size(key)
+            self._meta_path(key).unlink(missing_ok=True)
+            self._body_path(key).unlink(missing_ok=True)
+            total -= size
+        self._total_bytes = total
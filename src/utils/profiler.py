@@ -0,0 +1,244 @@
+"""
+性能分析模块
+
+记录每次 GitLab / OpenAI 请求的耗时、状态码、流量、重试与缓存命中情况，
+以及各个工作流阶段的耗时，并输出按阶段、按接口汇总的报告。
+"""
+
+import contextvars
+import functools
+import json
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+# 当前所在的阶段，asyncio.to_thread 会把它带到工作线程中
+_current_stage: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "profiler_stage", default=None
+)
+
+_HEX_SHA = re.compile(r"^[0-9a-f]{7,40}$")
+
+
+@dataclass
+class RequestRecord:
+    """一次外部请求的记录"""
+
+    service: str  # "gitlab" 或 "openai"
+    endpoint: str
+    status: Optional[int]
+    latency: float
+    bytes_in: int = 0
+    bytes_out: int = 0
+    retries: int = 0
+    cache_hit: bool = False
+    stage: Optional[str] = None
+
+
+@dataclass
+class StageRecord:
+    """一个阶段的一次执行记录"""
+
+    name: str
+    duration: float
+
+
+class Profiler:
+    """请求与阶段耗时记录器，默认关闭，关闭时不记录任何内容"""
+
+    def __init__(self):
+        self.enabled = False
+        self.requests: List[RequestRecord] = []
+        self.stages: List[StageRecord] = []
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def reset(self):
+        with self._lock:
+            self.requests = []
+            self.stages = []
+
+    def record_request(
+        self,
+        service: str,
+        endpoint: str,
+        status: Optional[int],
+        latency: float,
+        bytes_in: int = 0,
+        bytes_out: int = 0,
+        retries: int = 0,
+        cache_hit: bool = False,
+    ):
+        """记录一次请求"""
+        if not self.enabled:
+            return
+        record = RequestRecord(
+            service=service,
+            endpoint=endpoint,
+            status=status,
+            latency=latency,
+            bytes_in=bytes_in,
+            bytes_out=bytes_out,
+            retries=retries,
+            cache_hit=cache_hit,
+            stage=_current_stage.get(),
+        )
+        with self._lock:
+            self.requests.append(record)
+
+    @contextmanager
+    def stage(self, name: str):
+        """记录一个阶段的耗时，阶段内发出的请求会归属到该阶段"""
+        token = _current_stage.set(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            _current_stage.reset(token)
+            if self.enabled:
+                with self._lock:
+                    self.stages.append(StageRecord(name, duration))
+
+    def to_dict(self) -> Dict:
+        """汇总为可 JSON 序列化的字典"""
+        with self._lock:
+            requests = list(self.requests)
+            stages = list(self.stages)
+
+        stage_summary = {}
+        for name, durations in _group(stages, lambda s: s.name, "duration").items():
+            stage_summary[name] = {
+                "count": len(durations),
+                **_latency_summary(durations),
+            }
+
+        endpoint_summary = {}
+        grouped = defaultdict(list)
+        for record in requests:
+            grouped[(record.service, record.endpoint)].append(record)
+        for (service, endpoint), records in sorted(grouped.items()):
+            endpoint_summary[f"{service} {endpoint}"] = {
+                "count": len(records),
+                "errors": sum(1 for r in records if not r.status or r.status >= 400),
+                **_latency_summary([r.latency for r in records]),
+                "bytes_in": sum(r.bytes_in for r in records),
+                "bytes_out": sum(r.bytes_out for r in records),
+                "retries": sum(r.retries for r in records),
+                "cache_hits": sum(1 for r in records if r.cache_hit),
+            }
+
+        return {
+            "stages": stage_summary,
+            "endpoints": endpoint_summary,
+            "requests": [asdict(record) for record in requests],
+        }
+
+    def report(self) -> str:
+        """生成文本报告"""
+        data = self.to_dict()
+        lines = ["", "== 阶段耗时 =="]
+        lines.append(f"{'stage':<40}{'count':>6}{'total(s)':>10}{'p50':>9}{'p95':>9}")
+        for name, item in data["stages"].items():
+            lines.append(
+                f"{name:<40}{item['count']:>6}{item['total']:>10.3f}"
+                f"{item['p50']:>9.3f}{item['p95']:>9.3f}"
+            )
+
+        lines.append("")
+        lines.append("== 接口请求 ==")
+        lines.append(
+            f"{'endpoint':<60}{'count':>6}{'err':>5}{'total(s)':>10}{'p50':>9}"
+            f"{'p95':>9}{'in(KB)':>10}{'out(KB)':>9}{'retry':>6}{'cache':>6}"
+        )
+        for name, item in data["endpoints"].items():
+            lines.append(
+                f"{name:<60}{item['count']:>6}{item['errors']:>5}"
+                f"{item['total']:>10.3f}{item['p50']:>9.3f}{item['p95']:>9.3f}"
+                f"{item['bytes_in'] / 1024:>10.1f}{item['bytes_out'] / 1024:>9.1f}"
+                f"{item['retries']:>6}{item['cache_hits']:>6}"
+            )
+        return "\n".join(lines)
+
+    def write_json(self, path: str):
+        """将汇总结果与原始记录写入 JSON 文件"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+
+def _group(items, key, attr) -> Dict[str, List[float]]:
+    grouped = defaultdict(list)
+    for item in items:
+        grouped[key(item)].append(getattr(item, attr))
+    return grouped
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    """nearest-rank 百分位数"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def _latency_summary(values: List[float]) -> Dict[str, float]:
+    sorted_values = sorted(values)
+    return {
+        "total": sum(sorted_values),
+        "p50": _percentile(sorted_values, 50),
+        "p95": _percentile(sorted_values, 95),
+    }
+
+
+def normalize_endpoint(method: str, url: str) -> str:
+    """
+    将 URL 归一化为接口模板，便于聚合统计
+
+    如 GET https://host/api/v4/projects/a%2Fb/merge_requests/12/notes?page=2
+    -> GET /projects/:id/merge_requests/:iid/notes
+    """
+    path = urlsplit(url).path
+    if "/api/v4" in path:
+        path = path.split("/api/v4", 1)[1]
+
+    segments = path.strip("/").split("/")
+    normalized = []
+    for i, segment in enumerate(segments):
+        previous = segments[i - 1] if i > 0 else ""
+        if previous in ("projects", "users", "groups"):
+            normalized.append(":id")
+        elif previous == "files" and i > 1 and segments[i - 2] == "repository":
+            normalized.append(":file_path")
+        elif segment.isdigit():
+            normalized.append(":iid")
+        elif _HEX_SHA.match(segment):
+            normalized.append(":sha")
+        else:
+            normalized.append(segment)
+    return f"{method} /{'/'.join(normalized)}"
+
+
+def profiled_stage(name: str):
+    """把一个异步方法记录为一个阶段，用于 AsyncNode 的 prep/exec/post"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with profiler.stage(name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# 全局性能分析器
+profiler = Profiler()
@@ -0,0 +1,107 @@
+import json
+from unittest.mock import Mock
+
+import pytest
+
+from gitlab.client import GitLabClient
+from utils.profiler import Profiler, normalize_endpoint, profiler
+
+
+@pytest.fixture
+def enabled_profiler():
+    profiler.reset()
+    profiler.enable()
+    yield profiler
+    profiler.enabled = False
+    profiler.reset()
+
+
+class TestNormalizeEndpoint:
+    """测试接口模板归一化"""
+
+    def test_project_and_iid(self):
+        url = "https://gitlab.example.com/api/v4/projects/group%2Fproject/merge_requests/12/notes?page=2"
+
+        assert (
+            normalize_endpoint("GET", url)
+            == "GET /projects/:id/merge_requests/:iid/notes"
+        )
+
+    def test_commit_sha(self):
+        url = "https://gitlab.example.com/api/v4/projects/1/repository/commits/abc1234"
+
+        assert (
+            normalize_endpoint("GET", url)
+            == "GET /projects/:id/repository/commits/:sha"
+        )
+
+    def test_file_path(self):
+        url = "https://gitlab.example.com/api/v4/projects/1/repository/files/src%2Fa.py/raw?ref=main"
+
+        assert (
+            normalize_endpoint("GET", url)
+            == "GET /projects/:id/repository/files/:file_path/raw"
+        )
+
+
+class TestProfiler:
+    """测试 Profiler 的记录与汇总"""
+
+    def test_disabled_records_nothing(self):
+        local = Profiler()
+
+        local.record_request("gitlab", "GET /user", 200, 0.1)
+        with local.stage("prep"):
+            pass
+
+        assert local.requests == []
+        assert local.stages == []
+
+    def test_summary_and_stage_attribution(self, tmp_path):
+        local = Profiler()
+        local.enable()
+
+        with local.stage("prep"):
+            for latency in (0.1, 0.2, 0.3, 0.4):
+                local.record_request("gitlab", "GET /user", 200, latency, bytes_in=10)
+        local.record_request("gitlab", "GET /user", 429, 1.0, retries=2)
+
+        data = local.to_dict()
+        summary = data["endpoints"]["gitlab GET /user"]
+        assert summary["count"] == 5
+        assert summary["errors"] == 1
+        assert summary["retries"] == 2
+        assert summary["bytes_in"] == 40
+        assert summary["p50"] == 0.3
+        assert summary["p95"] == 1.0
+        assert data["stages"]["prep"]["count"] == 1
+        assert data["requests"][0]["stage"] == "prep"
+        assert data["requests"][-1]["stage"] is None
+
+        path = tmp_path / "profile.json"
+        local.write_json(str(path))
+        assert json.loads(path.read_text())["endpoints"]
+        assert "gitlab GET /user" in local.report()
+
+
+class TestClientInstrumentation:
+    """测试 GitLabClient 记录请求"""
+
+    def test_record_request(self, enabled_profiler):
+        client = GitLabClient("https://gitlab.example.com/api/v4", "t")
+        response = Mock()
+        response.status_code = 201
+        response.content = b"{}"
+        response.retries = 1
+        response.from_cache = False
+        client.session.request = Mock(return_value=response)
+
+        client.post("/projects/1/merge_requests/2/notes", json={"body": "hi"})
+
+        (record,) = enabled_profiler.requests
+        assert record.service == "gitlab"
+        assert record.endpoint == "POST /projects/:id/merge_requests/:iid/notes"
+        assert record.status == 201
+        assert record.bytes_in == 2
+        assert record.bytes_out == len(json.dumps({"body": "hi"}))
+        assert record.retries == 1
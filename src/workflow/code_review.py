@@ -1,35 +1,76 @@
 import asyncio
 import json
-from typing import Any, Dict
+import os
+from typing import Any, Dict, List, Tuple
 
 from pocketflow import AsyncFlow, AsyncNode
 
-from ai.auth import client, get_openai_model
+from ai.auth import get_openai_model
+from ai.chat import create_chat_completion_async
 from ai.get_prompt import prompt_manager
+from gitlab.client import async_client
 from gitlab.comment import (
     create_diff_discussion,
     create_discussion,
     get_merge_request_versions,
 )
-from gitlab.diff_parser import DiffParser, format_diff_for_review
-from gitlab.merge_request import get_merge_request_raw_diff
+from gitlab.diff_cache import get_diff_cache, load_merge_request_diff_files
+from gitlab.diff_chunker import estimate_tokens, pack_diff_files
+from gitlab.diff_parser import DiffFile, DiffParser
+from gitlab.diff_source import DIFF_SOURCE_RAW, get_diff_source
+from gitlab.generated_detector import files_for_review, skipped_files
+from gitlab.graphql import fetch_merge_request_bundle, use_graphql
+from gitlab.line_anchor import LineAnchorIndex
+from gitlab.review_state import (
+    FileReview,
+    ReviewState,
+    build_file_reviews,
+    get_review_state_store,
+    is_full_review,
+)
 from gitlab.util import parse_merge_request_url
+from utils.disk_cache import make_cache_key
 from utils.logger import get_logger
+from utils.profiler import profiled_stage
 
 # 创建专用的日志记录器
 logger = get_logger(__name__, log_file="code_review.log")
 
 code_review_prompt = prompt_manager.load_prompt("code_review.md")
+code_review_reduce_prompt = prompt_manager.load_prompt("code_review_reduce.md")
+
+DEFAULT_REVIEW_TOKEN_BUDGET = 24000
+DEFAULT_REVIEW_CONCURRENCY = 4
+
+# 汇总失败时总体评论中最多保留的分块总体评估与总体建议
+MAX_FALLBACK_SUMMARIES = 5
+MAX_FALLBACK_SUGGESTIONS = 10
+
+
+def get_review_token_budget() -> int:
+    """每次审查请求中 diff 的 token 上限，0 表示不分块"""
+    return int(os.getenv("CODE_REVIEW_TOKEN_BUDGET") or DEFAULT_REVIEW_TOKEN_BUDGET)
+
+
+def get_review_concurrency() -> int:
+    """同时进行的审查请求数"""
+    return max(
+        1, int(os.getenv("CODE_REVIEW_CONCURRENCY") or DEFAULT_REVIEW_CONCURRENCY)
+    )
+
 
+def get_review_config() -> str:
+    """审查配置的标识，模型或 prompt 变化后不再沿用上次的审查结果"""
+    return make_cache_key(get_openai_model(), code_review_prompt)
 
-def call_llm_for_review(diff_content: str) -> Dict[str, Any]:
+
+async def call_llm_for_review(diff_content: str) -> Dict[str, Any]:
     """调用 LLM 进行代码审查"""
     logger.info("Sending diff to LLM for code review")
     logger.debug(f"Diff content length: {len(diff_content)} characters")
 
     try:
-        chat_completion = client.chat.completions.create(
-            model=get_openai_model(),
+        result = await create_chat_completion_async(
             temperature=0.3,  # 较低的 temperature 以获得更一致的审查结果
             messages=[
                 {"role": "system", "content": code_review_prompt},
@@ -37,8 +78,6 @@ def call_llm_for_review(diff_content: str) -> Dict[str, Any]:
             ],
             response_format={"type": "json_object"},
         )
-
-        result = chat_completion.choices[0].message.content
         logger.info("Received code review from LLM")
         logger.debug(f"LLM response length: {len(result)} characters")
 
@@ -60,11 +99,145 @@ def call_llm_for_review(diff_content: str) -> Dict[str, Any]:
         raise
 
 
+async def review_chunks(chunks: List[str], concurrency: int) -> List[Dict[str, Any]]:
+    """
+    并发审查各块 diff，同时进行的请求数不超过 concurrency
+
+    Returns:
+        List[Dict[str, Any]]: 与 chunks 顺序一致的审查结果
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def review(index: int, chunk: str) -> Dict[str, Any]:
+        if len(chunks) > 1:
+            # 告诉 LLM 这只是 MR 的一部分，不要因为看不到其他文件而误报
+            chunk = (
+                f"（以下是本次 MR diff 的第 {index + 1}/{len(chunks)} 部分）\n\n{chunk}"
+            )
+        async with semaphore:
+            logger.info(f"Reviewing chunk {index + 1}/{len(chunks)}")
+            return await call_llm_for_review(chunk)
+
+    return await asyncio.gather(
+        *(review(index, chunk) for index, chunk in enumerate(chunks))
+    )
+
+
+def merge_review_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    合并各块的审查结果：行级评论直接拼接，总体评估与总体建议去重后按块依次拼接
+    """
+    if len(results) == 1:
+        return results[0]
+
+    summaries = []
+    line_comments = []
+    general_suggestions = []
+    for result in results:
+        summary = result.get("overall_summary")
+        if summary and summary not in summaries:
+            summaries.append(summary)
+        line_comments.extend(result.get("line_comments") or [])
+        for suggestion in result.get("general_suggestions") or []:
+            if suggestion not in general_suggestions:
+                general_suggestions.append(suggestion)
+
+    return {
+        "overall_summary": "\n\n".join(summaries),
+        "line_comments": line_comments,
+        "general_suggestions": general_suggestions,
+    }
+
+
+async def call_llm_for_reduce(
+    summaries: List[str], suggestions: List[str]
+) -> Dict[str, Any]:
+    """调用 LLM 把各块的总体评估与总体建议汇总为一份"""
+    logger.info(f"Sending {len(summaries)} chunk summaries to LLM for reduce")
+    content = "\n\n".join(
+        f"## 第 {index}/{len(summaries)} 部分的总体评估\n\n{summary}"
+        for index, summary in enumerate(summaries, 1)
+    )
+    if suggestions:
+        content += "\n\n## 各部分的总体建议\n\n" + "\n".join(
+            f"- {suggestion}" for suggestion in suggestions
+        )
+
+    result = await create_chat_completion_async(
+        temperature=0.3,
+        messages=[
+            {"role": "system", "content": code_review_reduce_prompt},
+            {"role": "user", "content": content},
+        ],
+        response_format={"type": "json_object"},
+    )
+    return json.loads(result)
+
+
+async def reduce_review_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    合并各块的审查结果，并把多块的总体评估与总体建议交给 LLM 汇总为一份
+
+    汇总失败时总体评估最多保留 MAX_FALLBACK_SUMMARIES 块，总体建议最多保留 MAX_FALLBACK_SUGGESTIONS 条
+    """
+    merged = merge_review_results(results)
+    summaries = []
+    for result in results:
+        summary = result.get("overall_summary")
+        if summary and summary not in summaries:
+            summaries.append(summary)
+    if len(summaries) <= 1:
+        return merged
+
+    suggestions = merged["general_suggestions"]
+    try:
+        reduced = await call_llm_for_reduce(summaries, suggestions)
+        overall_summary = reduced.get("overall_summary")
+        if not isinstance(overall_summary, str) or not overall_summary:
+            raise ValueError("汇总结果缺少 overall_summary")
+        merged["overall_summary"] = overall_summary
+        reduced_suggestions = reduced.get("general_suggestions")
+        if isinstance(reduced_suggestions, list):
+            merged["general_suggestions"] = [
+                suggestion
+                for suggestion in reduced_suggestions
+                if isinstance(suggestion, str) and suggestion
+            ]
+        return merged
+    except Exception as e:
+        logger.error(f"Failed to reduce chunk summaries: {e}")
+
+    merged["overall_summary"] = "\n\n".join(summaries[:MAX_FALLBACK_SUMMARIES])
+    if len(summaries) > MAX_FALLBACK_SUMMARIES:
+        merged["overall_summary"] += (
+            f"\n\n（其余 {len(summaries) - MAX_FALLBACK_SUMMARIES} 部分的总体评估已省略）"
+        )
+    merged["general_suggestions"] = suggestions[:MAX_FALLBACK_SUGGESTIONS]
+    return merged
+
+
+def reused_review_results(reused: Dict[str, FileReview]) -> List[Dict[str, Any]]:
+    """
+    把沿用的文件审查结果转换为 reduce_review_results 的输入
+
+    行级评论在上次审查时已经发布，不再包含
+    """
+    return [
+        {
+            "overall_summary": "\n\n".join(review.summaries),
+            "line_comments": [],
+            "general_suggestions": review.general_suggestions,
+        }
+        for review in reused.values()
+    ]
+
+
 class CodeReviewMergeRequest(AsyncNode):
     """
     对 Merge Request 进行代码审查，分析代码变更并添加行级评论
     """
 
+    @profiled_stage("code_review.prep")
     async def prep_async(self, shared):
         """准备阶段：解析 Merge Request 并获取 diff 信息"""
         url = shared.get("url")
@@ -80,51 +253,164 @@ class CodeReviewMergeRequest(AsyncNode):
             f"Starting code review for MR {merge_number} in project {project_id}"
         )
 
-        # 获取 MR 的原始 diff
-        raw_diff = get_merge_request_raw_diff(project_id, merge_number)
-        if not raw_diff.strip():
+        if get_diff_cache() is None and get_diff_source() == DIFF_SOURCE_RAW:
+            # 不使用缓存且下载 raw_diffs 时，diff 与版本信息互不依赖，并发获取
+            (diff_files, formatted_diff), versions = await asyncio.gather(
+                async_client.run(
+                    load_merge_request_diff_files, project_id, merge_number, None
+                ),
+                self._fetch_versions(project_id, merge_number),
+            )
+            self._apply_versions(shared, versions)
+        else:
+            # 先获取版本信息：head_commit_sha 未变时直接使用缓存的 diff，不再下载与解析；
+            # DIFF_SOURCE=api 时还需要 base / head 两个 SHA 来获取过大的文件
+            versions = await self._fetch_versions(project_id, merge_number)
+            self._apply_versions(shared, versions)
+            diff_files, formatted_diff = await async_client.run(
+                load_merge_request_diff_files,
+                project_id,
+                merge_number,
+                shared["head_sha"],
+                base_sha=shared["base_sha"],
+            )
+
+        if not diff_files:
             logger.warning("No diff content found for the merge request")
             shared["has_changes"] = False
             return shared
 
-        shared["raw_diff"] = raw_diff
         shared["has_changes"] = True
-
-        # 解析 diff 内容
-        diff_parser = DiffParser()
-        diff_files = diff_parser.parse_diff(raw_diff)
         shared["diff_files"] = diff_files
 
-        # 格式化 diff 用于 LLM 分析
-        formatted_diff = format_diff_for_review(diff_files)
+        # 生成文件与压缩文件不会发给 LLM，记录下来写入总体评论
+        shared["skipped_files"] = skipped_files(diff_files)
+        for file_path, reason in shared["skipped_files"]:
+            logger.info(f"Skipped generated file {file_path}: {reason}")
+
+        # 增量审查：只审查 hunk 指纹与上次不同的文件，其余文件沿用上次的结果
+        review_files = files_for_review(diff_files)
+        shared["review_config"] = get_review_config()
+        shared["previous_head_sha"] = None
+        shared["reused_reviews"] = {}
+        review_state = self._load_review_state(shared)
+        if review_state is not None:
+            review_files, shared["reused_reviews"] = review_state.split_files(
+                review_files
+            )
+            shared["previous_head_sha"] = review_state.head_sha
+            logger.info(
+                f"Incremental review since {review_state.head_sha}: "
+                f"{len(review_files)} files changed, "
+                f"{len(shared['reused_reviews'])} files reused"
+            )
+
+        # 格式化后的 diff 用于 LLM 分析，超过 token 预算时按文件切成多块分别审查
         shared["formatted_diff"] = formatted_diff
+        shared["review_chunks"] = self._review_chunks(
+            review_files, formatted_diff, not shared["reused_reviews"]
+        )
 
         # 获取变更行信息，用于后续添加评论
-        changed_lines = diff_parser.get_changed_lines(diff_files)
+        changed_lines = DiffParser().get_changed_lines(diff_files)
         shared["changed_lines"] = changed_lines
 
-        # 获取 MR 版本信息，用于创建行级评论
-        try:
-            versions = get_merge_request_versions(project_id, merge_number)
-            if versions:
-                latest_version = versions[0]
-                shared["base_sha"] = latest_version.get("base_commit_sha")
-                shared["head_sha"] = latest_version.get("head_commit_sha")
-                shared["start_sha"] = latest_version.get("start_commit_sha")
-            else:
-                logger.warning("No version information found for the merge request")
-                shared["base_sha"] = None
-                shared["head_sha"] = None
-                shared["start_sha"] = None
-        except Exception as e:
-            logger.error(f"Failed to get MR versions: {e}")
-            shared["base_sha"] = None
-            shared["head_sha"] = None
-            shared["start_sha"] = None
+        # 行号索引，用于在发请求前校验并吸附 LLM 给出的评论位置
+        shared["line_anchors"] = LineAnchorIndex(diff_files)
 
         logger.info(f"Parsed {len(diff_files)} files with changes")
         return shared
 
+    async def _fetch_versions(self, project_id: str, merge_number: str):
+        """获取 MR 版本信息，用于创建行级评论；失败时返回 None"""
+        try:
+            if use_graphql():
+                bundle = await async_client.run(
+                    fetch_merge_request_bundle, project_id, merge_number
+                )
+                return bundle.versions
+            return await async_client.run(
+                get_merge_request_versions, project_id, merge_number
+            )
+        except Exception as e:
+            logger.error(f"Failed to get MR versions: {e}")
+            return None
+
+    def _load_review_state(self, shared):
+        """
+        读取上次审查的状态，未开启增量审查、要求全量审查或缺少 head_commit_sha 时返回 None
+
+        全量审查只是不读取上次的状态，评论发布后仍会保存本次的状态
+        """
+        store = get_review_state_store()
+        if store is None or is_full_review() or not shared.get("head_sha"):
+            return None
+        return store.load(
+            shared["project_id"], shared["merge_number"], shared["review_config"]
+        )
+
+    def _review_chunks(
+        self, review_files: List[DiffFile], formatted_diff: str, all_files: bool
+    ) -> List[Tuple[str, List[DiffFile]]]:
+        """
+        把需要审查的文件切成块
+
+        Args:
+            review_files: 需要发给 LLM 的文件
+            formatted_diff: 整个 MR 格式化后的 diff
+            all_files: 是否审查全部文件，是且未超过 token 预算时直接使用 formatted_diff
+
+        Returns:
+            List[Tuple[str, List[DiffFile]]]: (块的内容, 块中的文件)
+        """
+        token_budget = get_review_token_budget()
+        if all_files and (
+            token_budget <= 0 or estimate_tokens(formatted_diff) <= token_budget
+        ):
+            return [(formatted_diff, review_files)]
+        chunks = pack_diff_files(review_files, token_budget)
+        if len(chunks) > 1:
+            logger.info(
+                f"Split diff into {len(chunks)} chunks (token budget {token_budget})"
+            )
+        return chunks
+
+    def _apply_versions(self, shared, versions):
+        """将最新版本的 SHA 写入 shared"""
+        latest_version = versions[0] if versions else {}
+        if versions == []:
+            logger.warning("No version information found for the merge request")
+        shared["base_sha"] = latest_version.get("base_commit_sha")
+        shared["head_sha"] = latest_version.get("head_commit_sha")
+        shared["start_sha"] = latest_version.get("start_commit_sha")
+
+    def _save_review_state(self, prep_res, exec_res, failed_paths=()):
+        """
+        保存本次审查的状态，供下次增量审查使用
+
+        Args:
+            failed_paths: 行级评论发布失败的文件，不写入状态，下次重新审查
+        """
+        store = get_review_state_store()
+        file_reviews = exec_res.get("file_reviews")
+        if store is None or file_reviews is None or not prep_res.get("head_sha"):
+            return
+        files = {
+            path: review
+            for path, review in file_reviews.items()
+            if path not in failed_paths
+        }
+        try:
+            store.save(
+                prep_res["project_id"],
+                prep_res["merge_number"],
+                prep_res["review_config"],
+                ReviewState(head_sha=prep_res["head_sha"], files=files),
+            )
+        except OSError as e:
+            logger.error(f"Failed to save review state: {e}")
+
+    @profiled_stage("code_review.exec")
     async def exec_async(self, prep_res):
         """执行阶段：调用 LLM 进行代码审查"""
         if not prep_res.get("has_changes", False):
@@ -144,12 +430,35 @@ class CodeReviewMergeRequest(AsyncNode):
                 "general_suggestions": [],
             }
 
-        logger.info("Starting LLM code review analysis")
-        review_result = call_llm_for_review(formatted_diff)
-        logger.info("Code review analysis completed")
+        chunks = prep_res.get("review_chunks") or []
+        reused = prep_res.get("reused_reviews") or {}
+        if chunks:
+            logger.info(f"Starting LLM code review analysis ({len(chunks)} chunks)")
+            results = await review_chunks(
+                [text for text, _ in chunks], get_review_concurrency()
+            )
+            logger.info("Code review analysis completed")
+        elif reused:
+            logger.info("No files changed since last review, skipping LLM")
+            results = []
+        else:
+            results = await review_chunks([formatted_diff], get_review_concurrency())
+
+        file_reviews = build_file_reviews(
+            [(files, result) for (_, files), result in zip(chunks, results)]
+        )
+        file_reviews.update(reused)
 
+        review_result = await reduce_review_results(
+            results + reused_review_results(reused)
+        )
+        review_result["file_reviews"] = file_reviews
+        review_result["reviewed_file_count"] = sum(
+            1 for path in file_reviews if path not in reused
+        )
         return review_result
 
+    @profiled_stage("code_review.post")
     async def post_async(self, shared, prep_res, exec_res):
         """后处理阶段：将审查结果添加为评论"""
         if not prep_res.get("has_changes", False):
@@ -159,6 +468,13 @@ class CodeReviewMergeRequest(AsyncNode):
         project_id = shared["project_id"]
         merge_number = shared["merge_number"]
 
+        reused = prep_res.get("reused_reviews") or {}
+        if reused and not prep_res.get("review_chunks"):
+            # 所有文件都沿用上次的结果，评论已经发布过，只更新状态中的 head_commit_sha
+            self._save_review_state(prep_res, exec_res)
+            logger.info("No files changed since last review, no new comments")
+            return "No files changed since last review"
+
         logger.info(f"Adding code review comments to MR {merge_number}")
 
         # 添加总体评论
@@ -172,16 +488,32 @@ class CodeReviewMergeRequest(AsyncNode):
 {overall_summary}
 """
 
+        if reused:
+            previous_head_sha = prep_res.get("previous_head_sha") or ""
+            overall_comment += (
+                f"\n> 本次只审查了有变更的 {exec_res.get('reviewed_file_count', 0)} 个文件，"
+                f"其余 {len(reused)} 个文件沿用上次（{previous_head_sha[:8]}）的审查结果，"
+                "相应的行级评论不再重复发布\n"
+            )
+
         if general_suggestions:
             overall_comment += "\n### 💡 总体建议\n"
             for i, suggestion in enumerate(general_suggestions, 1):
                 overall_comment += f"{i}. {suggestion}\n"
 
+        skipped = prep_res.get("skipped_files", [])
+        if skipped:
+            overall_comment += "\n### 🗂️ 未审查的文件\n"
+            for file_path, reason in skipped:
+                overall_comment += f"- `{file_path}`：{reason}\n"
+
         overall_comment += "\n---\n*此评论由 AI 代码审查助手自动生成*"
 
         # 创建总体评论
+        overall_posted = False
         try:
             create_discussion(project_id, merge_number, overall_comment)
+            overall_posted = True
             logger.info("Created overall review comment")
         except Exception as e:
             logger.error(f"Failed to create overall comment: {e}")
@@ -189,8 +521,13 @@ class CodeReviewMergeRequest(AsyncNode):
         # 添加行级评论
         line_comments = exec_res.get("line_comments", [])
         line_comment_count = 0
+        dropped_count = 0
+        line_anchors = prep_res["line_anchors"]
+        # 行级评论发布失败的文件，不写入增量审查的状态，下次重新审查
+        failed_paths = set()
 
         for comment in line_comments:
+            anchor = None
             try:
                 file_path = comment.get("file_path")
                 line_number = comment.get("line_number")
@@ -231,23 +568,22 @@ class CodeReviewMergeRequest(AsyncNode):
 
                 comment_text += "\n\n<!-- code-review-bot -->"
 
-                # 映射 AI 返回的 line_type 到 GitLab API 格式
-                # AI 输出: "added", "removed", "modified"
-                # GitLab API: "new", "old", "both"
-                # 注意：line_number 应该对应正确的行号：
-                # - "removed" 行使用 old_line_number
-                # - "added" 或 "modified" 行使用 new_line_number
+                # 将 AI 返回的位置解析为 diff 中真实存在的行：
+                # 新增行使用 new_line，删除行使用 old_line，上下文行同时使用两者，
+                # 不在 diff 中的行吸附到最近的变更行，仍无法定位则丢弃，避免无效请求
                 ai_line_type = comment.get("line_type", "added")  # 默认为 added
-                gitlab_line_type = "new"  # 默认值
-                if ai_line_type == "removed":
-                    gitlab_line_type = "old"
-                elif ai_line_type == "modified":
-                    gitlab_line_type = "new"
-                elif ai_line_type == "added":
-                    gitlab_line_type = "new"
+                anchor = line_anchors.resolve(file_path, line_number, ai_line_type)
+                if anchor is None:
+                    dropped_count += 1
+                    logger.warning(
+                        f"Line {file_path}:{line_number} ({ai_line_type}) is not in the diff, skipping"
+                    )
+                    continue
 
                 logger.debug(
-                    f"Line comment mapping: AI line_type='{ai_line_type}' -> GitLab line_type='{gitlab_line_type}' for {file_path}:{line_number}"
+                    f"Line comment anchor: {file_path}:{line_number} ({ai_line_type}) -> "
+                    f"{anchor.line_type} old={anchor.old_line} new={anchor.new_line}"
+                    f"{' (snapped)' if anchor.snapped else ''}"
                 )
 
                 # 创建行级评论
@@ -255,12 +591,14 @@ class CodeReviewMergeRequest(AsyncNode):
                     project_id=project_id,
                     mr_number=merge_number,
                     content=comment_text,
-                    file_path=file_path,
-                    line_number=line_number,
-                    line_type=gitlab_line_type,
+                    file_path=anchor.new_path,
+                    line_number=anchor.line_number,
+                    line_type=anchor.line_type,
                     base_sha=prep_res.get("base_sha"),
                     head_sha=prep_res.get("head_sha"),
                     start_sha=prep_res.get("start_sha"),
+                    old_line=anchor.old_line,
+                    old_path=anchor.old_path,
                 )
 
                 line_comment_count += 1
@@ -268,10 +606,22 @@ class CodeReviewMergeRequest(AsyncNode):
 
             except Exception as e:
                 logger.error(f"Failed to create line comment: {e}")
+                failed_paths.add(
+                    anchor.new_path
+                    if anchor is not None
+                    else (comment.get("file_path") or "").lstrip("/")
+                )
                 continue
 
+        if overall_posted:
+            self._save_review_state(prep_res, exec_res, failed_paths)
+        else:
+            # 总体评论没有发出，不保存状态，否则下次会认为已经审查过而跳过
+            logger.warning("Review state not saved because the overall comment failed")
+
         logger.info(
-            f"Code review completed. Created {line_comment_count} line comments"
+            f"Code review completed. Created {line_comment_count} line comments, "
+            f"dropped {dropped_count} outside the diff"
         )
         return f"Created {line_comment_count} line comments and 1 overall summary"
 
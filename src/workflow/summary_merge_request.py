@@ -1,52 +1,123 @@
 import asyncio
+import os
+from typing import List
 
 from pocketflow import AsyncFlow, AsyncNode
 
-from ai.auth import client, get_openai_model
+from ai.chat import create_chat_completion_async
 from ai.get_prompt import prompt_manager
-from gitlab.comment import create_comment, get_comment
+from gitlab.client import async_client
+from gitlab.comment import create_comment, get_comment, get_merge_request_versions
+from gitlab.diff_cache import get_diff_cache, load_merge_request_raw_diff
+from gitlab.diff_chunker import (
+    compare_diff_sections,
+    estimate_tokens,
+    group_diff_sections,
+    split_diff_sections,
+)
+from gitlab.diff_source import DIFF_SOURCE_RAW, get_diff_source
+from gitlab.graphql import fetch_merge_request_bundle, use_graphql
 from gitlab.merge_request import (
     get_compare_diff_from_commits,
     get_merge_request_commits,
     get_merge_request_raw_diff,
+    select_commits_since,
 )
 from gitlab.util import parse_merge_request_url
 from utils.logger import get_logger
+from utils.profiler import profiled_stage
 
 # 创建专用的日志记录器
 logger = get_logger(__name__, log_file="summary_merge_request.log")
 
 summary_merge_request_prompt = prompt_manager.load_prompt("summary_merge_request.md")
+summary_merge_request_map_prompt = prompt_manager.load_prompt(
+    "summary_merge_request_map.md"
+)
+
+DEFAULT_MAP_REDUCE_THRESHOLD = 32000
+DEFAULT_MAP_TOKEN_BUDGET = 16000
+DEFAULT_MAP_CONCURRENCY = 4
+
+
+def get_map_reduce_threshold() -> int:
+    """发送内容超过该 token 数时使用 map-reduce 生成摘要，0 表示关闭"""
+    return int(
+        os.getenv("SUMMARY_MAP_REDUCE_THRESHOLD") or DEFAULT_MAP_REDUCE_THRESHOLD
+    )
 
 
-def call_llm(content: str):
+def get_map_token_budget() -> int:
+    """map 阶段每组 diff 的 token 上限"""
+    return int(os.getenv("SUMMARY_MAP_TOKEN_BUDGET") or DEFAULT_MAP_TOKEN_BUDGET)
+
+
+def get_map_concurrency() -> int:
+    """map 阶段同时进行的请求数"""
+    return max(1, int(os.getenv("SUMMARY_MAP_CONCURRENCY") or DEFAULT_MAP_CONCURRENCY))
+
+
+async def call_llm(content: str):
     """调用 LLM 生成摘要"""
     # 记录发送给 LLM 的 prompt 内容
     logger.info("Sending prompt to LLM")
     logger.debug(f"System prompt: {summary_merge_request_prompt}")
     logger.info(f"User content: {content}")
 
-    chat_completion = client.chat.completions.create(
-        model=get_openai_model(),
+    result = await create_chat_completion_async(
         temperature=1.0,
         messages=[
             {"role": "system", "content": summary_merge_request_prompt},
             {"role": "user", "content": content},
         ],
     )
-
-    result = chat_completion.choices[0].message.content
     logger.info("Received response from LLM")
     logger.debug(f"LLM response length: {len(result)} characters")
 
     return result
 
 
+async def call_llm_for_map(diff_group: str) -> str:
+    """map 阶段：总结一组文件的变更"""
+    logger.info("Sending diff group to LLM for partial summary")
+    logger.debug(f"Diff group length: {len(diff_group)} characters")
+
+    result = await create_chat_completion_async(
+        temperature=0.3,
+        messages=[
+            {"role": "system", "content": summary_merge_request_map_prompt},
+            {"role": "user", "content": diff_group},
+        ],
+    )
+    logger.debug(f"Partial summary length: {len(result)} characters")
+    return result
+
+
+async def summarize_diff_groups(groups: List[str], concurrency: int) -> List[str]:
+    """
+    并发总结各组 diff，同时进行的请求数不超过 concurrency
+
+    Returns:
+        List[str]: 与 groups 顺序一致的摘要
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def summarize(index: int, group: str) -> str:
+        async with semaphore:
+            logger.info(f"Summarizing diff group {index + 1}/{len(groups)}")
+            return await call_llm_for_map(group)
+
+    return await asyncio.gather(
+        *(summarize(index, group) for index, group in enumerate(groups))
+    )
+
+
 class SummaryMergeRequest(AsyncNode):
     """
     总结 Merge Request 的变更内容，生成摘要并且发送评论到对应的 Merge Request
     """
 
+    @profiled_stage("summary_merge_request.prep")
     async def prep_async(self, shared):
         """准备阶段：解析 Merge Request 的变更内容"""
         url = shared.get("url")
@@ -58,7 +129,15 @@ class SummaryMergeRequest(AsyncNode):
         shared["project_id"] = project_id
         shared["merge_number"] = merge_number
 
-        comments = get_comment(project_id, merge_number)
+        # 启用 GraphQL 时，评论与 commits 在一次请求中获取
+        bundle = None
+        if use_graphql():
+            bundle = await async_client.run(
+                fetch_merge_request_bundle, project_id, merge_number
+            )
+            comments = bundle.notes
+        else:
+            comments = await async_client.run(get_comment, project_id, merge_number)
         # 遍历 comments, 找出 start_commit_hash 与 end_commit_hash
         start_commit_hash = None
         end_commit_hash = None
@@ -79,23 +158,29 @@ class SummaryMergeRequest(AsyncNode):
         # 根据是否有历史 commit hash 决定获取方式
         if start_commit_hash and end_commit_hash:
             # 获取从 start_commit_hash 后的所有 commits（区间模式）
-            commits = get_merge_request_commits(
-                project_id, merge_number, end_commit_hash
-            )
+            if bundle:
+                commits = select_commits_since(bundle.commits, end_commit_hash)
+            else:
+                commits = await async_client.run(
+                    get_merge_request_commits, project_id, merge_number, end_commit_hash
+                )
 
-            # 获取区间 diff
+            # 获取区间 diff（依赖 commits 的结果，无法并发）
             actual_start = commits[-1]["short_id"] if commits else start_commit_hash
             actual_end = commits[0]["short_id"] if commits else end_commit_hash
-            raw_diff = get_compare_diff_from_commits(
-                project_id, actual_start, actual_end
+            raw_diff = await async_client.run(
+                get_compare_diff_from_commits, project_id, actual_start, actual_end
             )
 
             # 移除最后一个 commit（已经总结过了）
             commits = commits[:-1]
         else:
             # 获取整个 MR 的所有内容（完整模式）
-            raw_diff = get_merge_request_raw_diff(project_id, merge_number)
-            commits = get_merge_request_commits(project_id, merge_number)
+            # diff 与 commits 互不依赖，并发获取
+            raw_diff, commits = await asyncio.gather(
+                self._fetch_raw_diff(project_id, merge_number, bundle),
+                self._fetch_commits(project_id, merge_number, bundle),
+            )
             actual_start = commits[-1]["short_id"]
             actual_end = commits[0]["short_id"]
 
@@ -116,11 +201,46 @@ class SummaryMergeRequest(AsyncNode):
 
         return shared
 
+    async def _fetch_raw_diff(self, project_id, merge_number, bundle):
+        """获取过滤后的完整 diff（来源见 DIFF_SOURCE），head_commit_sha 未变时使用缓存"""
+        if get_diff_cache() is None and get_diff_source() == DIFF_SOURCE_RAW:
+            return await async_client.run(
+                get_merge_request_raw_diff, project_id, merge_number, stream=True
+            )
+        if bundle:
+            versions = bundle.versions
+        else:
+            versions = await async_client.run(
+                get_merge_request_versions, project_id, merge_number
+            )
+        latest_version = versions[0] if versions else {}
+        return await async_client.run(
+            load_merge_request_raw_diff,
+            project_id,
+            merge_number,
+            latest_version.get("head_commit_sha"),
+            # 摘要只需要知道文件有变化，不下载 too_large 文件的内容
+            fetch_truncated=False,
+        )
+
+    async def _fetch_commits(self, project_id, merge_number, bundle):
+        if bundle:
+            return bundle.commits
+        return await async_client.run(
+            get_merge_request_commits, project_id, merge_number
+        )
+
+    @profiled_stage("summary_merge_request.exec")
     async def exec_async(self, prep_res):
         content = f"""## 原始 diff\n\n{prep_res.get("raw_diff")}\n\n## 详细 commit 信息\n\n{prep_res.get("commits")}"""
 
+        # diff 过大时先按目录分组并发总结（map），再由各组摘要生成最终摘要（reduce）
+        threshold = get_map_reduce_threshold()
+        if threshold > 0 and estimate_tokens(content) > threshold:
+            content = await self._map_reduce_content(prep_res) or content
+
         logger.info("Starting LLM execution for merge request summary")
-        exec_res = call_llm(content)
+        exec_res = await call_llm(content)
 
         # 记录执行结果
         logger.info("LLM execution completed successfully")
@@ -128,6 +248,37 @@ class SummaryMergeRequest(AsyncNode):
 
         return exec_res
 
+    async def _map_reduce_content(self, prep_res):
+        """
+        map 阶段的摘要拼成 reduce 阶段的输入，没有可分组的 diff 时返回 None，按原方式生成
+
+        只有一组时同样经过 map 阶段：该组中超过预算的文件已被截断，不会把完整的 diff 发给 LLM
+        """
+        raw_diff = prep_res.get("raw_diff")
+        if isinstance(raw_diff, dict):
+            # 区间模式下为 compare 接口的返回
+            sections = compare_diff_sections(raw_diff)
+        else:
+            sections = split_diff_sections(raw_diff or "")
+        groups = group_diff_sections(sections, get_map_token_budget())
+        if not groups:
+            return None
+
+        logger.info(
+            f"Using map-reduce summary: {len(sections)} files in {len(groups)} groups"
+        )
+        summaries = await summarize_diff_groups(groups, get_map_concurrency())
+        parts = "\n\n".join(
+            f"### 第 {index} 部分\n\n{summary}"
+            for index, summary in enumerate(summaries, 1)
+        )
+        return (
+            f"## 变更摘要\n\n（diff 过大，已按目录分成 {len(groups)} 部分分别总结，"
+            f"请基于各部分的摘要生成描述）\n\n{parts}\n\n"
+            f"## 详细 commit 信息\n\n{prep_res.get('commits')}"
+        )
+
+    @profiled_stage("summary_merge_request.post")
     async def post_async(self, shared, prep_res, exec_res):
         logger.info(
             f"Creating comment for merge request {shared['merge_number']} in project {shared['project_id']}"
@@ -0,0 +1,180 @@
+import asyncio
+
+import pytest
+
+from gitlab.diff_parser import DiffParser
+from gitlab.line_anchor import LineAnchorIndex
+from gitlab.review_state import ReviewState, ReviewStateStore, build_file_reviews
+from utils.disk_cache import DiskCache
+from workflow.code_review import (
+    MAX_FALLBACK_SUMMARIES,
+    CodeReviewMergeRequest,
+    reduce_review_results,
+)
+
+DIFF = """diff --git a/a.py b/a.py
+--- a/a.py
++++ b/a.py
+@@ -1 +1,2 @@
+ keep
++added_a
+diff --git a/b.py b/b.py
+--- a/b.py
++++ b/b.py
+@@ -1 +1,2 @@
+ keep
++added_b
+"""
+
+
+def _results(count):
+    return [
+        {
+            "overall_summary": f"第 {i} 块的评估",
+            "line_comments": [{"file_path": f"{i}.py", "line_number": 1}],
+            "general_suggestions": [f"建议 {i}", "补充测试"],
+        }
+        for i in range(count)
+    ]
+
+
+class TestReduceReviewResults:
+    """测试多块审查结果的汇总"""
+
+    def test_single_summary_not_reduced(self, monkeypatch):
+        async def fail(*args):
+            raise AssertionError("只有一份总体评估时不需要汇总")
+
+        monkeypatch.setattr("workflow.code_review.call_llm_for_reduce", fail)
+
+        result = asyncio.run(reduce_review_results(_results(1)))
+
+        assert result["overall_summary"] == "第 0 块的评估"
+
+    def test_reduce_summaries(self, monkeypatch):
+        calls = []
+
+        async def reduce(summaries, suggestions):
+            calls.append((summaries, suggestions))
+            return {"overall_summary": "汇总评估", "general_suggestions": ["补充测试"]}
+
+        monkeypatch.setattr("workflow.code_review.call_llm_for_reduce", reduce)
+
+        result = asyncio.run(reduce_review_results(_results(3)))
+
+        assert result["overall_summary"] == "汇总评估"
+        assert result["general_suggestions"] == ["补充测试"]
+        # 行级评论不经过汇总，直接拼接
+        assert len(result["line_comments"]) == 3
+        summaries, suggestions = calls[0]
+        assert len(summaries) == 3
+        assert suggestions.count("补充测试") == 1
+
+    @pytest.mark.parametrize("reduced", [ValueError("boom"), {"overall_summary": ""}])
+    def test_fallback_caps_summaries(self, monkeypatch, reduced):
+        """测试汇总失败时只保留前几块的总体评估"""
+
+        async def reduce(summaries, suggestions):
+            if isinstance(reduced, Exception):
+                raise reduced
+            return reduced
+
+        monkeypatch.setattr("workflow.code_review.call_llm_for_reduce", reduce)
+        count = MAX_FALLBACK_SUMMARIES + 3
+
+        result = asyncio.run(reduce_review_results(_results(count)))
+
+        assert f"第 {MAX_FALLBACK_SUMMARIES - 1} 块的评估" in result["overall_summary"]
+        assert f"第 {MAX_FALLBACK_SUMMARIES} 块的评估" not in result["overall_summary"]
+        assert "其余 3 部分" in result["overall_summary"]
+
+
+class TestSaveReviewState:
+    """测试只在评论发布成功后保存增量审查的状态"""
+
+    @pytest.fixture
+    def store(self, tmp_path, monkeypatch):
+        store = ReviewStateStore(DiskCache(tmp_path, max_bytes=1024 * 1024), "test")
+        monkeypatch.setattr(
+            "workflow.code_review.get_review_state_store", lambda: store
+        )
+        return store
+
+    def _post(self, monkeypatch, overall_error=None, failed_file=None):
+        def create_discussion(*args):
+            if overall_error:
+                raise overall_error
+
+        def create_diff_discussion(**kwargs):
+            if kwargs["file_path"] == failed_file:
+                raise RuntimeError("400 Bad Request")
+
+        monkeypatch.setattr("workflow.code_review.create_discussion", create_discussion)
+        monkeypatch.setattr(
+            "workflow.code_review.create_diff_discussion", create_diff_discussion
+        )
+
+        diff_files = DiffParser().parse_diff(DIFF)
+        comments = [
+            {
+                "file_path": path,
+                "line_number": 2,
+                "severity": "major",
+                "message": "问题",
+                "suggestion": "建议",
+            }
+            for path in ("a.py", "b.py")
+        ]
+        review_result = {
+            "overall_summary": "评估",
+            "line_comments": comments,
+            "general_suggestions": [],
+        }
+        shared = {"project_id": "1", "merge_number": "2"}
+        prep_res = {
+            **shared,
+            "has_changes": True,
+            "head_sha": "sha",
+            "review_config": "config",
+            "review_chunks": [(DIFF, diff_files)],
+            "line_anchors": LineAnchorIndex(diff_files),
+        }
+        exec_res = {
+            **review_result,
+            "file_reviews": build_file_reviews([(diff_files, review_result)]),
+        }
+        asyncio.run(CodeReviewMergeRequest().post_async(shared, prep_res, exec_res))
+
+    def test_saved_after_posting(self, store, monkeypatch):
+        self._post(monkeypatch)
+
+        state = store.load("1", "2", "config")
+        assert state.head_sha == "sha"
+        assert sorted(state.files) == ["a.py", "b.py"]
+
+    def test_not_saved_when_overall_comment_fails(self, store, monkeypatch):
+        self._post(monkeypatch, overall_error=RuntimeError("500"))
+
+        assert store.load("1", "2", "config") is None
+
+    def test_failed_file_left_out(self, store, monkeypatch):
+        """测试行级评论发布失败的文件不写入状态，下次重新审查"""
+        self._post(monkeypatch, failed_file="a.py")
+
+        assert list(store.load("1", "2", "config").files) == ["b.py"]
+
+    def test_full_review_saves_without_loading(self, store, monkeypatch):
+        """测试全量审查不读取上次的状态，发布后仍保存本次的状态"""
+        store.save("1", "2", "config", ReviewState(head_sha="old"))
+        monkeypatch.setenv("CODE_REVIEW_FULL", "1")
+        shared = {
+            "project_id": "1",
+            "merge_number": "2",
+            "head_sha": "sha",
+            "review_config": "config",
+        }
+
+        assert CodeReviewMergeRequest()._load_review_state(shared) is None
+
+        self._post(monkeypatch)
+        assert store.load("1", "2", "config").head_sha == "sha"
@@ -0,0 +1,42 @@
+import asyncio
+
+from gitlab.diff_chunker import TRUNCATED_MARKER
+from workflow.summary_merge_request import SummaryMergeRequest
+
+LARGE_DIFF = "\n".join(
+    ["diff --git a/a.py b/a.py", "--- a/a.py", "+++ b/a.py", "@@ -0,0 +1,500 @@"]
+    + [f"+value_{i} = compute({i})" for i in range(500)]
+)
+
+
+class TestMapReduce:
+    """测试 diff 过大时的 map-reduce 摘要"""
+
+    def test_single_oversized_group_is_truncated(self, monkeypatch):
+        """测试只有一个超过预算的文件时仍经过 map 阶段，不发送完整的 diff"""
+        monkeypatch.setenv("SUMMARY_MAP_REDUCE_THRESHOLD", "100")
+        monkeypatch.setenv("SUMMARY_MAP_TOKEN_BUDGET", "200")
+        mapped = []
+        sent = []
+
+        async def summarize(groups, concurrency):
+            mapped.extend(groups)
+            return ["a.py 新增了 value 的计算"]
+
+        async def call_llm(content):
+            sent.append(content)
+            return {}
+
+        monkeypatch.setattr(
+            "workflow.summary_merge_request.summarize_diff_groups", summarize
+        )
+        monkeypatch.setattr("workflow.summary_merge_request.call_llm", call_llm)
+
+        asyncio.run(
+            SummaryMergeRequest().exec_async({"raw_diff": LARGE_DIFF, "commits": "[]"})
+        )
+
+        assert len(mapped) == 1
+        assert mapped[0].endswith(TRUNCATED_MARKER)
+        assert "a.py 新增了 value 的计算" in sent[0]
+        assert "value_499" not in sent[0]